@@ -8,40 +8,85 @@ __created__ = "05/10/2019"
 try:
     import os
     import sys
-    import telnetlib
-    import paramiko
-    import netmiko
+    import re
     import json
     import time
     import argparse
-    import readline
-    import glob
     import socket
     import base64
     import datetime
-    import concurrent.futures
-    import termtables as tt
+    import functools
+    import operator
+    import importlib
+    import threading
+    import logging
     from peewee import *
     from pathlib import Path
-    from prompt_toolkit import prompt
-    from prompt_toolkit.completion import WordCompleter
-    from prompt_toolkit.validation import Validator, ValidationError
-    from prompt_toolkit.formatted_text import HTML, ANSI
-    from prompt_toolkit.styles import Style
 except ImportError as err:
     exit(str(err))
 
-db = SqliteDatabase('devices/devices.db')
-if not os.path.exists('devices'):
-    os.mkdir('devices')
-if not os.path.exists('reports'):
-    os.mkdir('reports')
+DEFAULT_MAX_INFLIGHT = 100
+DEFAULT_TIMEOUT = 30
+DEFAULT_WINDOW = 64
+DEFAULT_RETRIES = 0
+RETRY_BACKOFF = 1.0
+RETRY_BACKOFF_MAX = 30.0
+BREAKER_RUNS = 3
+BREAKER_COOLDOWN = 3600
+PREFLIGHT_TIMEOUT = 2.0
+PREFLIGHT_BATCH = 1000
+PREFLIGHT_RESOLVERS = 64
+DAEMON_SOCKET = 'devices/cna.sock'
+DAEMON_IDLE = 300
+DAEMON_KEEPALIVE = 30
+DAEMON_REQUEST_LIMIT = 64 << 20
+JOB_BATCH = 200
+JOB_FLUSH = 1.0
+IMPORT_BATCH = 1000
+INSERT_ROWS = 60
+LIST_PAGE = 500
+PROFILE_SLOWEST = 10
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_HOST = '127.0.0.1'
+SUCCESS = 25
+LOG_LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'success': SUCCESS, 'warning': logging.WARNING,
+              'error': logging.ERROR}
+SHARD_REPLICAS = 64
+SITE_TAG = 'site'
+TOKEN_ENV = 'CNA_TOKEN'
+DB_PATH = 'devices/devices.db'
+# rendered configs were cached there by older versions, secrets in clear : removed on sight
+RENDER_CACHE = 'devices/render_cache'
+BACKUP_STORE = 'backups'
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+PARSE_PLATFORM = 'cisco_ios'
+
+# bound to DB_PATH by initDB() on first use, importing this script has no side effects
+db = SqliteDatabase(None)
+
+
+def require(module: str):
+    """
+    import `module` when a code path needs it (SSH stack, prompts, tables ..),
+    so `--devices --list` or `--help` never pay for paramiko & co
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError as err:
+        exit(str(err))
 
 
-class Routers(Model):
-    hostname = CharField()
+CATEGORIES = {1: 'routers', 2: 'switches', 3: 'others'}
+LEGACY_TABLES = ['routers', 'switches', 'others']
+FIELDS = ['hostname', 'device_type', 'host', 'priv_pass', 'telnet', 'telnet_username', 'telnet_password',
+          'telnet_port', 'ssh', 'ssh_use_keys', 'ssh_keys', 'ssh_username', 'ssh_password', 'ssh_port']
+
+
+class Device(Model):
+    category = CharField(index=True)
+    hostname = CharField(index=True)
     device_type = CharField()
-    host = CharField()
+    host = CharField(index=True)
     priv_pass = CharField()
     telnet = CharField()
     telnet_username = CharField()
@@ -53,53 +98,345 @@ class Routers(Model):
     ssh_username = CharField()
     ssh_password = CharField()
     ssh_port = CharField()
+    # `host` as an integer when it is an IPv4 address, for the subnet selectors
+    ipv4 = IntegerField(null=True)
 
     class Meta:
         database = db
+        table_name = 'devices'
+        # declared here and not on the field : created by create_tables once the
+        # column was added to an older devices.db
+        indexes = ((('ipv4',), False),)
 
 
-class Switches(Model):
-    hostname = CharField()
-    device_type = CharField()
+class Tag(Model):
+    """ free label of a device, matched by the `tag=` selectors """
+    device = ForeignKeyField(Device, backref='tags', on_delete='CASCADE')
+    name = CharField()
+
+    class Meta:
+        database = db
+        table_name = 'tags'
+        indexes = ((('name', 'device'), True),)
+
+
+class Breaker(Model):
+    """ circuit breaker of one `host:port` (see breakerKey) : consecutive runs where it could not be reached """
+    host = CharField(unique=True)
+    failures = IntegerField(default=0)
+    opened_until = FloatField(default=0)
+    last_error = TextField(null=True)
+
+    class Meta:
+        database = db
+        table_name = 'breakers'
+
+
+class Job(Model):
+    """ one --connect-to run, enough to dispatch its unfinished devices again with --resume """
+    created = DateTimeField(default=datetime.datetime.now)
+    finished = DateTimeField(null=True)
+    selection = TextField()
+    method = CharField()
+    ssh_keys = CharField(default='False')
+    shell = BooleanField(default=False)
+    window = IntegerField(default=DEFAULT_WINDOW)
+    diff = BooleanField(default=False)
+    cmds = TextField(null=True)
+    template = TextField(null=True)
+    vars_file = TextField(null=True)
+
+    class Meta:
+        database = db
+        table_name = 'jobs'
+
+
+class JobDevice(Model):
+    """ state of one device inside a job : pending / running / done / failed """
+    job = ForeignKeyField(Job, backref='devices', on_delete='CASCADE')
+    device = IntegerField()
+    category = CharField()
     host = CharField()
-    priv_pass = CharField()
-    telnet = CharField()
-    telnet_username = CharField()
-    telnet_password = CharField()
-    telnet_port = CharField()
-    ssh = CharField()
-    ssh_use_keys = CharField()
-    ssh_keys = CharField()
-    ssh_username = CharField()
-    ssh_password = CharField()
-    ssh_port = CharField()
+    state = CharField(default='pending')
+    error = TextField(null=True)
+    updated = FloatField(default=time.time)
 
     class Meta:
         database = db
+        table_name = 'job_devices'
+        indexes = ((('job', 'state'), False), (('job', 'device'), True))
 
 
-class Others(Model):
-    hostname = CharField()
-    device_type = CharField()
+class Backup(Model):
+    """ one running-config taken from a device, the text itself is the object `digest` of the BackupStore """
+    device = IntegerField()
+    category = CharField()
     host = CharField()
-    priv_pass = CharField()
-    telnet = CharField()
-    telnet_username = CharField()
-    telnet_password = CharField()
-    telnet_port = CharField()
-    ssh = CharField()
-    ssh_use_keys = CharField()
-    ssh_keys = CharField()
-    ssh_username = CharField()
-    ssh_password = CharField()
-    ssh_port = CharField()
+    hostname = CharField()
+    taken = DateTimeField(default=datetime.datetime.now)
+    digest = CharField(index=True)
+    size = IntegerField()
 
     class Meta:
         database = db
+        table_name = 'backups'
+        indexes = ((('category', 'device', 'taken'), False),)
+
+
+class JobTracker(object):
+    """
+    keeps the JobDevice rows of a run in step with the engine : state changes
+    are buffered and committed JOB_BATCH at a time (or every JOB_FLUSH second),
+    so a run killed halfway loses at most one batch, whose devices are simply
+    dispatched again by --resume
+    """
+
+    def __init__(self, job: Job, rows: list, skipped=()):
+        self.job = job
+        ids = [row['id'] for row in rows] + [row['id'] for row, _ in skipped]
+        known = {}
+        for i in range(0, len(ids), 500):
+            query = JobDevice.select(JobDevice.id, JobDevice.device).where(
+                (JobDevice.job == job) & (JobDevice.device.in_(ids[i:i + 500])))
+            known.update({jd.device: jd.id for jd in query})
+        new = [{'job': job.id, 'device': row['id'], 'category': row['category'], 'host': row['host']}
+               for row in rows + [row for row, _ in skipped] if row['id'] not in known]
+        with db.atomic():
+            for i in range(0, len(new), 200):
+                JobDevice.insert_many(new[i:i + 200]).execute()
+        for i in range(0, len(ids), 500):
+            query = JobDevice.select(JobDevice.id, JobDevice.device).where(
+                (JobDevice.job == job) & (JobDevice.device.in_(ids[i:i + 500])))
+            known.update({jd.device: jd.id for jd in query})
+        self._ids = [known[row['id']] for row in rows]
+        self._pending = []
+        self._flushed = time.monotonic()
+        for row, error in skipped:
+            self._pending.append((known[row['id']], 'failed', error))
+        self.flush()
+
+    def start(self, n: int):
+        self._buffer(self._ids[n], 'running', None)
+
+    def finish(self, n: int, result):
+        self._buffer(self._ids[n], 'done' if result.status else 'failed', result.error)
+
+    def _buffer(self, jd: int, state: str, error):
+        self._pending.append((jd, state, error))
+        if len(self._pending) >= JOB_BATCH or time.monotonic() - self._flushed >= JOB_FLUSH:
+            self.flush()
+
+    def flush(self):
+        if self._pending == []:
+            return
+        now = time.time()
+        latest, states = {}, {}
+        for jd, state, error in self._pending:
+            latest[jd] = (state, error)
+        with db.atomic():
+            for jd, (state, error) in latest.items():
+                if state == 'failed':
+                    JobDevice.update(state=state, error=error, updated=now).where(JobDevice.id == jd).execute()
+                else:
+                    states.setdefault(state, []).append(jd)
+            for state, ids in states.items():
+                for i in range(0, len(ids), 500):
+                    JobDevice.update(state=state, error=None, updated=now).where(JobDevice.id.in_(ids[i:i + 500])).execute()
+        self._pending = []
+        self._flushed = time.monotonic()
+
+    def close(self) -> int:
+        """ flush what is left, returns how many devices are still unfinished """
+        self.flush()
+        left = JobDevice.select().where((JobDevice.job == self.job) & (JobDevice.state.in_(['pending', 'running']))).count()
+        if left == 0:
+            Job.update(finished=datetime.datetime.now()).where(Job.id == self.job.id).execute()
+        return left
+
+
+def breakerKey(host: str, port) -> str:
+    """ terminal servers put many devices behind one IP, each breaker is one `host:port` """
+    return f'{host}:{port}'
+
+
+def openBreakers(hosts: list) -> dict:
+    """ {breakerKey: opened_until} of the breakerKeys still in their cool-down """
+    now = time.time()
+    opened = {}
+    hosts = list(set(hosts))
+    for i in range(0, len(hosts), 500):
+        query = Breaker.select(Breaker.host, Breaker.opened_until).where(
+            (Breaker.host.in_(hosts[i:i + 500])) & (Breaker.opened_until > now))
+        opened.update({b.host: b.opened_until for b in query})
+    return opened
+
+
+def recordBreakers(results: list, runs=BREAKER_RUNS, cooldown=BREAKER_COOLDOWN):
+    """
+    one transaction per run : hosts that answered are reset (a rejected login
+    answered too), the ones that could not be connected count one more failed
+    run and open for `cooldown` seconds after `runs` in a row
+    """
+    answered = {breakerKey(r.host, r.port) for r in results if r.connected() or r.reason == 'auth'}
+    failed = {breakerKey(r.host, r.port): r.error for r in results if not (r.connected() or r.reason == 'auth')}
+    failed = {key: error for key, error in failed.items() if key not in answered}
+    reached = list(answered)
+    now = time.time()
+    with db.atomic():
+        for i in range(0, len(reached), 500):
+            Breaker.delete().where(Breaker.host.in_(reached[i:i + 500])).execute()
+        hosts = list(failed)
+        known = {}
+        for i in range(0, len(hosts), 500):
+            known.update({b.host: b.failures for b in Breaker.select().where(Breaker.host.in_(hosts[i:i + 500]))})
+        rows = []
+        for host, error in failed.items():
+            failures = known.get(host, 0) + 1
+            rows.append({'host': host, 'failures': failures, 'last_error': error,
+                         'opened_until': now + cooldown if failures >= runs else 0})
+        for i in range(0, len(rows), 200):
+            Breaker.replace_many(rows[i:i + 200]).execute()
+
+
+def migrateLegacyTables():
+    """
+    move rows of the old routers / switches / others tables into `devices`,
+    the first table moved keeps its IDs , the next ones are renumbered
+    """
+    legacy = [t for t in LEGACY_TABLES if db.table_exists(t)]
+    if legacy == []:
+        return False
+    columns = ', '.join(FIELDS)
+    with db.atomic():
+        for table in legacy:
+            if Device.select().count() == 0:
+                db.execute_sql(f'INSERT INTO devices (id, category, {columns}) '
+                               f'SELECT id, ?, {columns} FROM {table} ORDER BY id', (table,))
+            else:
+                moved = db.execute_sql(f'INSERT INTO devices (category, {columns}) '
+                                       f'SELECT ?, {columns} FROM {table} ORDER BY id', (table,)).rowcount
+                if moved > 0:
+                    msg.warning(f"{moved} {table} got new IDs while moving to the devices table, check --devices --list")
+            db.execute_sql(f'DROP TABLE {table}')
+    return True
 
 
-db.connect()
-db.create_tables([Routers, Switches, Others], safe=True)
+ANSI = re.compile(r'\x1b\[[0-9;]*m')
+LOGGER = logging.getLogger('cna')
+logging.addLevelName(SUCCESS, 'SUCCESS')
+_LOGGING_LOCK = threading.Lock()
+
+
+class ConsoleFormatter(logging.Formatter):
+    """ the coloured lines of msg (plain off a TTY), or one JSON object per record """
+
+    def __init__(self, json_mode=False, colour=True):
+        super().__init__()
+        self.json_mode = json_mode
+        self.colour = colour
+
+    def format(self, record) -> str:
+        if self.json_mode == True:
+            return json.dumps({'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                               'level': record.levelname.lower(), 'message': ANSI.sub('', record.getMessage()),
+                               'thread': record.threadName, 'pid': record.process})
+        line = getattr(record, 'line', record.getMessage())
+        return line if self.colour == True else ANSI.sub('', line)
+
+
+class ConsoleLog(logging.Handler):
+    """
+    console of the `cna` logger : records of the session threads & of the
+    engine loop are only put on a queue (QueueHandler), one QueueListener
+    thread writes them, so a slow or piped terminal never holds a session.
+    the main thread outside of the loop lets the queue drain then writes
+    inline, which keeps its lines (& prompts) after the ones already queued
+    """
+
+    def __init__(self, stream=None, json_mode=False):
+        super().__init__()
+        handlers, queue = require('logging.handlers'), require('queue')
+        stream = stream or sys.stdout
+        self.console = logging.StreamHandler(stream)
+        self.console.setFormatter(ConsoleFormatter(json_mode, colour=json_mode == False and stream.isatty()))
+        self._queue = queue.Queue()
+        self._queued = handlers.QueueHandler(self._queue)
+        self._listener = handlers.QueueListener(self._queue, self.console)
+        self._listener.start()
+
+    @staticmethod
+    def _inline() -> bool:
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        asyncio = sys.modules.get('asyncio')
+        if asyncio is None:
+            return True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return True
+        return False
+
+    def handle(self, record) -> bool:
+        # no handler lock : queued records never wait for the main thread
+        if not self.filter(record):
+            return False
+        if self._inline():
+            self.flush()
+            self.console.handle(record)
+        else:
+            self._queued.handle(record)
+        return True
+
+    def flush(self):
+        """ wait until every queued record is written """
+        if self._listener is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        super().close()
+
+
+class StdoutClosed(BrokenPipeError):
+    """ the reader of stdout went away """
+
+
+class WatchedStdout(object):
+    """ sys.stdout raising StdoutClosed for its own broken pipe, told apart from the ones of sockets """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text: str) -> int:
+        try:
+            return self._stream.write(text)
+        except BrokenPipeError as err:
+            raise StdoutClosed(*err.args) from None
+
+    def flush(self):
+        try:
+            self._stream.flush()
+        except BrokenPipeError as err:
+            raise StdoutClosed(*err.args) from None
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def setupLogging(level='info', json_mode=False) -> ConsoleLog:
+    """ (re)attach the console of the `cna` logger, JSON records go to stderr so stdout keeps the reports """
+    with _LOGGING_LOCK:
+        for handler in list(LOGGER.handlers):
+            LOGGER.removeHandler(handler)
+            handler.close()
+        handler = ConsoleLog(sys.stderr if json_mode == True else sys.stdout, json_mode)
+        LOGGER.addHandler(handler)
+        LOGGER.setLevel(LOG_LEVELS.get(level, level))
+        LOGGER.propagate = False
+    return handler
 
 
 class msg(object):
@@ -115,6 +452,23 @@ class msg(object):
     BOLD = "\033[1m"
     RESET = "\033[0m"
 
+    @staticmethod
+    def _log(level: int, _msg, line: str):
+        """ hand the record to the `cna` logger, set up with the defaults by the first one """
+        if LOGGER.handlers == []:
+            with _LOGGING_LOCK:
+                if LOGGER.handlers == []:
+                    LOGGER.addHandler(ConsoleLog())
+                    LOGGER.setLevel(logging.INFO)
+                    LOGGER.propagate = False
+        LOGGER.log(level, '%s', _msg, extra={'line': line})
+
+    @staticmethod
+    def flush():
+        """ wait for the queued lines, before printing anything else """
+        for handler in LOGGER.handlers:
+            handler.flush()
+
     @staticmethod
     def failure(_msg: str, very=False, tab=None):
         if tab is not None:
@@ -125,7 +479,7 @@ class msg(object):
             text += f"{msg.WHITE}[{msg.RED}CRITICAL{msg.WHITE}] {msg.RED}{_msg}{msg.WHITE}"
         else:
             text += f"{msg.WHITE}[{msg.RED}CRITICAL{msg.WHITE}] {_msg}{msg.WHITE}"
-        print(text)
+        msg._log(logging.ERROR, _msg, text)
 
     @staticmethod
     def success(_msg: str, very=False, tab=None):
@@ -137,7 +491,7 @@ class msg(object):
             text += f"{msg.WHITE}[{msg.GREEN}SUCCESS{msg.WHITE}] {msg.GREEN}{_msg}{msg.WHITE}"
         else:
             text += f"{msg.WHITE}[{msg.GREEN}SUUCESS{msg.WHITE}] {_msg}{msg.WHITE}"
-        print(text)
+        msg._log(SUCCESS, _msg, text)
 
     @staticmethod
     def warning(_msg: str, very=False, tab=None):
@@ -149,7 +503,7 @@ class msg(object):
             text += f"{msg.WHITE}[{msg.YELLOW}WARNING{msg.WHITE}] {msg.YELLOW}{_msg}{msg.WHITE}"
         else:
             text += f"{msg.WHITE}[{msg.YELLOW}WARNING{msg.WHITE}] {_msg}{msg.WHITE}"
-        print(text)
+        msg._log(logging.WARNING, _msg, text)
 
     @staticmethod
     def info(_msg: str, very=False, tab=None):
@@ -161,7 +515,7 @@ class msg(object):
             text += f"{msg.WHITE}[{msg.BLUE}INFO{msg.WHITE}] {msg.BLUE}{_msg}{msg.WHITE}"
         else:
             text += f"{msg.WHITE}[{msg.BLUE}INFO{msg.WHITE}] {_msg}{msg.WHITE}"
-        print(text)
+        msg._log(logging.INFO, _msg, text)
 
     @staticmethod
     def nodata(_msg: str, very=False, tab=None):
@@ -173,77 +527,956 @@ class msg(object):
             text += f"{msg.RED}[+] {msg.RED}{_msg}{msg.WHITE}"
         else:
             text += f"{msg.RED}[+] {msg.WHITE}{_msg}{msg.WHITE}"
-        print(text)
+        msg._log(logging.WARNING, _msg, text)
+
+
+def addMissingColumns(models: list) -> list:
+    """ columns added to a model after its table was created (all have a default), returns the added fields """
+    added = []
+    for model in models:
+        if not db.table_exists(model._meta.table_name):
+            continue
+        existing = {c.name for c in db.get_columns(model._meta.table_name)}
+        missing = [f for f in model._meta.sorted_fields if f.column_name not in existing]
+        if missing != []:
+            migrate = require('playhouse.migrate')
+            migrator = migrate.SqliteMigrator(db)
+            migrate.migrate(*[migrator.add_column(model._meta.table_name, f.column_name, f) for f in missing])
+            added.extend(missing)
+    return added
+
+
+def fillIPv4():
+    """ `ipv4` of the rows written before the column existed """
+    with db.atomic():
+        for device in Device.select(Device.id, Device.host).where(Device.ipv4.is_null()):
+            if ipv4Int(device.host) is not None:
+                Device.update(ipv4=ipv4Int(device.host)).where(Device.id == device.id).execute()
+
+
+def ipv4Int(host: str):
+    """ the integer of an IPv4 address, None for anything else (names, IPv6) """
+    try:
+        return int(require('ipaddress').IPv4Address(host.strip()))
+    except ValueError:
+        return None
+
+
+def initDB():
+    if db.database is not None:
+        return db
+    if not os.path.exists('devices'):
+        os.mkdir('devices')
+    db.init(DB_PATH)
+    db.connect()
+    added = addMissingColumns([Job, Device])
+    db.create_tables([Device, Tag, Breaker, Job, JobDevice, Backup], safe=True)
+    if migrateLegacyTables() or 'ipv4' in [f.name for f in added]:
+        fillIPv4()
+    return db
+
+
+SELECTOR_CATEGORIES = {'r': 'routers', 's': 'switches', 'o': 'others'}
+SELECTOR_IDS = re.compile(r'^[RSOrso]=')
+GLOB_CHARS = re.compile(r'[*?\[]')
+
+
+def parseSelector(text: str):
+    """
+    --connect-to selector as one peewee expression over `devices` :
+    clauses separated by `;` are OR'ed, terms of a clause joined by `&` are
+    AND'ed and `!` negates a term. terms are `all`, `R=1,2,10-20-S=*` (IDs &
+    ranges by category), `name=GLOB`, `host=IP|CIDR|GLOB` and `tag=GLOB`.
+    raises ValueError on a term it does not understand
+    """
+    clauses = []
+    for clause in text.split(';'):
+        terms = []
+        for term in clause.split('&'):
+            term = term.strip()
+            negate = term.startswith('!')
+            expr = _selectorTerm(term[1:].strip() if negate else term)
+            terms.append(~expr if negate else expr)
+        clauses.append(functools.reduce(operator.and_, terms))
+    return functools.reduce(operator.or_, clauses)
+
+
+def _selectorTerm(term: str):
+    if term.lower() in ('all', '*'):
+        return Device.id.is_null(False)
+    if SELECTOR_IDS.match(term):
+        groups = re.split(r'-(?=[RSOrso]=)', term)
+        return functools.reduce(operator.or_, [_selectorIDs(SELECTOR_CATEGORIES[g[0].lower()], g[2:]) for g in groups])
+    key, sep, value = term.partition('=')
+    key, value = key.strip().lower(), value.strip()
+    if sep == '' or value == '':
+        raise ValueError(f"`{term}` is not a selector (all, R=1-5, name=.., host=.., tag=..)")
+    if key in ('name', 'hostname'):
+        return Device.hostname % value if GLOB_CHARS.search(value) else Device.hostname == value
+    if key == 'host':
+        if '/' in value:
+            net = require('ipaddress').ip_network(value, strict=False)
+            if net.version != 4:
+                raise ValueError(f"`{value}` : only IPv4 subnets are indexed")
+            # false and not NULL for named hosts, so that `!host=CIDR` keeps them
+            return Device.ipv4.is_null(False) & Device.ipv4.between(int(net.network_address), int(net.broadcast_address))
+        return Device.host % value if GLOB_CHARS.search(value) else Device.host == value
+    if key == 'tag':
+        tags = Tag.select(Tag.device).where(Tag.name % value if GLOB_CHARS.search(value) else Tag.name == value)
+        return Device.id.in_(tags)
+    raise ValueError(f"unknown selector `{key}` (all, R=1-5, name=.., host=.., tag=..)")
+
+
+def _selectorIDs(category: str, spec: str):
+    """ `1,2,10-20` (or `*`) inside one category """
+    ids, ranges = [], []
+    for item in [i.strip() for i in spec.split(',') if i.strip() != '']:
+        if item in ('*', 'all'):
+            return Device.category == category
+        low, sep, high = item.partition('-')
+        if not isNumber(low) or (sep != '' and not isNumber(high)):
+            raise ValueError(f"`{item}` is not an ID or a range of IDs")
+        if sep == '':
+            ids.append(int(low))
+        else:
+            ranges.append(Device.id.between(int(low), int(high)))
+    if ids != []:
+        ranges.append(Device.id.in_(ids))
+    if ranges == []:
+        raise ValueError(f"no ID given for {category}")
+    return (Device.category == category) & functools.reduce(operator.or_, ranges)
+
+
+PROMPT = re.compile(r'^(?P<hostname>[\w.\-:/@]+)(?P<mode>\([\w\-]+\))?(?P<level>[>#]) ?$')
+PRIV_PROMPTS = re.compile(r'(?m)^\r?[\w.\-:/@]+(\([\w\-]+\))?#')
+CMD_ERRORS = re.compile(r'(?m)^% (Invalid|Incomplete|Ambiguous|Unknown)')
+TN_USERNAME = re.compile(rb'(?i)(username|login): ?$')
+TN_PASSWORD = re.compile(rb'(?i)password: ?$')
+TN_INVALID = re.compile(rb'% ?(Login invalid|Authentication failed|Bad passwords?|Access denied)')
+TN_PROMPT = re.compile(rb'(?m)^(?P<hostname>[\w.\-:/@]+)(?P<mode>\([\w\-]+\))?(?P<level>[>#]) ?$')
+TN_PRIV_PROMPT = re.compile(rb'(?m)^[\w.\-:/@]+(\([\w\-]+\))?#')
+
+
+def matchPrompt(text: str):
+    """ returns the prompt match when the buffer ends on a device prompt (R1> / R1# / R1(config-if)#) """
+    return PROMPT.match(text.rsplit('\n', 1)[-1].strip('\r'))
+
+
+def countPrompts(text: str) -> int:
+    """ privileged prompts seen in the buffer, whatever the hostname (a pushed config may rename the device) """
+    return len(PRIV_PROMPTS.findall(text))
+
+
+def splitTranscript(transcript: str, cmds: list) -> list:
+    """
+    cut a streamed transcript back into one record per command, using the
+    prompt that follows every echoed line as the boundary
+    """
+    records, start = [], 0
+    for c, prompt in zip(cmds, PRIV_PROMPTS.finditer(transcript)):
+        piece = transcript[start:prompt.start()]
+        start = prompt.end()
+        output = piece.split('\n', 1)[1] if '\n' in piece else ''
+        records.append({'command': c, 'output': output,
+                        'exit_status': 1 if CMD_ERRORS.search(output) else 0})
+    return records
+
+
+def failureReason(err: Exception) -> str:
+    """ coarse class of a session error : timeout / auth / error """
+    text = str(err)
+    if isinstance(err, socket.timeout) or 'timed out' in text:
+        return 'timeout'
+    if 'Authentication' in type(err).__name__ or 'Login Invalid' in text or 'password is not valid' in text:
+        return 'auth'
+    return 'error'
+
+
+CONFIG_NOISE = re.compile(r'^(!|end$|Building configuration|Current configuration)')
+# `exit` / `exit-address-family` ... : they close a mode, nothing to compare
+CONFIG_EXIT = re.compile(r'^exit(-[\w-]+)?$')
+# lines of `show running-config` that change without any configuration change
+CONFIG_VOLATILE = re.compile(r'^(Building configuration|Current configuration|! Last configuration change|'
+                             r'! NVRAM config last updated|! No configuration change since|ntp clock-period)')
+
+
+def parseConfig(lines: list) -> list:
+    """
+    IOS config as a tree of [line, children] following the indentation,
+    comments / headers of `show running-config` are dropped
+    """
+    root = []
+    stack = [(-1, root)]
+    for raw in lines:
+        line = raw.rstrip()
+        if line.strip() == '' or CONFIG_NOISE.match(line):
+            continue
+        depth = len(line) - len(line.lstrip(' '))
+        while depth <= stack[-1][0]:
+            stack.pop()
+        node = [line, []]
+        stack[-1][1].append(node)
+        stack.append((depth, node[1]))
+    return root
+
+
+def _configKey(line: str) -> str:
+    return ' '.join(line.split())
+
+
+def configDelta(running: list, desired: list) -> list:
+    """
+    desired lines missing from the running tree, each one under its section
+    header : a section is sent (with its header) only when something inside
+    differs, and `no X` unless the running config shows it (IOS does not print
+    the defaults, `no ip domain-lookup` is sent even when nothing mentions
+    the lookup). an `exit*` line is never
+    missing by itself, it is sent after the section it closes (or, closing its
+    parent, when anything before it was sent)
+    """
+    present = {_configKey(line): children for line, children in running}
+    delta = []
+    opened, closing = 0, None
+    for line, children in desired:
+        key = _configKey(line)
+        if CONFIG_EXIT.match(key):
+            if (len(delta) > opened) if closing is None else closing:
+                delta.append(line)
+            opened, closing = len(delta), None
+            continue
+        before, closing = len(delta), None
+        if children == []:
+            if key not in present:
+                delta.append(line)
+            continue
+        inner = configDelta(present.get(key, []), children)
+        if inner != [] or key not in present:
+            delta.append(line)
+            delta.extend(inner)
+        closing = len(delta) > before
+    return delta
+
+
+class SessionResult(object):
+    """
+    outcome of one device session, handed back to the parent by the execution engine
+    """
+
+    def __init__(self, host: str, method: str, status=False, output='', error=None, port=None):
+        self.host = host
+        self.port = port
+        self.method = method
+        self.status = status
+        self.output = output
+        self.error = error
+        self.reason = None
+        self.attempts = 1
+        self.compliant = None
+        self.digest = None
+        self.commands = []
+        self.timings = {}
+        self.sent = 0
+        self.received = 0
+        self.started = time.time()
+        self.duration = 0.0
+
+    def __repr__(self):
+        return f"<SessionResult {self.method}://{self.host} status={self.status}>"
+
+    def fail(self, err: Exception):
+        self.error = str(err)
+        self.reason = failureReason(err)
+
+    def connected(self) -> bool:
+        """ the session got past the connect step (its run phase was timed) """
+        return 'run' in self.timings
+
+    def phase(self, name: str, start: float) -> float:
+        """ time the phase `name` begun at `start` (monotonic) and return its end, where the next one begins """
+        now = time.monotonic()
+        self.timings[name] = now - start
+        return now
+
+    @classmethod
+    def fromRecord(cls, record: dict, started: float):
+        """ the result of a session run by a --worker, rebuilt from its record() """
+        result = cls(record['host'], record['method'], record['status'], error=record['error'])
+        for field in ('port', 'reason', 'attempts', 'compliant', 'digest', 'commands', 'timings', 'duration', 'sent', 'received'):
+            setattr(result, field, record[field])
+        result.started = started
+        return result
+
+    def record(self) -> dict:
+        return {'host': self.host, 'port': self.port, 'method': self.method, 'status': self.status, 'error': self.error, 'reason': self.reason,
+                'attempts': self.attempts, 'compliant': self.compliant, 'digest': self.digest,
+                'started': datetime.datetime.fromtimestamp(self.started).isoformat(timespec='milliseconds'),
+                'duration': round(self.duration, 6),
+                'timings': {k: round(v, 6) for k, v in self.timings.items()},
+                'sent': self.sent, 'received': self.received,
+                'commands': self.commands}
+
+
+class RunLog(object):
+    """
+    one append-only JSONL file per invocation, fed by the parent from the
+    worker results (one line per device) and flushed once at the end
+    """
+
+    def __init__(self, directory='reports'):
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+        self.path = os.path.join(directory, 'run_' + datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f') + '.jsonl')
+        self._fd = open(self.path, mode='a', buffering=1 << 20)
+
+    def write(self, result: SessionResult):
+        self._fd.write(json.dumps(result.record()) + '\n')
+
+    def close(self):
+        self._fd.close()
+
+
+class RunProfile(object):
+    """
+    --profile : latency of every session phase (p50 / p95 / max) and the slowest
+    devices of a run, from the timings of the results ; `dump` also writes a
+    cProfile of the parent (engine loop, callbacks & report writes) there
+    """
+
+    PHASES = ['dns', 'tcp', 'kex', 'auth', 'enable', 'exec', 'parse', 'store', 'connect', 'run', 'report']
+
+    def __init__(self, slowest=PROFILE_SLOWEST, dump=None):
+        self.slowest = max(0, slowest)
+        self.dump = dump
+        self.closing = 0.0
+        self._phases = {}
+        self._sessions = []
+        self._cprofile = None if dump is None else require('cProfile').Profile()
+
+    def start(self):
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.dump)
+
+    def add(self, result: SessionResult, report: float):
+        """ timings of one finished session, `report` the seconds spent writing its records """
+        for phase, seconds in result.timings.items():
+            self._phases.setdefault(phase, []).append(seconds)
+        self._phases.setdefault('report', []).append(report)
+        self._sessions.append((result.duration, result.host, result.timings))
+
+    @staticmethod
+    def percentile(values: list, q: float) -> float:
+        """ nearest rank of sorted `values` """
+        return values[max(0, require('math').ceil(q * len(values)) - 1)]
+
+    def show(self):
+        print(f"[+] profile of {len(self._sessions)} session(s)")
+        print(f"\t{'phase':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total s':>10}")
+        for phase in self.PHASES + sorted(set(self._phases) - set(self.PHASES)):
+            values = sorted(self._phases.get(phase, []))
+            if values == []:
+                continue
+            print(f"\t{phase:<10}{len(values):>8}{self.percentile(values, 0.5) * 1000:>10.1f}"
+                  f"{self.percentile(values, 0.95) * 1000:>10.1f}{values[-1] * 1000:>10.1f}{sum(values):>10.2f}")
+        print(f"\t{'reports & job state closed in':<40}{self.closing * 1000:>10.1f} ms")
+        slowest = require('heapq').nlargest(self.slowest, self._sessions, key=lambda session: session[0])
+        if slowest != []:
+            print(f"[+] {len(slowest)} slowest device(s)")
+        for duration, host, timings in slowest:
+            phases = [f"{phase} {timings[phase] * 1000:.0f}" for phase in self.PHASES if phase in timings
+                      and phase not in ('connect', 'run')]
+            # executor scheduling & thread start, outside of every session phase
+            other = duration - sum(timings.get(phase, 0.0) for phase in ('connect', 'run', 'parse', 'store'))
+            print(f"\t{host:<20}{duration * 1000:>10.1f} ms  ({', '.join(phases + [f'other {max(0.0, other) * 1000:.0f}'])})")
+        if self.dump is not None:
+            print(f"[+] cProfile of the parent saved in {self.dump} (python3 -m pstats {self.dump})")
+
+
+class Metrics(object):
+    """
+    OpenMetrics counters, gauges & histograms of the sessions, fed by the parent
+    from the engine callbacks (shards of --workers included) : written as a
+    textfile at the end of a run, or served on /metrics by --daemon & --worker
+    """
+
+    FAMILIES = [
+        # name, type, unit, help
+        ('cna_sessions_started', 'counter', None, 'sessions opened (every retry included)'),
+        ('cna_sessions_succeeded', 'counter', None, 'sessions ended without error'),
+        ('cna_sessions_failed', 'counter', None, 'sessions ended with an error, by reason'),
+        ('cna_devices_skipped', 'counter', None, 'devices not connected (pre-flight, circuit breaker, template)'),
+        ('cna_session_sent_bytes', 'counter', 'bytes', 'bytes written on the device sockets'),
+        ('cna_session_received_bytes', 'counter', 'bytes', 'bytes read from the device sockets'),
+        ('cna_session_phase_seconds', 'histogram', 'seconds', 'latency of every session phase'),
+        ('cna_sessions_inflight', 'gauge', None, 'sessions open right now'),
+        ('cna_sessions_inflight_max', 'gauge', None, 'most sessions open at the same time'),
+        ('cna_runs', 'counter', None, 'runs (or daemon jobs) finished'),
+        ('cna_run_duration_seconds', 'gauge', 'seconds', 'duration of the last run'),
+        ('cna_run_last_timestamp_seconds', 'gauge', 'seconds', 'end of the last run (unix time)'),
+    ]
+
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._histograms = {}
+        self.inflight = 0
+        self.peak = 0
+
+    def _add(self, name: str, labels: tuple, value=1):
+        samples = self._samples.setdefault(name, {})
+        samples[labels] = samples.get(labels, 0) + value
+
+    def started(self, method: str):
+        with self._lock:
+            self._add('cna_sessions_started', (('method', method),))
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+
+    def finished(self, result: SessionResult):
+        """ one device is done : each of its attempts was a started session """
+        bisect = require('bisect')
+        method = (('method', result.method),)
+        with self._lock:
+            self.inflight = max(0, self.inflight - result.attempts)
+            if result.status == True:
+                self._add('cna_sessions_succeeded', method)
+            else:
+                self._add('cna_sessions_failed', method + (('reason', result.reason or 'command'),))
+            self._add('cna_session_sent_bytes', method, result.sent)
+            self._add('cna_session_received_bytes', method, result.received)
+            for phase, seconds in list(result.timings.items()) + [('session', result.duration)]:
+                counts = self._histograms.setdefault((('phase', phase),), [[0] * (len(self.buckets) + 1), 0.0])
+                counts[0][bisect.bisect_left(self.buckets, seconds)] += 1
+                counts[1] += seconds
+
+    def skipped(self, method: str, count=1):
+        with self._lock:
+            self._add('cna_devices_skipped', (('method', method),), count)
+
+    def run(self, duration: float):
+        with self._lock:
+            self._add('cna_runs', ())
+            self._samples['cna_run_duration_seconds'] = {(): duration}
+            self._samples['cna_run_last_timestamp_seconds'] = {(): time.time()}
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        if labels == ():
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+    def render(self) -> str:
+        """ the OpenMetrics text exposition of every family """
+        lines = []
+        with self._lock:
+            self._samples['cna_sessions_inflight'] = {(): self.inflight}
+            self._samples['cna_sessions_inflight_max'] = {(): self.peak}
+            for name, kind, unit, text in self.FAMILIES:
+                lines.append(f'# TYPE {name} {kind}')
+                if unit is not None:
+                    lines.append(f'# UNIT {name} {unit}')
+                lines.append(f'# HELP {name} {text}')
+                if kind == 'histogram':
+                    for labels, (counts, total) in sorted(self._histograms.items()):
+                        cumulative = 0
+                        for bound, count in zip(self.buckets + (float('inf'),), counts):
+                            cumulative += count
+                            le = '+Inf' if bound == float('inf') else repr(bound)
+                            lines.append(f'{name}_bucket{self._labels(labels + (("le", le),))} {cumulative}')
+                        lines.append(f'{name}_count{self._labels(labels)} {cumulative}')
+                        lines.append(f'{name}_sum{self._labels(labels)} {round(total, 6)}')
+                    continue
+                suffix = '_total' if kind == 'counter' else ''
+                for labels, value in sorted(self._samples.get(name, {}).items()):
+                    lines.append(f'{name}{suffix}{self._labels(labels)} {round(value, 6)}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """ replace the textfile at once, a collector never reads half of it """
+        directory = os.path.dirname(path)
+        if directory != '' and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path + '.tmp', mode='w') as f:
+            f.write(self.render())
+        os.replace(path + '.tmp', path)
+
+    def serve(self, address: str):
+        """ /metrics over HTTP on `address` (port or host:port) from a background thread """
+        server = require('http.server')
+        host, _, port = address.rpartition(':')
+        registry = self
+
+        class Handler(server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    return self.send_error(404)
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        httpd = server.ThreadingHTTPServer((host.strip('[]') or METRICS_HOST, int(port)), Handler)
+        httpd.daemon_threads = True
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        msg.info(f"metrics on http://{host or METRICS_HOST}:{port}/metrics")
+        return httpd
+
+
+class BackupStore(object):
+    """
+    content-addressed running-configs : every normalized config is one zlib
+    object named by its sha256 under objects/<2 first chars>/, written once,
+    so a config seen before (on any device, any night) costs no write at all
+    """
+
+    def __init__(self, directory=BACKUP_STORE):
+        self.directory = os.path.join(directory, 'objects')
+        self.written = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """ the config without its volatile headers & timestamps, one trailing newline """
+        lines = [line.rstrip() for line in text.replace('\r', '').split('\n')]
+        lines = [line for line in lines if not CONFIG_VOLATILE.match(line)]
+        while lines != [] and lines[0] in ('', '!'):
+            lines.pop(0)
+        return '\n'.join(lines).strip('\n') + '\n'
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, text: str) -> tuple:
+        """ store a running-config, returns (digest, size of the normalized text) """
+        hashlib = require('hashlib')
+        data = self.normalize(text).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            blob = require('zlib').compress(data, 9)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # unique temporary name, then an atomic rename : concurrent workers
+            # storing the same config never leave a partial object behind
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, mode='wb') as fd:
+                fd.write(blob)
+            os.replace(tmp, path)
+            with self._lock:
+                self.written += 1
+                self.bytes += len(blob)
+        return digest, len(data)
+
+    def get(self, digest: str) -> str:
+        with open(self.path(digest), mode='rb') as fd:
+            return require('zlib').decompress(fd.read()).decode('utf-8')
+
+    def latest(self, rows: list) -> dict:
+        """ last digest of every device of `rows`, by (category, id) """
+        last = {}
+        for cat in {row['category'] for row in rows}:
+            ids = [row['id'] for row in rows if row['category'] == cat]
+            for i in range(0, len(ids), 500):
+                query = Backup.select(Backup.device, Backup.digest).where(
+                    (Backup.category == cat) & (Backup.device.in_(ids[i:i + 500]))).order_by(Backup.id)
+                last.update({(cat, b.device): b.digest for b in query})
+        return last
+
+    @staticmethod
+    def index(entries: list):
+        with db.atomic():
+            for i in range(0, len(entries), 200):
+                Backup.insert_many(entries[i:i + 200]).execute()
+
+
+class OutputParser(object):
+    """
+    TextFSM parsing of show commands, the template of a command is found in
+    the ntc-templates style `index` of `directory`. every template is compiled
+    once per process and shared by the workers (one parse at a time each)
+    """
+
+    def __init__(self, directory=TEMPLATES_DIR, platform=PARSE_PLATFORM):
+        csv = require('csv')
+        self.directory = directory
+        self._index = []
+        self._commands = {}
+        self._templates = {}
+        self._lock = threading.Lock()
+        with open(os.path.join(directory, 'index'), mode='r') as fd:
+            lines = [line for line in fd if line.strip() != '' and not line.startswith('#')]
+        for row in csv.DictReader(lines, skipinitialspace=True):
+            if re.match(row['Platform'].strip(), platform):
+                self._index.append((re.compile(self._expand(row['Command'].strip())), row['Template'].strip()))
+
+    @staticmethod
+    def _expand(command: str) -> str:
+        """ sh[[ow]] -> sh(o(w)?)? """
+        return re.sub(r'\[\[(.+?)\]\]', lambda m: ''.join('(' + c for c in m.group(1)) + ')?' * len(m.group(1)), command)
+
+    def template(self, command: str):
+        """ template file of `command` (`do ...` of conf t included), None when there is none """
+        command = ' '.join(command.split())
+        if command.startswith('do '):
+            command = command[3:]
+        if command not in self._commands:
+            self._commands[command] = next((t for regex, t in self._index if regex.match(command)), None)
+        return self._commands[command]
+
+    def _compiled(self, name: str) -> tuple:
+        with self._lock:
+            if name not in self._templates:
+                textfsm = require('textfsm')
+                with open(os.path.join(self.directory, name), mode='r') as fd:
+                    self._templates[name] = (textfsm.TextFSM(fd), threading.Lock())
+            return self._templates[name]
+
+    def parse(self, command: str, output: str) -> tuple:
+        """ (template, [{field: value}]) of one command output, (None, None) without template """
+        name = self.template(command)
+        if name is None:
+            return None, None
+        fsm, lock = self._compiled(name)
+        with lock:
+            fsm.Reset()
+            rows = fsm.ParseText(output)
+            header = [field.lower() for field in fsm.header]
+        return name, [dict(zip(header, row)) for row in rows]
+
+
+class ParsedLog(object):
+    """
+    parsed records of a run, fed by the parent like the RunLog : JSONL (one
+    line per device & command) or one CSV per template (one line per record)
+    """
+
+    def __init__(self, fmt='json', directory='reports'):
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+        self.fmt = fmt
+        self._base = os.path.join(directory, 'parsed_' + datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f'))
+        self._files = {}
+        self._writers = {}
+        self.paths = []
+
+    def _open(self, key: str, path: str):
+        if key not in self._files:
+            self._files[key] = open(path, mode='w', newline='', buffering=1 << 20)
+            self.paths.append(path)
+        return self._files[key]
+
+    def write(self, row: dict, result: SessionResult):
+        for record in result.commands:
+            if record.get('parsed') is None:
+                continue
+            if self.fmt == 'json':
+                self._open('json', self._base + '.jsonl').write(json.dumps(
+                    {'host': row['host'], 'hostname': row['hostname'], 'command': record['command'],
+                     'template': record['template'], 'records': record['parsed']}) + '\n')
+            elif record['parsed'] != []:
+                name = record['template'].rsplit('.', 1)[0]
+                if name not in self._writers:
+                    self._writers[name] = require('csv').DictWriter(
+                        self._open(name, f'{self._base}_{name}.csv'), ['host', 'hostname', 'command'] + list(record['parsed'][0]))
+                    self._writers[name].writeheader()
+                for values in record['parsed']:
+                    self._writers[name].writerow(
+                        {'host': row['host'], 'hostname': row['hostname'], 'command': record['command'], **values})
+
+    def close(self):
+        for fd in self._files.values():
+            fd.close()
+
+
+class StreamTable(object):
+    """
+    the termtables layout printed while the rows arrive : column widths are
+    given up front (e.g. by a MAX(LENGTH()) query) instead of measured on
+    every row, so nothing has to be held in memory
+    """
+
+    def __init__(self, header: list, widths: list, out=None):
+        self.out = out or sys.stdout
+        self.widths = [max(len(h), w or 0) for h, w in zip(header, widths)]
+        self._count = 0
+        self.out.write(self._line('┌', '─', '┬', '┐') + self._cells(header) + self._line('╞', '═', '╪', '╡'))
+
+    def _line(self, left: str, fill: str, cross: str, right: str) -> str:
+        return left + cross.join(fill * (w + 2) for w in self.widths) + right + '\n'
+
+    def _cells(self, values) -> str:
+        return '│' + '│'.join(f' {str(v):<{w}} ' for v, w in zip(values, self.widths)) + '│\n'
+
+    def rows(self, rows: list):
+        sep = self._line('├', '─', '┼', '┤')
+        self.out.write(''.join((sep if self._count + n > 0 else '') + self._cells(row) for n, row in enumerate(rows)))
+        self._count += len(rows)
+        self.out.flush()
+
+    def close(self):
+        self.out.write(self._line('└', '─', '┴', '┘'))
+
+
+class ConfigTemplate(object):
+    """
+    --config-file used as a template : `$name` / `${name}` are replaced by the
+    device row (id, hostname, host, category, device_type) and the vars file,
+    a literal `$` (e.g. `enable secret 5 $$1$$salt$$hash`) is written `$$`.
+    the file is compiled once per run and its renderings are kept in memory by
+    set of variables, never on disk (they hold secrets)
+    """
+
+    FIELDS = ('id', 'hostname', 'host', 'category', 'device_type')
+
+    def __init__(self, file: str, variables=None):
+        string = require('string')
+        with open(file, mode='r') as f:
+            source = f.read()
+        self._template = string.Template(source)
+        self.identifiers = set()
+        for m in self._template.pattern.finditer(source):
+            name = m.group('named') or m.group('braced')
+            if name is not None:
+                self.identifiers.add(name)
+        self._vars = variables if variables is not None else {}
+        self._cache = {}
+        self.hits = 0
+        if os.path.isdir(RENDER_CACHE):
+            require('shutil').rmtree(RENDER_CACHE, ignore_errors=True)
+
+    @staticmethod
+    def loadVars(file: str) -> dict:
+        """ JSON object : {"*": {defaults}, "<id|host|hostname>": {variables}} """
+        if file is None:
+            return {}
+        with open(file, mode='r') as f:
+            return json.load(f)
+
+    def variables(self, row: dict) -> dict:
+        values = {k: str(row[k]) for k in self.FIELDS if k in row}
+        for key in ('*', str(row.get('id')), row.get('host'), row.get('hostname')):
+            values.update(self._vars.get(key, {}))
+        return values
+
+    def render(self, row: dict) -> list:
+        """ config lines for one device, raises KeyError on a variable without value """
+        values = self.variables(row)
+        missing = self.identifiers - set(values)
+        if missing != set():
+            raise KeyError(', '.join(sorted(missing)))
+        key = json.dumps(values, sort_keys=True)
+        if key in self._cache:
+            self.hits += 1
+        else:
+            self._cache[key] = self._template.safe_substitute(values).splitlines()
+        return list(self._cache[key])
+
+
+class CountingSocket(object):
+    """ socket of a session, counting the bytes it sends & receives (anything else is the socket's) """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.sent = 0
+        self.received = 0
+
+    def send(self, data, *flags) -> int:
+        sent = self._sock.send(data, *flags)
+        self.sent += sent
+        return sent
+
+    def sendall(self, data, *flags):
+        self._sock.sendall(data, *flags)
+        self.sent += len(data)
+
+    def recv(self, size: int, *flags) -> bytes:
+        data = self._sock.recv(size, *flags)
+        self.received += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
 
 
 class TelnetSession:
-    def __init__(self, _host: str, _user: str, _pass: str, _port: str, _priv:str, cmd: list):
+    """
+    expect driven telnet session : every step waits for the device answer
+    (username / password / any hostname prompt) with its own timeout
+    """
+
+    def __init__(self, _host: str, _user: str, _pass: str, _port: str, _priv:str, cmd: list, timeout=DEFAULT_TIMEOUT,
+                 window=DEFAULT_WINDOW, diff=False, backup=False):
         self._host = _host
         self._user = _user
         self._pass = _pass
         self._port = _port
         self._priv = _priv
         self._cmd = cmd
-        self._r_name = 'reports/'+_host+'_' + \
-            datetime.datetime.now().strftime('%Y-%m-%d_%H:%M:%S_')+".txt"
-        self.saved = open(self._r_name, mode='w')
+        self._timeout = timeout
+        self._window = max(1, int(window))
+        self._diff = diff
+        self._backup = backup
+        self.et = False
+        self.result = SessionResult(_host, 'telnet', port=_port)
 
+        start = time.monotonic()
         try:
-            self._tn = telnetlib.Telnet(self._host, self._port)
+            telnetlib = require('telnetlib')
+            address = socket.getaddrinfo(self._host, int(self._port), type=socket.SOCK_STREAM)[0][4]
+            step = self.result.phase('dns', start)
+            self._tn = telnetlib.Telnet(address[0], address[1], self._timeout)
+            self._tn.sock = self.socket = CountingSocket(self._tn.sock)
+            self.result.phase('tcp', step)
+            self.et = True
             msg.success(f'Connection established on {msg.GREEN}{self._host}{msg.RESET} !!')
             msg.info(
                 f"configuration started on {msg.GREEN}{self._host}{msg.RESET}.")
         except Exception as err:
+            self.result.fail(err)
             msg.failure(err, True)
+        self.result.timings['connect'] = time.monotonic() - start
 
     def run(self):
-        msg.info('starting login ...')
-        self._tn.read_until(b"Username: ")
-        self._tn.write(self._user.encode('ascii') + b"\n")
-        time.sleep(1)
-        self._tn.read_until(b"Password: ")
-        self._tn.write(self._pass.encode('ascii') + b"\n")
-        time.sleep(1)
-        check_en = self._tn.read_very_eager()
-        if (check_en == b'\r\n% Login invalid\r\n\r\nUsername: ') or (check_en == b''):
-            msg.failure(f"Login Invalid ", very=True)
-        if check_en == b'\r\nR1>':
+        if self.et == False:
+            return self.result
+        cmds = [self._cmd] if type(self._cmd) == str else self._cmd
+        start = time.monotonic()
+        try:
+            msg.info('starting login ...')
+            level = self._login()
+            step = self.result.phase('auth', start)
             msg.success("Login Success.")
-            if self._priv == "-":
-                msg.failure('Password for Privileged mode detected , but no password was set.', very=True)
+            if level == b'>':
+                self._enable()
+                msg.success('Privileged mode password is valid')
+            self._send('terminal length 0')
+            self._expect([TN_PROMPT], 'terminal length')
+            step = self.result.phase('enable', step)
+            if self._backup == True:
+                self.result.output = self._showRun()
+                self.result.phase('exec', step)
+                self.result.status = True
+                msg.success(f"running-config of {msg.GREEN}{self._host}{msg.RESET} collected.")
+                return self.result
+            if self._diff == True:
+                cmds = configDelta(parseConfig(self._showRun().split('\n')), parseConfig(cmds))
+                self.result.compliant = cmds == []
+                if cmds == []:
+                    self.result.phase('exec', step)
+                    msg.success(f"{msg.GREEN}{self._host}{msg.RESET} is already compliant, nothing to push.")
+                    self.result.status = True
+                    return self.result
+            self.result.output = self._configure(cmds)
+            self.result.phase('exec', step)
+            self.result.commands = splitTranscript(self.result.output, cmds)
+            self.result.status = CMD_ERRORS.search(self.result.output) is None
+            if self.result.status == True:
+                msg.success(f"configuration ended on {msg.GREEN}{self._host}{msg.RESET} with successfully.")
             else:
-                msg.info('Password for Privileged mode detected')
-                self._tn.write(b'enable\n')
-                time.sleep(1)
-                self._tn.write(self._priv.encode('ascii') + b"\n")
-                time.sleep(1)
-                check_go = self._tn.read_very_eager()
-                if  check_go == b'enable\r\nPassword: \r\nR1#':
-                    self._tn.write("conf t".encode('ascii') + b"\n")
-                    msg.success('Privileged mode password is valid')
-                    time.sleep(1)
-                    if type(self._cmd) == str:
-                        self._tn.write(self._cmd.encode('ascii') + b'\n')
-                    else:
-                        for c in self._cmd:
-                            self._tn.write(c.encode('ascii') + b'\n')
-                        #print(self._tn.read_all().decode('ascii'))
-                    time.sleep(1)
-                    final_r = self._tn.read_very_eager()
-                    self.saved.write(final_r.decode())
-                    msg.success(f"configuration ended on {msg.GREEN}{self._host}{msg.RESET} with successfully, rapport saved in {msg.RED}'{msg.YELLOW}{self._r_name}{msg.RED}'.")
-                    self.saved.close()
-                else:
-                    msg.failure('Privileged mode password is not valid, please make sure you are set the correct one.',vary=True)
+                self.result.error = 'command errors'
+                msg.failure(f"configuration ended on {msg.YELLOW}{self._host}{msg.RESET} with some errors.", very=True)
+        except Exception as err:
+            self.result.fail(err)
+            msg.failure(f"{self._host} : {err}", very=True)
+        finally:
+            self._tn.close()
+            self.result.timings['run'] = time.monotonic() - start
+            self.result.sent, self.result.received = self.socket.sent, self.socket.received
+        return self.result
+
+    def _expect(self, patterns: list, step: str) -> tuple:
+        index, match, data = self._tn.expect(patterns, self._timeout)
+        if index < 0:
+            raise socket.timeout(f'{step} : no answer from {self._host} after {self._timeout} second(s)')
+        return index, match, data
+
+    def _send(self, line: str):
+        self._tn.write(line.encode('ascii') + b"\n")
+
+    def _sendMany(self, lines: list):
+        self._tn.write(b''.join(line.encode('ascii') + b"\n" for line in lines))
+
+    def _login(self) -> bytes:
+        index, match, _ = self._expect([TN_USERNAME, TN_PASSWORD, TN_PROMPT], 'login')
+        if index == 0:
+            self._send(self._user)
+            index, match, _ = self._expect([TN_PASSWORD, TN_PROMPT], 'username')
+            index += 1
+        if index == 1:
+            self._send(self._pass)
+            index, match, _ = self._expect([TN_INVALID, TN_USERNAME, TN_PASSWORD, TN_PROMPT], 'password')
+            if index != 3:
+                raise Exception('Login Invalid')
+        return match.group('level')
+
+    def _enable(self):
+        if self._priv == "-":
+            raise Exception('Password for Privileged mode detected , but no password was set.')
+        msg.info('Password for Privileged mode detected')
+        self._send('enable')
+        index, match, _ = self._expect([TN_PASSWORD, TN_PROMPT], 'enable')
+        if index == 1 and match.group('level') == b'#':
+            # no enable password configured, straight to privileged mode
+            return
+        if index == 0:
+            self._send(self._priv)
+            index, match, _ = self._expect([TN_INVALID, TN_PASSWORD, TN_PROMPT], 'enable password')
+        if index != 2 or match.group('level') != b'#':
+            raise Exception('Privileged mode password is not valid, please make sure you are set the correct one.')
+
+    def _showRun(self) -> str:
+        self._send('show running-config')
+        _, _, data = self._expect([TN_PRIV_PROMPT], 'show running-config')
+        return splitTranscript(data.decode('utf-8', 'replace').replace('\r', ''), ['show running-config'])[0]['output']
+
+    def _configure(self, cmds: list) -> str:
+        self._send('conf t')
+        self._expect([TN_PROMPT], 'conf t')
+        # one privileged prompt answers every line sent, the last one follows `end`.
+        # at most `window` lines are ahead of the device echo, topped up in one
+        # write each time half of them are answered, so its input buffer never overflows
+        lines = cmds + ['end']
+        transcript, sent = [], 0
+        for done in range(len(lines)):
+            if sent < len(lines) and sent - done <= self._window // 2:
+                batch = lines[sent:done + self._window]
+                self._sendMany(batch)
+                sent += len(batch)
+            _, _, data = self._expect([TN_PRIV_PROMPT], 'configuration')
+            transcript.append(data)
+        return b''.join(transcript).decode('utf-8', 'replace').replace('\r', '')
+
+
+class HostKeyTimer(object):
+    """
+    missing host key policy of the sessions (keys auto added, as AutoAddPolicy) :
+    paramiko asks it once the key exchange is over, before authenticating
+    """
 
+    def __init__(self):
+        self.at = None
+
+    def missing_host_key(self, client, hostname, key):
+        self.at = time.monotonic()
+        client.get_host_keys().add(hostname, key.get_name(), key)
 
 
 class SSHSession:
-    def __init__(self, _host: str, _user: str, _pass: str, _port: str, keys: str, _priv:str, cmd: list):
+    def __init__(self, _host: str, _user: str, _pass: str, _port: str, keys: str, _priv:str, cmd: list, shell=False, timeout=DEFAULT_TIMEOUT,
+                 diff=False, backup=False):
         self.et = False
-        self._r_name = 'reports/'+_host+'_' + \
-            datetime.datetime.now().strftime('%Y-%m-%d_%H:%M:%S_')+".txt"
-        self.saved = open(self._r_name, mode='w')
         self._host = _host
         self._user = _user
         self._pass = _pass
@@ -251,63 +1484,175 @@ class SSHSession:
         self._keys = keys if keys != '' else ''
         self._cmd = cmd
         self._priv = _priv
+        self._shell = shell or diff or backup
+        self._diff = diff
+        self._backup = backup
+        self._timeout = timeout
         self.status_success = False
+        self.result = SessionResult(_host, 'ssh', port=_port)
+        self.socket = None
+        start = time.monotonic()
+        sock = None
         try:
+            paramiko = require('paramiko')
             self.conn_setup = paramiko.SSHClient()
-            self.conn_setup.set_missing_host_key_policy(
-                paramiko.AutoAddPolicy())
+            kex = HostKeyTimer()
+            self.conn_setup.set_missing_host_key_policy(kex)
+            # resolved & connected here, paramiko only runs the SSH handshake on the socket
+            family, kind, proto, _, address = socket.getaddrinfo(self._host, int(self._port), type=socket.SOCK_STREAM)[0]
+            step = self.result.phase('dns', start)
+            sock = socket.socket(family, kind, proto)
+            sock.settimeout(self._timeout)
+            sock.connect(address)
+            step = self.result.phase('tcp', step)
+            sock = self.socket = CountingSocket(sock)
             if self._keys == '':
-                self.conn_setup.connect(self._host, port=self._port, username=self._user,
-                                        password=self._pass, look_for_keys=False, allow_agent=False)
+                self.conn_setup.connect(self._host, port=self._port, username=self._user, password=self._pass,
+                                        look_for_keys=False, allow_agent=False, timeout=self._timeout, sock=sock)
             else:
-                self.conn_setup.connect(self._host, port=self._port, username=self._user,
-                                        key_filename=self._keys, look_for_keys=False, allow_agent=False)
+                self.conn_setup.connect(self._host, port=self._port, username=self._user, key_filename=self._keys,
+                                        look_for_keys=False, allow_agent=False, timeout=self._timeout, sock=sock)
+            if kex.at is not None:
+                self.result.timings['kex'] = kex.at - step
+                step = kex.at
+            self.result.phase('auth', step)
             self.connection = self.conn_setup
             self.et = True
             msg.success(f'Connection established on {msg.GREEN}{self._host}{msg.RESET} !!')
             msg.info(
                 f"configuration started on {msg.GREEN}{self._host}{msg.RESET}.")
         except Exception as err:
+            self.result.fail(err)
             msg.failure(str(err), True)
+            if sock is not None:
+                sock.close()
+        self.result.timings['connect'] = time.monotonic() - start
+        if self.socket is not None:
+            self.result.sent, self.result.received = self.socket.sent, self.socket.received
 
     def run(self):
         if self.et == False:
-            self.saved.close()
-            return None
-        
-        if self.et == True:
-            if type(self._cmd) == str:
-                c = self._cmd
-                stdin, stdout, stderr = self.connection.exec_command(c)
-                if len(stderr.readlines()) == 0:
-                    for line in stdout.readlines():
-                        # print(line.strip('\n'))
-                        self.saved.write(line)
-                    self.status_success = True
-                if len(stdout.readlines()) == 0:
-                    for line in stderr.readlines():
-                        # print(line.strip('\n'))
-                        self.saved.write(line)
+            return self.result
+
+        output = []
+        cmds = [self._cmd] if type(self._cmd) == str else self._cmd
+        start = time.monotonic()
+        # past the connect step commands may have been sent : any error ends the
+        # session as connected & failed, so the engine never retries it
+        try:
+            if self._shell == True:
+                transcript = self._runShell(cmds)
+                output.append(transcript)
+                self.result.commands = splitTranscript(transcript, self._pushed)
             else:
-                for c in self._cmd:
+                for c in cmds:
                     stdin, stdout, stderr = self.connection.exec_command(c)
-                    if len(stderr.readlines()) == 0:
-                        for line in stdout.readlines():
-                            #print(line.strip('\n'))
-                            self.saved.write(line)
+                    out_lines = stdout.readlines()
+                    err_lines = stderr.readlines()
+                    if len(err_lines) == 0:
                         self.status_success = True
-                    if len(stdout.readlines()) == 0:
-                        for line in stderr.readlines():
-                            #print(line.strip('\n'))
-                            self.saved.write(line)
+                        output.extend(out_lines)
+                    else:
+                        output.extend(err_lines)
+                    self.result.commands.append({'command': c, 'output': ''.join(out_lines + err_lines),
+                                                 'exit_status': stdout.channel.recv_exit_status()})
+        except Exception as err:
+            self.status_success = False
+            self.result.fail(err)
+            msg.failure(f"{self._host} : {err}", very=True)
+        finally:
+            self.result.timings['exec'] = time.monotonic() - start - self.result.timings.get('enable', 0.0)
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.result.timings['run'] = time.monotonic() - start
+        self.result.sent, self.result.received = self.socket.sent, self.socket.received
+        self.result.output = ''.join(output)
+        self.result.status = self.status_success
         if self.status_success != False:
             msg.success(
-                f"configuration ended on {msg.GREEN}{self._host}{msg.RESET} with successfully, rapport saved in {msg.RED}'{msg.YELLOW}{self._r_name}{msg.RED}'.")
+                f"configuration ended on {msg.GREEN}{self._host}{msg.RESET} with successfully.")
         else:
+            if self.result.error is None:
+                self.result.error = 'command errors'
             msg.failure(
-                f"configuration ended on {msg.YELLOW}{self._host}{msg.RESET} with some errors, rapport saved in {msg.RED}'{msg.YELLOW}{self._r_name}{msg.RED}'.", very=True)
-        self.saved.write("\n")
-        self.saved.close()
+                f"configuration ended on {msg.YELLOW}{self._host}{msg.RESET} with some errors.", very=True)
+        return self.result
+
+    def _runShell(self, cmds: list) -> str:
+        """
+        one interactive channel for the whole session : enable & conf t are
+        handled once, then every command is streamed without waiting per line
+        """
+        start = time.monotonic()
+        self.openShell()
+        self.result.phase('enable', start)
+        self._pushed = cmds
+        if self._backup == True:
+            self._pushed = []
+            self.status_success = True
+            return self._showRun()
+        if self._diff == True:
+            self._pushed = configDelta(parseConfig(self._showRun().split('\n')), parseConfig(cmds))
+            self.result.compliant = self._pushed == []
+            if self._pushed == []:
+                msg.success(f"{msg.GREEN}{self._host}{msg.RESET} is already compliant, nothing to push.")
+                self.status_success = True
+                return ''
+        transcript = self.push(self._pushed, configure=True)
+        self.status_success = CMD_ERRORS.search(transcript) is None
+        return transcript
+
+    def _showRun(self) -> str:
+        return splitTranscript(self.push(['show running-config'], configure=False), ['show running-config'])[0]['output']
+
+    def openShell(self):
+        """ interactive channel left on the privileged prompt, paging disabled """
+        self._chan = self.connection.invoke_shell(width=511)
+        _, prompt = self._readUntil(lambda buf: matchPrompt(buf))
+        if prompt.group('level') == '>':
+            if self._priv == '-':
+                raise Exception('Password for Privileged mode detected , but no password was set.')
+            self._chan.sendall('enable\n')
+            self._readUntil(lambda buf: re.search(r'[Pp]assword: ?$', buf))
+            self._chan.sendall(self._priv + '\n')
+            _, prompt = self._readUntil(lambda buf: matchPrompt(buf))
+            if prompt.group('level') != '#':
+                raise Exception('Privileged mode password is not valid, please make sure you are set the correct one.')
+        self._chan.sendall('terminal length 0\n')
+        self._readUntil(lambda buf: countPrompts(buf) >= 1 and matchPrompt(buf))
+
+    def push(self, cmds: list, configure=True) -> str:
+        """
+        stream `cmds` on the open shell, inside conf t / end when `configure`,
+        and return the transcript : every streamed line answers with exactly one
+        prompt, so it is complete once all of them came back
+        """
+        if configure == True:
+            self._chan.sendall('conf t\n')
+            self._readUntil(lambda buf: countPrompts(buf) >= 1 and matchPrompt(buf))
+            cmds = cmds + ['end']
+        self._chan.sendall(''.join(c + '\n' for c in cmds))
+        transcript, _ = self._readUntil(
+            lambda buf: countPrompts(buf) >= len(cmds) and matchPrompt(buf))
+        return transcript.replace('\r', '')
+
+    def _readUntil(self, done) -> tuple:
+        buf = ''
+        deadline = time.monotonic() + self._timeout
+        while True:
+            found = done(buf)
+            if found:
+                return buf, found
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout(f'no prompt from {self._host} after {self._timeout} second(s)')
+            self._chan.settimeout(remaining)
+            data = self._chan.recv(65535)
+            if data == b'':
+                raise EOFError(f'channel closed by {self._host}')
+            buf += data.decode('utf-8', 'replace')
 
 
 def isInSupportedTypes(text):
@@ -339,6 +1684,100 @@ def isNumber(text):
             return False
 
 
+def readInventory(file: str):
+    """ (position, row) of every device of a CSV file or of a JSON list """
+    if file.lower().endswith('.json'):
+        with open(file, mode='r') as fd:
+            data = json.load(fd)
+        for n, raw in enumerate(data if isinstance(data, list) else [], 1):
+            yield f"{file}[{n}]", raw if isinstance(raw, dict) else {}
+        return
+    csv = require('csv')
+    with open(file, mode='r', newline='') as fd:
+        reader = csv.DictReader(fd)
+        for raw in reader:
+            yield f"{file}:{reader.line_num}", raw
+
+
+def _flag(value) -> bool:
+    return str(value).strip().lower() in ('true', 'yes', 'y', '1')
+
+
+def deviceRow(raw: dict, category=None) -> dict:
+    """
+    one imported row as a Device row (clear passwords, encrypted by the caller)
+    plus its `tags`, raises ValueError with the reason when the row is not usable.
+    telnet / ssh default to `yes` when their username & password are given
+    """
+    if isinstance(raw.get('tags'), list):
+        raw = {**raw, 'tags': ' '.join(str(t) for t in raw['tags'])}
+    raw = {k.strip().lower(): ('' if v is None else str(v).strip()) for k, v in raw.items() if k is not None}
+    category = (raw.get('category') or category or '').lower()
+    category = {'r': 'routers', 's': 'switches', 'o': 'others'}.get(category[:1], category)
+    if category not in CATEGORIES.values():
+        raise ValueError(f"unknown category `{raw.get('category', '')}` (routers / switches / others)")
+    for field in ('hostname', 'host'):
+        if raw.get(field, '') == '':
+            raise ValueError(f"no {field}")
+    row = {'category': category, 'hostname': raw['hostname'], 'host': raw['host'], 'ipv4': ipv4Int(raw['host']),
+           'tags': sorted(set(re.split(r'[\s,;]+', raw.get('tags', ''))) - {''}),
+           'device_type': raw.get('device_type') or 'cisco_ios', 'priv_pass': raw.get('priv_pass') or '-'}
+    for method, port in (('telnet', '23'), ('ssh', '22')):
+        user, password = raw.get(f'{method}_username', ''), raw.get(f'{method}_password', '')
+        enabled = _flag(raw[method]) if raw.get(method, '') != '' else (user != '' and password != '')
+        row[method] = str(enabled)
+        row[f'{method}_port'] = raw.get(f'{method}_port') or port
+        if not isNumber(row[f'{method}_port']):
+            raise ValueError(f"{method}_port `{row[f'{method}_port']}` is not a number")
+        if enabled and (user == '' or password == ''):
+            raise ValueError(f"{method} is enabled without {method}_username & {method}_password")
+        row[f'{method}_username'] = user if enabled else '-'
+        row[f'{method}_password'] = password if enabled else '-'
+    keys = raw.get('ssh_keys', '')
+    use_keys = row['ssh'] == 'True' and (_flag(raw['ssh_use_keys']) if raw.get('ssh_use_keys', '') != '' else keys != '')
+    if use_keys and keys == '':
+        raise ValueError("ssh_use_keys is enabled without ssh_keys")
+    row['ssh_use_keys'] = str(use_keys)
+    row['ssh_keys'] = keys if use_keys else '-'
+    if row['telnet'] == 'False' and row['ssh'] == 'False':
+        raise ValueError("neither telnet nor ssh credentials")
+    return row
+
+
+@functools.lru_cache(maxsize=8)
+def _shiftTables(key: str, sign: int) -> tuple:
+    """ one 256 bytes translation table per key position : byte -> (byte + sign * key[i]) % 256 """
+    return tuple(bytes((b + sign * ord(k)) % 256 for b in range(256)) for k in key)
+
+
+def _ords(text: str) -> bytes:
+    try:
+        return text.encode('latin-1')
+    except UnicodeEncodeError:
+        return bytes(ord(c) % 256 for c in text)
+
+
+def shiftMany(values: list, key: str, sign: int) -> list:
+    """
+    shift every char of every value by the key char at the same position, for
+    a whole column at once : values are padded to a multiple of the key length
+    and laid end to end, so position p always uses key[p % len(key)] and the
+    buffer is translated with one C level `bytes.translate` per key position
+    """
+    tables = _shiftTables(key, sign)
+    width = len(key)
+    raw = [_ords(v) for v in values]
+    spans = [-(-len(r) // width) * width for r in raw]
+    buf = bytearray(b''.join([r.ljust(n, b'\0') for r, n in zip(raw, spans)]))
+    for i, table in enumerate(tables):
+        buf[i::width] = buf[i::width].translate(table)
+    text, out, offset = buf.decode('latin-1'), [], 0
+    for r, n in zip(raw, spans):
+        out.append(text[offset:offset + len(r)])
+        offset += n
+    return out
+
+
 class Devices(object):
     """
     Controling saved Devices [ don't worry the programe do this automaticaly (^_^) ]
@@ -364,7 +1803,15 @@ class Devices(object):
     def __init__(self):
         self._devicesDir = "devices/"
         self._key = '$KEY$CNAG00DKeyForEncryption&Decryption'
-        self.style = Style.from_dict({
+        self._style = None
+        initDB()
+
+    @property
+    def style(self):
+        if self._style is not None:
+            return self._style
+        Style = require('prompt_toolkit.styles').Style
+        self._style = Style.from_dict({
             'completion-menu.completion': 'bg:#9e0000 #ffffff',
             'completion-menu.completion.current': 'bg:#ffffff #000000',
             'scrollbar.background': 'bg:#88aaaa',
@@ -375,6 +1822,7 @@ class Devices(object):
             'blue': '#000fe0 bold',
             'yellow': '#f2cf0a bold',
         })
+        return self._style
 
     def _InputWithCompletion(self, question: str, words: list, _validator=None, password=False, critical=False):
         if critical != False:
@@ -383,11 +1831,15 @@ class Devices(object):
         else:
             asked = "<white>[<green>+</green>]</white><white> {0} : </white>".format(
                 question)
+        prompt = require('prompt_toolkit').prompt
+        HTML = require('prompt_toolkit.formatted_text').HTML
+        WordCompleter = require('prompt_toolkit.completion').WordCompleter
         text = prompt(HTML(asked), completer=WordCompleter(words, ignore_case=True), complete_while_typing=True,
                       validator=_validator, mouse_support=True, is_password=password, style=self.style)
         return text
 
     def _addDevices(self, dtype=None):
+        Validator = require('prompt_toolkit.validation').Validator
         if dtype is None:
             msg.info("add new device")
             print(f"\t{msg.RED}1{msg.WHITE}) - {msg.BLUE}Router ")
@@ -503,176 +1955,164 @@ class Devices(object):
             ssh_pass = self.encrypt(ssh_pass)
             ssh_port = ssh_port if ssh_port != "" else 22
         d_type = int(dtype) if dtype is not None else int(d_type)
-        if d_type == 1:
-            Routers.create(hostname=hostname, device_type=device_type, host=host, priv_pass=priv_pass,
-                           telnet=telnet, telnet_username=telnet_user, telnet_password=telnet_pass,
-                           telnet_port=telnet_port, ssh=ssh, ssh_use_keys=ssh_use_keys, ssh_keys=ssh_keys,
-                           ssh_username=ssh_user, ssh_password=ssh_pass, ssh_port=ssh_port)
-        elif d_type == 2:
-            Switches.create(hostname=hostname, device_type=device_type, host=host, priv_pass=priv_pass,
-                            telnet=telnet, telnet_username=telnet_user, telnet_password=telnet_pass,
-                            telnet_port=telnet_port, ssh=ssh, ssh_use_keys=ssh_use_keys, ssh_keys=ssh_keys,
-                            ssh_username=ssh_user, ssh_password=ssh_pass, ssh_port=ssh_port)
-        else:
-            Others.create(hostname=hostname, device_type=device_type, host=host, priv_pass=priv_pass,
-                          telnet=telnet, telnet_username=telnet_user, telnet_password=telnet_pass,
-                          telnet_port=telnet_port, ssh=ssh, ssh_use_keys=ssh_use_keys, ssh_keys=ssh_keys,
-                          ssh_username=ssh_user, ssh_password=ssh_pass, ssh_port=ssh_port)
+        Device.create(category=CATEGORIES.get(d_type, 'others'), hostname=hostname, device_type=device_type, host=host, ipv4=ipv4Int(host),
+                      priv_pass=priv_pass, telnet=telnet, telnet_username=telnet_user, telnet_password=telnet_pass,
+                      telnet_port=telnet_port, ssh=ssh, ssh_use_keys=ssh_use_keys, ssh_keys=ssh_keys,
+                      ssh_username=ssh_user, ssh_password=ssh_pass, ssh_port=ssh_port)
         db.close()
         msg.success('Device added successefly')
 
-    def _listDevices(self, dtype=None):
+    def _importDevices(self, file: str, dtype=None):
+        """
+        bulk load of a CSV / JSON inventory (the columns of --export) : rows are
+        validated, their passwords encrypted a column at a time, then inserted
+        INSERT_ROWS per statement with one transaction every IMPORT_BATCH rows
+        """
+        start = time.perf_counter()
+        added, rejected, batch = 0, 0, []
+        for where, raw in readInventory(file):
+            try:
+                batch.append(deviceRow(raw, CATEGORIES.get(dtype)))
+            except ValueError as err:
+                rejected += 1
+                msg.failure(f"{where} : {err}, row skipped.", very=True)
+            if len(batch) >= IMPORT_BATCH:
+                added += self._insertDevices(batch)
+                batch = []
+        added += self._insertDevices(batch)
+        msg.success(f"{added} device(s) imported, {rejected} row(s) rejected "
+                    f"({round(time.perf_counter() - start, 2)} second(s))")
+
+    def _insertDevices(self, rows: list) -> int:
+        for method in ('telnet', 'ssh'):
+            enabled = [row for row in rows if row[method] == 'True']
+            for row, enc in zip(enabled, self.encryptMany([row[f'{method}_password'] for row in enabled])):
+                row[f'{method}_password'] = enc
+        tags = [row.pop('tags') for row in rows]
+        with db.atomic():
+            floor = Device.select(fn.MAX(Device.id)).scalar() or 0
+            for i in range(0, len(rows), INSERT_ROWS):
+                Device.insert_many(rows[i:i + INSERT_ROWS]).execute()
+            if any(tags):
+                # the new rows looked up by (category, host) : nothing assumes the rowids
+                # of a multi-row INSERT are consecutive
+                ids = {}
+                for device in Device.select(Device.id, Device.category, Device.host).where(Device.id > floor).order_by(Device.id):
+                    ids.setdefault((device.category, device.host), []).append(device.id)
+                labels = []
+                for row, names in zip(rows, tags):
+                    device = ids[(row['category'], row['host'])].pop(0)
+                    labels += [{'device': device, 'name': name} for name in names]
+                for j in range(0, len(labels), 400):
+                    Tag.insert_many(labels[j:j + 400]).execute()
+        return len(rows)
+
+    def _exportDevices(self, file: str, dtype=None):
+        """
+        stream the inventory to CSV / JSON (by extension) in the format read by
+        --import, IMPORT_BATCH rows at a time from one cursor
+        """
+        csv, itertools = require('csv'), require('itertools')
+        columns = ['id', 'category'] + FIELDS + ['tags']
+        tags = Tag.select(fn.GROUP_CONCAT(Tag.name, ' ')).where(Tag.device == Device.id)
+        query = Device.select(Device, tags.alias('tags')).order_by(Device.id)
+        if dtype in CATEGORIES:
+            query = query.where(Device.category == CATEGORIES[dtype])
+        cursor, count = query.dicts().iterator(), 0
+        as_json = file.lower().endswith('.json')
+        with open(file, mode='w', newline='') as fd:
+            if as_json:
+                fd.write('[')
+            else:
+                writer = csv.DictWriter(fd, columns, extrasaction='ignore')
+                writer.writeheader()
+            while True:
+                rows = list(itertools.islice(cursor, IMPORT_BATCH))
+                if rows == []:
+                    break
+                for method in ('telnet', 'ssh'):
+                    enabled = [row for row in rows if row[method] == 'True']
+                    for row, clear in zip(enabled, self.decryptMany([row[f'{method}_password'] for row in enabled])):
+                        row[f'{method}_password'] = clear
+                for row in rows:
+                    row['tags'] = row['tags'] or ''
+                    if as_json:
+                        fd.write((',\n' if count > 0 else '\n') + json.dumps({c: row[c] for c in columns}))
+                    else:
+                        writer.writerow(row)
+                    count += 1
+            if as_json:
+                fd.write('\n]\n')
+        msg.success(f"{count} device(s) exported to {file}")
+        msg.warning(f"{file} holds the device passwords in clear text, keep it safe.")
+
+    def _listDevices(self, dtype=None, selector=None, plain=False, page=LIST_PAGE):
+        """
+        devices of a category (or all of them) matching `selector`, printed page
+        by page as they are read : `page` rows per keyset query (id > last seen),
+        the table widths come from one aggregate query. `plain` prints tab
+        separated lines for scripts
+        """
         HEADERS = ['ID', 'CATEGORY', 'HOSTNAME', 'DEVICE_TYPE', 'HOST', 'TELNET',
                    'SSH', 'SSH_USE_KEYS', 'SSH_KEYS']
-        if dtype == 1:
-            DATA = []
-            routers_data = Routers.select().dicts()
-            self.sort_data(DATA, [i for i in routers_data], cat="routers")
-            if DATA == []:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Routers{msg.RESET}:\n")
-                msg.nodata(
-                    f"{msg.BOLD}no routers data {msg.YELLOW}found.\n", tab=True)
-                return False
-            else:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Routers{msg.RESET}:")
-                table = tt.to_string(DATA, header=HEADERS, padding=(0, 1))
-                print(table)
-                print(' ')
-        elif dtype == 2:
-            DATA = []
-            switches_data = Switches.select().dicts()
-            self.sort_data(DATA, [i for i in switches_data], cat="switches")
-            if DATA == []:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Switches{msg.RESET}:\n")
-                msg.nodata(
-                    f"{msg.BOLD}no switches data {msg.YELLOW}found.\n", tab=True)
-                return False
-            else:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Switches{msg.RESET}:")
-                table = tt.to_string(DATA, header=HEADERS, padding=(0, 1))
-                print(table)
-                print(' ')
-        elif dtype == 3:
-            DATA = []
-            others_data = Others.select().dicts()
-            self.sort_data(DATA, [i for i in others_data], cat="others")
-            if DATA == []:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Others{msg.RESET}:\n")
-                msg.nodata(
-                    f"{msg.BOLD}no others devices data {msg.YELLOW}found.\n", tab=True)
-                return False
-            else:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Others{msg.RESET}:")
-                table = tt.to_string(DATA, header=HEADERS, padding=(0, 1))
-                print(table)
-                print(' ')
-        else:
-            DATA_R = []
-            DATA_S = []
-            DATA_O = []
-            routers_data = Routers.select().dicts()
-            switches_data = Switches.select().dicts()
-            others_data = Others.select().dicts()
-            self.sort_data(DATA_R, [i for i in routers_data], cat="routers")
-            self.sort_data(DATA_S, [i for i in switches_data], cat="switches")
-            self.sort_data(DATA_O, [i for i in others_data], cat="others")
-            if DATA_R == []:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Routers{msg.RESET}:\n")
-                msg.nodata(
-                    f"{msg.BOLD}no routers data {msg.YELLOW}found.\n", tab=True)
-            else:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Routers{msg.RESET}:")
-                table_r = tt.to_string(DATA_R, header=HEADERS, padding=(0, 1))
-                print(table_r)
-                print(' ')
-            if DATA_S == []:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Switches{msg.RESET}:\n")
-                msg.nodata(
-                    f"{msg.BOLD}no switches data {msg.YELLOW}found.\n", tab=True)
-            else:
-                msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Switches{msg.RESET}:")
-                table_s = tt.to_string(DATA_S, header=HEADERS, padding=(0, 1))
-                print(table_s)
-                print(' ')
-            if DATA_O == []:
+        COLUMNS = [Device.id, Device.category, Device.hostname, Device.device_type, Device.host, Device.telnet,
+                   Device.ssh, Device.ssh_use_keys, Device.ssh_keys]
+        try:
+            where = parseSelector(selector) if selector else Device.id.is_null(False)
+        except ValueError as err:
+            return msg.failure(f"bad selector {msg.YELLOW}{selector}{msg.RED} : {err}", very=True)
+        if plain == True:
+            sys.stdout.write('\t'.join(h.lower() for h in HEADERS) + '\n')
+            if dtype in CATEGORIES:
+                where = where & (Device.category == CATEGORIES[dtype])
+            for rows in self._pages(COLUMNS, where, page):
+                sys.stdout.write(''.join('\t'.join(str(v) for v in row) + '\n' for row in rows))
+            return True
+        categories = [CATEGORIES[dtype]] if dtype in CATEGORIES else list(CATEGORIES.values())
+        for cat in categories:
+            title = cat.capitalize()
+            widths = Device.select(fn.COUNT(Device.id), *[fn.MAX(fn.LENGTH(c)) for c in COLUMNS]).where(
+                where & (Device.category == cat)).tuples().get()
+            if widths[0] == 0:
                 msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Others{msg.RESET}:\n")
+                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}{title}{msg.RESET}:\n")
                 msg.nodata(
-                    f"{msg.BOLD}no others devices data {msg.YELLOW}found.\n", tab=True)
+                    f"{msg.BOLD}no {'others devices' if cat == 'others' else cat} data {msg.YELLOW}found.\n", tab=True)
+                if dtype in CATEGORIES:
+                    return False
             else:
                 msg.info(
-                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}Others{msg.RESET}:")
-                table_o = tt.to_string(DATA_O, header=HEADERS, padding=(0, 1))
-                print(table_o)
+                    f"{msg.UNDERLINE}List{msg.RESET} {msg.UNDERLINE}of{msg.RESET} {msg.UNDERLINE}{title}{msg.RESET}:")
+                table = StreamTable(HEADERS, widths[1:])
+                for rows in self._pages(COLUMNS, where & (Device.category == cat), page):
+                    table.rows(rows)
+                table.close()
                 print(' ')
 
-    def sort_data(self, DATA: list, d_: list, cat=None):
-        for row in d_:
-            ID = row['id']
-            CATEGORY = cat
-            HOSTNAME = row['hostname']
-            DEVICE_TYPE = row['device_type']
-            HOST = row['host']
-            TELNET = row['telnet']
-            SSH = row['ssh']
-            SSH_USE_KEYS = row['ssh_use_keys']
-            SSH_KEYS = row['ssh_keys']
-            DATA.append([ID, CATEGORY, HOSTNAME, DEVICE_TYPE,
-                         HOST, TELNET, SSH, SSH_USE_KEYS, SSH_KEYS])
-        return True
+    @staticmethod
+    def _pages(columns: list, where, page=LIST_PAGE):
+        """ keyset pagination on the primary key, one list of tuples per page """
+        last = 0
+        while True:
+            query = Device.select(*columns).where(where & (Device.id > last)).order_by(Device.id).limit(page)
+            rows = db.execute_sql(*query.sql()).fetchall()
+            if rows == []:
+                return
+            yield rows
+            if len(rows) < page:
+                return
+            last = rows[-1][0]
 
     def _deleteDevices(self, dtype=None):
-        if dtype == 1:
-            check = self._listDevices(dtype=1)
-            if check != False:
-                validator = Validator.from_callable(isNumber, error_message=(
-                    'please enter valid ID '), move_cursor_to_end=True)
-                ID_D = self._InputWithCompletion(
-                    question="Type <red>ID</red> of <yellow>router</yellow> you want delete ?", words=[], _validator=validator, critical=True)
-                validator = Validator.from_callable(isYesOrNo, error_message=(
-                    'please choice (yes or no) '), move_cursor_to_end=True)
-                _askdelete = self._InputWithCompletion(question="Sure, you want to delete all saved devices ?", words=[
-                                                       'yes', 'no'], _validator=validator, critical=True)
-                print(_askdelete)
-                if (_askdelete.lower() == 'yes'):
-                    self.db_delete_id(ID=ID_D, dtype=dtype)
-            else:
-                msg.warning('no data to delete.\n')
-
-        elif dtype == 2:
-            check = self._listDevices(dtype=2)
-            if check != False:
-                validator = Validator.from_callable(isNumber, error_message=(
-                    'please enter valid ID '), move_cursor_to_end=True)
-                ID_D = self._InputWithCompletion(
-                    question="Type <red>ID</red> of <yellow>switch</yellow> you want delete ?", words=[], _validator=validator, critical=True)
-                validator = Validator.from_callable(isYesOrNo, error_message=(
-                    'please choice (yes or no) '), move_cursor_to_end=True)
-                _askdelete = self._InputWithCompletion(question="Sure, you want to delete all saved devices ?", words=[
-                                                       'yes', 'no'], _validator=validator, critical=True)
-                print(_askdelete)
-                if (_askdelete.lower() == 'yes'):
-                    self.db_delete_id(ID=ID_D, dtype=dtype)
-            else:
-                msg.warning('no data to delete.\n')
-
-        elif dtype == 3:
-            check = self._listDevices(dtype=3)
+        Validator = require('prompt_toolkit.validation').Validator
+        if dtype in CATEGORIES:
+            check = self._listDevices(dtype=dtype)
             if check != False:
+                noun = {1: 'router', 2: 'switch'}.get(dtype, 'device')
                 validator = Validator.from_callable(isNumber, error_message=(
                     'please enter valid ID '), move_cursor_to_end=True)
                 ID_D = self._InputWithCompletion(
-                    question="Type <red>ID</red> of <yellow>device</yellow> you want delete ?", words=[], _validator=validator, critical=True)
+                    question=f"Type <red>ID</red> of <yellow>{noun}</yellow> you want delete ?", words=[], _validator=validator, critical=True)
                 validator = Validator.from_callable(isYesOrNo, error_message=(
                     'please choice (yes or no) '), move_cursor_to_end=True)
                 _askdelete = self._InputWithCompletion(question="Sure, you want to delete all saved devices ?", words=[
@@ -691,70 +2131,28 @@ class Devices(object):
             os.system('rm devices/devices.db')
 
     def db_delete_id(self, ID: int, dtype: int) -> bool:
-        if dtype == 1:
-            d = Routers.delete_by_id(ID)
-            if d == ID:
-                return True
-            return False
-        elif dtype == 2:
-            d = Switches.delete_by_id(ID)
-            if d == ID:
-                return True
-            return False
-        elif dtype == 3:
-            d = Others.delete_by_id(ID)
-            if d == ID:
-                return True
-            return False
+        d = Device.delete().where((Device.id == int(ID)) & (Device.category == CATEGORIES[dtype])).execute()
+        if d == 1:
+            Tag.delete().where(Tag.device == int(ID)).execute()
+        return d == 1
 
     def encrypt(self, clear):
-        key = self._key
-        enc = []
-        for i in range(len(clear)):
-            key_c = key[i % len(key)]
-            enc_c = chr((ord(clear[i]) + ord(key_c)) % 256)
-            enc.append(enc_c)
-        return base64.urlsafe_b64encode("".join(enc).encode()).decode()
+        return self.encryptMany([clear])[0]
 
     def decrypt(self, enc):
-        key = self._key
-        dec = []
-        enc = base64.urlsafe_b64decode(enc).decode()
-        for i in range(len(enc)):
-            key_c = key[i % len(key)]
-            dec_c = chr((256 + ord(enc[i]) - ord(key_c)) % 256)
-            dec.append(dec_c)
-        return "".join(dec)
+        return self.decryptMany([enc])[0]
 
-    def _editDevices(self, dtype):
-        if dtype == 1:
-            check = self._listDevices(dtype=1)
-            if check != False:
-                validator = Validator.from_callable(isNumber, error_message=(
-                    'please enter valid ID '), move_cursor_to_end=True)
-                ID_D = self._InputWithCompletion(
-                    question="Type <red>ID</red> of <yellow>device</yellow> you want <blue>Edit</blue> ?", words=[], _validator=validator, critical=True)
-                data = self._get_data(dtype=dtype, ID=ID_D)
-                data['dtype'] = dtype
-                self.prompt_edit(**data)
+    def encryptMany(self, values: list) -> list:
+        """ same output as per-char encrypt, for a whole column in one pass """
+        return [base64.urlsafe_b64encode(e.encode()).decode() for e in shiftMany(values, self._key, 1)]
 
-            else:
-                msg.warning('no data to delete.\n')
-        elif dtype == 2:
-            check = self._listDevices(dtype=2)
-            if check != False:
-                validator = Validator.from_callable(isNumber, error_message=(
-                    'please enter valid ID '), move_cursor_to_end=True)
-                ID_D = self._InputWithCompletion(
-                    question="Type <red>ID</red> of <yellow>device</yellow> you want <blue>Edit</blue> ?", words=[], _validator=validator, critical=True)
-                data = self._get_data(dtype=dtype, ID=ID_D)
-                data['dtype'] = dtype
-                self.prompt_edit(**data)
+    def decryptMany(self, values: list) -> list:
+        return shiftMany([base64.urlsafe_b64decode(v).decode() for v in values], self._key, -1)
 
-            else:
-                msg.warning('no data to delete.\n')
-        elif dtype == 3:
-            check = self._listDevices(dtype=3)
+    def _editDevices(self, dtype):
+        Validator = require('prompt_toolkit.validation').Validator
+        if dtype in CATEGORIES:
+            check = self._listDevices(dtype=dtype)
             if check != False:
                 validator = Validator.from_callable(isNumber, error_message=(
                     'please enter valid ID '), move_cursor_to_end=True)
@@ -768,18 +2166,11 @@ class Devices(object):
                 msg.warning('no data to delete.\n')
 
     def prompt_edit(self, **data):
-        dtype = data['dtype']
+        Validator = require('prompt_toolkit.validation').Validator
         validator = Validator.from_callable(isNotEmpty, error_message=(
             'please enter valid hostname'), move_cursor_to_end=True)
-        if dtype == 1:
-            hostname = self._InputWithCompletion(question="Hostname [{0}]".format(
-                data['hostname']), words=[], _validator=validator)
-        elif dtype == 2:
-            hostname = self._InputWithCompletion(question="Hostname [{0}]".format(
-                data['hostname']), words=[], _validator=validator)
-        else:
-            hostname = self._InputWithCompletion(question="Hostname [{0}]".format(
-                data['hostname']), words=[], _validator=validator)
+        hostname = self._InputWithCompletion(question="Hostname [{0}]".format(
+            data['hostname']), words=[], _validator=validator)
         priv_pass = self._InputWithCompletion(
             question="password for privileged mode [{0}]".format('*' * len(data['priv_pass'])), words=[])        
         device_type = 'cisco_ios'
@@ -880,71 +2271,28 @@ class Devices(object):
             ssh_user = ssh_user
             ssh_pass = self.encrypt(ssh_pass)
             ssh_port = ssh_port if ssh_port != "" else 22
-        d_type = int(dtype) if dtype is not None else int(d_type)
-        if d_type == 1:
-            rwd = Routers.select().where(Routers.id == data['ID']).get()
-            rwd.hostname = hostname
-            rwd.device_type = device_type
-            rwd.host = host
-            rwd.telnet = telnet
-            rwd.telnet_username = telnet_user
-            rwd.telnet_password = telnet_pass
-            rwd.telnet_port = telnet_port
-            rwd.ssh = ssh
-            rwd.ssh_use_keys = ssh_use_keys
-            rwd.ssh_keys = ssh_keys
-            rwd.ssh_username = ssh_user
-            rwd.ssh_password = ssh_pass
-            rwd.ssh_port = ssh_port
-            rwd.save()
-        elif d_type == 2:
-            rwd = Switches.select().where(Switches.id == data['ID']).get()
-            rwd.hostname = hostname
-            rwd.device_type = device_type
-            rwd.host = host
-            rwd.telnet = telnet
-            rwd.telnet_username = telnet_user
-            rwd.telnet_password = telnet_pass
-            rwd.telnet_port = telnet_port
-            rwd.ssh = ssh
-            rwd.ssh_use_keys = ssh_use_keys
-            rwd.ssh_keys = ssh_keys
-            rwd.ssh_username = ssh_user
-            rwd.ssh_password = ssh_pass
-            rwd.ssh_port = ssh_port
-            rwd.save()
-        else:
-            rwd = Others.select().where(Others.id == data['ID']).get()
-            rwd.hostname = hostname
-            rwd.device_type = device_type
-            rwd.host = host
-            rwd.telnet = telnet
-            rwd.telnet_username = telnet_user
-            rwd.telnet_password = telnet_pass
-            rwd.telnet_port = telnet_port
-            rwd.ssh = ssh
-            rwd.ssh_use_keys = ssh_use_keys
-            rwd.ssh_keys = ssh_keys
-            rwd.ssh_username = ssh_user
-            rwd.ssh_password = ssh_pass
-            rwd.ssh_port = ssh_port
-            rwd.save()
+        rwd = Device.select().where(Device.id == data['ID']).get()
+        rwd.hostname = hostname
+        rwd.device_type = device_type
+        rwd.host = host
+        rwd.ipv4 = ipv4Int(host)
+        rwd.telnet = telnet
+        rwd.telnet_username = telnet_user
+        rwd.telnet_password = telnet_pass
+        rwd.telnet_port = telnet_port
+        rwd.ssh = ssh
+        rwd.ssh_use_keys = ssh_use_keys
+        rwd.ssh_keys = ssh_keys
+        rwd.ssh_username = ssh_user
+        rwd.ssh_password = ssh_pass
+        rwd.ssh_port = ssh_port
+        rwd.save()
         db.close()
         msg.success('Device updated successefly')
 
     def _get_data(self, dtype, ID):
-        if dtype == 1:
-            r = Routers.select().dicts()
-            data = self.parse_rows(r, ID)
-            return data
-        elif dtype == 2:
-            s = Switches.select().dicts()
-            data = self.parse_rows(s, ID)
-            return data
-        elif dtype == 3:
-            o = Others.select().dicts()
-            data = self.parse_rows(o, ID)
-            return data
+        rows = Device.select().where((Device.id == int(ID)) & (Device.category == CATEGORIES[dtype])).dicts()
+        return self.parse_rows(rows, ID)
 
     def parse_rows(self, f, id_):
         for row in f:
@@ -967,78 +2315,255 @@ class Devices(object):
                         'telnet_port': TELNET_PORT, 'ssh': SSH, 'ssh_use_keys': SSH_USE_KEYS, 'ssh_keys': SSH_KEYS, 'ssh_user': SSH_USERNAME, 'ssh_pass': SSH_PASSWORD,
                         'ssh_port': SSH_PORT}
 
-    def single_connect(self, args, method, cmd, ssh_keys=False):
-        x = self._processData(args, method, ssh_keys)
-        if method == "ssh":
-            if ssh_keys == False:
-                start = time.perf_counter()
-                with concurrent.futures.ProcessPoolExecutor() as exe:
-                    {exe.submit(exe_ssh, one, cmd): one for one in x}
-                    # for f in concurrent.futures.as_completed(start_f):
-                    #   one = start_f[f]
-                # for one in x:
-                 #   exe_ssh(one, cmds_l)
-                end = time.perf_counter()
-                print(f'[+] finished in {round(end-start,2)} second(s)')
-            else:
-                start = time.perf_counter()
-                with concurrent.futures.ProcessPoolExecutor() as exe:
-                    {exe.submit(exe_ssh_keys, one, cmd): one for one in x}
-                    # for f in concurrent.futures.as_completed(start_f):
-                    #   one = start_f[f]
-                end = time.perf_counter()
-                print(f'[+] finished in {round(end-start,2)} second(s)')
-
-        elif method == "telnet":
-            start = time.perf_counter()
-            print(x, cmd)
-            #with concurrent.futures.ProcessPoolExecutor() as exe:
-             #   {exe.submit(exe_telnet, one, cmd): one for one in x}
-                # for f in concurrent.futures.as_completed(start_f):
-                #   one = start_f[f]
-            for one in x:
-                exe_telnet(one, cmd)
-            end = time.perf_counter()
-            print(f'[+] finished in {round(end-start,2)} second(s)')
-
-    def connect(self, args, method, file, ssh_keys=False):
-        x = self._processData(args, method, ssh_keys)
-        cmds_l = Devices().readConfigfile(file)
-        if method == "ssh":
-            if ssh_keys == False:
-                start = time.perf_counter()
-                with concurrent.futures.ProcessPoolExecutor() as exe:
-                    {exe.submit(exe_ssh, one, cmds_l): one for one in x}
-                    # for f in concurrent.futures.as_completed(start_f):
-                    #   one = start_f[f]
-                #for one in x:
-                 #   exe_ssh(one, cmds_l)
-                end = time.perf_counter()
-                print(f'[+] finished in {round(end-start,2)} second(s)')
+    def single_connect(self, args, method, cmd, ssh_keys=False, **options):
+        job = Job.create(selection=args, method=method, ssh_keys=str(ssh_keys), shell=options.get('shell', False),
+                         window=options.get('window', DEFAULT_WINDOW), diff=options.get('diff', False), cmds=json.dumps([cmd]))
+        return self._run(args, method, cmd, ssh_keys, job=job, **options)
+
+    def connect(self, args, method, file, ssh_keys=False, template=False, vars_file=None, **options):
+        job = Job.create(selection=args, method=method, ssh_keys=str(ssh_keys), shell=options.get('shell', False),
+                         window=options.get('window', DEFAULT_WINDOW), diff=options.get('diff', False))
+        if template == True:
+            Job.update(template=os.path.abspath(file),
+                       vars_file=None if vars_file is None else os.path.abspath(vars_file)).where(Job.id == job.id).execute()
+            return self._run(args, method, None, ssh_keys, job=job,
+                             template=ConfigTemplate(file, ConfigTemplate.loadVars(vars_file)), **options)
+        cmds_l = self.readConfigfile(file)
+        Job.update(cmds=json.dumps(cmds_l)).where(Job.id == job.id).execute()
+        return self._run(args, method, cmds_l, ssh_keys, job=job, **options)
+
+    def backup(self, args, method, ssh_keys=False, store=BACKUP_STORE, **options):
+        """ collect the running-config of every selected device into the backup store """
+        options.update(diff=False)
+        return self._run(args, method, None, ssh_keys, backup=BackupStore(store), **options)
+
+    def history(self, args, store=BACKUP_STORE):
+        """ backups of the selected devices, oldest first """
+        for row in self.getInstances(args):
+            query = Backup.select().where((Backup.category == row['category']) & (Backup.device == row['id'])).order_by(Backup.id)
+            msg.info(f"{msg.GREEN}{row['hostname']}{msg.RESET} ({row['category']} {row['id']}, {row['host']})")
+            last = None
+            for b in query:
+                print(f"\t{b.taken:%Y-%m-%d %H:%M:%S}  {b.digest[:12]}  {b.size:>8} bytes" + ('  (unchanged)' if b.digest == last else ''))
+                last = b.digest
+
+    @staticmethod
+    def showBackup(digest: str, store=BACKUP_STORE):
+        """ print one stored config, `digest` may be any unique prefix """
+        found = {b.digest for b in Backup.select(Backup.digest).distinct().where(Backup.digest.startswith(digest)).limit(2)}
+        if len(found) != 1:
+            return msg.failure(f"{'no' if found == set() else 'more than one'} backup matching {digest}")
+        print(BackupStore(store).get(found.pop()), end='')
+
+    def resume(self, job_id, **options):
+        """ dispatch again the devices of a job still pending / running, with the job's own commands """
+        job = Job.get_or_none(Job.id == job_id)
+        if job is None:
+            return msg.failure(f"no job with ID {job_id}")
+        left = list(JobDevice.select(JobDevice.device, JobDevice.category).where(
+            (JobDevice.job == job) & (JobDevice.state.in_(['pending', 'running']))))
+        failed = JobDevice.select().where((JobDevice.job == job) & (JobDevice.state == 'failed')).count()
+        msg.info(f"job {job.id} ({job.method} , {job.created:%Y-%m-%d %H:%M}) : {len(left)} unfinished, {failed} failed device(s)")
+        if left == []:
+            return []
+        selection = {}
+        for jd in left:
+            selection.setdefault(jd.category, []).append(str(jd.device))
+        args = '-'.join(cat[0].upper() + '=' + ','.join(ids) for cat, ids in selection.items())
+        options.update(shell=job.shell, window=job.window, diff=job.diff)
+        ssh_keys = job.ssh_keys != 'False'
+        if job.template is not None:
+            template = ConfigTemplate(job.template, ConfigTemplate.loadVars(job.vars_file))
+            return self._run(args, job.method, None, ssh_keys, job=job, template=template, **options)
+        cmds = json.loads(job.cmds)
+        return self._run(args, job.method, cmds[0] if len(cmds) == 1 else cmds, ssh_keys, job=job, **options)
+
+    def _run(self, args, method, cmds, ssh_keys, max_inflight=DEFAULT_MAX_INFLIGHT, shell=False, timeout=DEFAULT_TIMEOUT,
+             template=None, window=DEFAULT_WINDOW, adaptive=False, retries=DEFAULT_RETRIES, ignore_breaker=False,
+             breaker_runs=BREAKER_RUNS, breaker_cooldown=BREAKER_COOLDOWN, preflight_timeout=PREFLIGHT_TIMEOUT, job=None, diff=False, backup=None, parse=None, workers=None,
+             shard_by='hash', token=None, tls_ca=None, insecure_workers=False, profile=None, profile_dump=None,
+             metrics_file=None) -> list:
+        if workers and backup is not None:
+            msg.failure('--backup writes to the local store, it can not run on --workers')
+            return []
+        rows, unreachable, skipped = [], [], []
+        opened = None if ignore_breaker == True else []
+        x = self._processData(args, method, ssh_keys, rows, unreachable, preflight_timeout, opened)
+        skipped.extend((row, 'unreachable (pre-flight)') for row in unreachable)
+        skipped.extend((row, 'circuit breaker open') for row in opened or [])
+        configs = None
+        if template is not None:
+            x, configs, rows = self._render(template, x, rows, skipped)
+        worker = sessionWorker(method, ssh_keys, shell, timeout, window, diff, backup is not None)
+        if backup is not None:
+            worker = functools.partial(exe_backup, worker=worker, store=backup)
+            previous, entries = backup.latest(rows), []
+        parsed = None
+        if parse is not None:
+            worker = functools.partial(exe_parse, worker=worker, parser=OutputParser())
+            parsed = ParsedLog(parse)
+        tracker = JobTracker(job, rows, skipped) if job is not None else None
+        if tracker is not None:
+            print(f'[+] job {job.id} : {len(x)} device(s) to configure')
+        log = RunLog()
+        profiler = None
+        if profile is not None or profile_dump is not None:
+            profiler = RunProfile(PROFILE_SLOWEST if profile is None else profile, profile_dump)
+        metrics = Metrics() if metrics_file is not None else None
+        start = time.perf_counter()
+        results = []
+        for row, error in skipped:
+            results.append(SessionResult(row['host'], method, error=error, port=row[f'{method}_port']))
+            results[-1].reason = 'skipped'
+            log.write(results[-1])
+        if metrics is not None:
+            metrics.skipped(method, len(skipped))
+
+        def opened(n):
+            if tracker is not None:
+                tracker.start(n)
+            if metrics is not None:
+                metrics.started(method)
+
+        def finished(n, result):
+            written = time.monotonic()
+            log.write(result)
+            if tracker is not None:
+                tracker.finish(n, result)
+            if parsed is not None:
+                parsed.write(rows[n], result)
+            if backup is not None and result.digest is not None:
+                row = rows[n]
+                entries.append({'device': row['id'], 'category': row['category'], 'host': row['host'],
+                                'hostname': row['hostname'], 'digest': result.digest,
+                                'taken': datetime.datetime.fromtimestamp(result.started),
+                                'size': result.commands[0]['size']})
+            if metrics is not None:
+                metrics.finished(result)
+            if profiler is not None:
+                profiler.add(result, time.monotonic() - written)
+
+        if profiler is not None:
+            profiler.start()
+        try:
+            if workers:
+                # credentials leave this host the way devices.db stores them, workers decrypt their shard
+                secrets = self.encryptMany([job[2] for job in x])
+                shards = [job[:2] + [secret] + job[3:] for job, secret in zip(x, secrets)]
+                options = dict(ssh_keys=ssh_keys != False, shell=shell, timeout=timeout, window=window, diff=diff,
+                               parse=parse is not None, max_inflight=max_inflight, adaptive=adaptive, retries=retries)
+                results += runShards(shards, cmds, method, workers, options, self._shardKeys(rows, shard_by),
+                                     on_result=finished, configs=configs, token=token, on_start=opened, tls_ca=tls_ca,
+                                     insecure=insecure_workers)
             else:
-                start = time.perf_counter()
-                with concurrent.futures.ProcessPoolExecutor() as exe:
-                    {exe.submit(exe_ssh_keys, one, cmds_l): one for one in x}
-                    # for f in concurrent.futures.as_completed(start_f):
-                    #   one = start_f[f]
-                # for one in x:
-                 #   exe_ssh(one, cmds_l)
-                end = time.perf_counter()
-                print(f'[+] finished in {round(end-start,2)} second(s)')
-
-        elif method == "telnet":
-            start = time.perf_counter()
-            with concurrent.futures.ProcessPoolExecutor() as exe:
-                {exe.submit(exe_telnet, one, cmds_l): one for one in x}
-                # for f in concurrent.futures.as_completed(start_f):
-                #   one = start_f[f]
-            # for one in x:
-                #   exe_ssh(one, cmds_l)
-            end = time.perf_counter()
-            print(f'[+] finished in {round(end-start,2)} second(s)')
-
-    def _processData(self, args, method, ssh_keys) -> list:
-        EXE = []
+                results += runSessions(x, worker, cmds, method, max_inflight=max_inflight, on_result=finished, configs=configs,
+                                       adaptive=adaptive, retries=retries, on_start=opened)
+        finally:
+            msg.flush()
+            closing = time.monotonic()
+            log.close()
+            if parsed is not None:
+                parsed.close()
+            if backup is not None:
+                backup.index(entries)
+            left = tracker.close() if tracker is not None else 0
+            if profiler is not None:
+                profiler.closing = time.monotonic() - closing
+                profiler.stop()
+            if left > 0:
+                msg.warning(f"job {job.id} : {left} device(s) not finished, run again with --resume {job.id}")
+        # pre-flight probes & sessions tell whether a host answers : the rows skipped
+        # for an open breaker or a template value leave their breaker untouched
+        recordBreakers(results[:len(unreachable)] + results[len(skipped):], breaker_runs, breaker_cooldown)
+        end = time.perf_counter()
+        done = len([r for r in results if r.status])
+        if backup is not None:
+            changed = [e for e in entries if previous.get((e['category'], e['device'])) != e['digest']]
+            print(f'[+] {done}/{len(results)} running-config(s) backed up, {len(changed)} changed since the last backup')
+            print(f'[+] {backup.written} new object(s), {backup.bytes} byte(s) written in {backup.directory}')
+        else:
+            print(f'[+] {done}/{len(results)} device(s) configured successfully')
+        if diff == True:
+            print(f'[+] {len([r for r in results if r.compliant])} device(s) already compliant, nothing pushed')
+        print(f'[+] finished in {round(end-start,2)} second(s)')
+        print(f'[+] report saved in {log.path}')
+        if parsed is not None:
+            print(f"[+] parsed output saved in {', '.join(parsed.paths) or '(nothing to parse)'}")
+        if metrics is not None:
+            metrics.run(end - start)
+            metrics.write(metrics_file)
+            print(f'[+] metrics saved in {metrics_file}')
+        if profiler is not None:
+            profiler.show()
+        return results
+
+    @staticmethod
+    def _shardKeys(rows: list, shard_by='hash') -> list:
+        """
+        consistent hashing key of every row : its ID, or with `site` its first
+        tag starting with SITE_TAG, so a whole site lands on the same worker
+        """
+        keys = [f"{row['category']}:{row['id']}" for row in rows]
+        if shard_by != 'site':
+            return keys
+        ids = [row['id'] for row in rows]
+        sites = {}
+        for i in range(0, len(ids), 500):
+            query = Tag.select(Tag.device, Tag.name).where(
+                (Tag.device.in_(ids[i:i + 500])) & (Tag.name.startswith(SITE_TAG))).order_by(Tag.name)
+            for tag in query:
+                sites.setdefault(tag.device_id, tag.name)
+        return [sites.get(row['id'], key) for row, key in zip(rows, keys)]
+
+    def _preflight(self, jobs: list, secrets: list, rows: list, timeout, unreachable=None) -> tuple:
+        start = time.perf_counter()
+        status = preflight([(job[0], job[3]) for job in jobs], timeout)
+        down = [n for n, up in enumerate(status) if not up]
+        for n in down:
+            msg.failure(f"{msg.YELLOW}{jobs[n][0]}{msg.RED} is unreachable, skipped.", very=True)
+        msg.info(f"pre-flight : {len(jobs) - len(down)} reachable, {len(down)} unreachable "
+                 f"({round(time.perf_counter() - start, 2)} second(s))")
+        if unreachable is not None:
+            unreachable.extend(rows[n] for n in down)
+        keep = [n for n, up in enumerate(status) if up]
+        return [jobs[n] for n in keep], [secrets[n] for n in keep], [rows[n] for n in keep]
+
+    def _skipOpenBreakers(self, jobs: list, secrets: list, rows: list, skipped: list) -> tuple:
+        """ leave out hosts unreachable on the last --breaker-runs runs, until their cool-down ends """
+        opened = openBreakers([breakerKey(job[0], job[3]) for job in jobs])
+        if opened == {}:
+            return jobs, secrets, rows
+        for key, until in opened.items():
+            msg.warning(f"{key} skipped, unreachable on the last runs (circuit open until "
+                        f"{datetime.datetime.fromtimestamp(until).strftime('%Y-%m-%d %H:%M:%S')}, see --ignore-breaker)")
+        keep = [n for n, job in enumerate(jobs) if breakerKey(job[0], job[3]) not in opened]
+        skipped.extend(rows[n] for n, job in enumerate(jobs) if breakerKey(job[0], job[3]) in opened)
+        return [jobs[n] for n in keep], [secrets[n] for n in keep], [rows[n] for n in keep]
+
+    def _render(self, template, jobs: list, rows: list, skipped: list) -> tuple:
+        """ one config per job, devices with a missing variable are left out of the run """
+        JOBS, CONFIGS, ROWS = [], [], []
+        for job, row in zip(jobs, rows):
+            try:
+                CONFIGS.append(template.render(row))
+                JOBS.append(job)
+                ROWS.append(row)
+            except KeyError as err:
+                msg.failure(
+                    f"no value for {msg.YELLOW}{err.args[0]}{msg.RED} on {msg.YELLOW}{row['host']}{msg.RED}, device skipped.", very=True)
+                skipped.append((row, f"no value for {err.args[0]}"))
+        msg.info(f"{len(CONFIGS)} config(s) rendered ({template.hits} from cache).")
+        return JOBS, CONFIGS, ROWS
+
+    def _processData(self, args, method, ssh_keys, rows=None, unreachable=None, preflight_timeout=PREFLIGHT_TIMEOUT,
+                     opened=None) -> list:
+        """
+        one job per usable device, `rows` (when given) receives the matching inventory rows.
+        hosts with an open circuit breaker are left out first and appended to `opened`
+        (when given), then the ports are swept (unless `preflight_timeout` is None) and
+        hosts that do not answer are left out and appended to `unreachable`
+        """
+        EXE, SECRETS, ROWS = [], [], []
         ALL = self.getCredsConf(args, method)
         for item in ALL:
             if method == "ssh":
@@ -1051,158 +2576,79 @@ class Devices(object):
                             msg.failure(
                                 f"can't connect to {msg.YELLOW}{item['host']}{msg.RED} using SSH Keys , because you don't set ssh keys.", very=True)
                         else:
-                            if item['priv_pass'] == '-':
-                                EXE.append([item['host'], item['ssh_username'], self.decrypt(
-                                    item['ssh_password']), item['ssh_port'], item['ssh_keys']])
-                            else:
-                                EXE.append([item['host'], item['ssh_username'], self.decrypt(
-                                    item['ssh_password']), item['ssh_port'], item['ssh_keys'], item['priv_pass']])                         
+                            EXE.append([item['host'], item['ssh_username'], None,
+                                        item['ssh_port'], item['ssh_keys'], item['priv_pass']])
+                            SECRETS.append(item['ssh_password'])
+                            ROWS.append(item)
                     else:
-                        if item['priv_pass'] == '-':
-                            EXE.append([item['host'], item['ssh_username'], self.decrypt(
-                                item['ssh_password']), item['ssh_port']])
-                        else:
-                            EXE.append([item['host'], item['ssh_username'], self.decrypt(
-                                item['ssh_password']), item['ssh_port'], item['priv_pass']])                    
+                        EXE.append([item['host'], item['ssh_username'], None, item['ssh_port'], item['priv_pass']])
+                        SECRETS.append(item['ssh_password'])
+                        ROWS.append(item)
             else:
                 if item['telnet'] == 'False':
                     msg.failure(
                         f"can't connect to {msg.YELLOW}{item['host']}{msg.RED} using TELNET , because you don't set valid telnet username & password.", very=True)
                 else:
-                    if item['priv_pass'] == '-':
-                        EXE.append([item['host'], item['telnet_username'], self.decrypt(
-                            item['telnet_password']), item['telnet_port']])
-                    else:
-                        EXE.append([item['host'], item['telnet_username'], self.decrypt(
-                            item['telnet_password']), item['telnet_port'], item['priv_pass']])
-
+                    EXE.append([item['host'], item['telnet_username'], None, item['telnet_port'], item['priv_pass']])
+                    SECRETS.append(item['telnet_password'])
+                    ROWS.append(item)
+
+        if opened is not None and EXE != []:
+            EXE, SECRETS, ROWS = self._skipOpenBreakers(EXE, SECRETS, ROWS, opened)
+        if preflight_timeout is not None and EXE != []:
+            EXE, SECRETS, ROWS = self._preflight(EXE, SECRETS, ROWS, preflight_timeout, unreachable)
+        # the whole password column is decrypted at once, not device by device
+        for job, password in zip(EXE, self.decryptMany(SECRETS)):
+            job[2] = password
+        if rows is not None:
+            rows.extend(ROWS)
         return EXE
 
     def getCredsConf(self, args, method) -> list:
         BIGLIST = []
-        host = ''
-        priv_pass = ''
-        telnet = False
-        telnet_username = ''
-        telnet_password = ''
-        telnet_port = ''
-        ssh = False
-        ssh_username = ''
-        ssh_password = ''
-        ssh_port = ''
-        ssh_use_keys = False
-        ssh_keys = ''
-        r, s, o = self._returnedDValue(args)
-        if r != []:
-            r_i = self.getInstance(r, 1)
-            for index_of_r in r_i:
-                if method == "ssh":
-                    host = index_of_r.host
-                    ssh = index_of_r.ssh
-                    ssh_username = index_of_r.ssh_username
-                    ssh_password = index_of_r.ssh_password
-                    ssh_port = index_of_r.ssh_port
-                    ssh_keys = index_of_r.ssh_keys
-                    ssh_use_keys = index_of_r.ssh_use_keys
-                    priv_pass = index_of_r.priv_pass
-                    BIGLIST.append({'host': host, 'ssh': ssh, 'ssh_username': ssh_username, 'ssh_password': ssh_password,
-                                    'ssh_port': ssh_port, 'ssh_use_keys': ssh_use_keys, 'ssh_keys': ssh_keys, 'priv_pass' : priv_pass})
-                elif method == "telnet":
-                    host = index_of_r.host
-                    telnet = index_of_r.telnet
-                    telnet_username = index_of_r.telnet_username
-                    telnet_password = index_of_r.telnet_password
-                    telnet_port = index_of_r.telnet_port
-                    priv_pass = index_of_r.priv_pass
-                    BIGLIST.append({'host': host, 'telnet': telnet, 'telnet_username': telnet_username,
-                                    'telnet_password': telnet_password, 'telnet_port': telnet_port, 'priv_pass':priv_pass})
-        if s != []:
-            s_i = self.getInstance(s, 2)
-            for index_of_s in s_i:
-                if method == "ssh":
-                    host = index_of_s.host
-                    ssh = index_of_s.ssh
-                    ssh_username = index_of_s.ssh_username
-                    ssh_password = index_of_s.ssh_password
-                    ssh_port = index_of_r.ssh_port
-                    ssh_keys = index_of_s.ssh_keys
-                    ssh_use_keys = index_of_s.ssh_use_keys
-                    priv_pass = index_of_s.priv_pass
-                    BIGLIST.append({'host': host, 'ssh': ssh, 'ssh_username': ssh_username, 'ssh_password': ssh_password,
-                                    'ssh_port': ssh_port, 'ssh_use_keys': ssh_use_keys, 'ssh_keys': ssh_keys, 'priv_pass':priv_pass})
-                elif method == "telnet":
-                    host = index_of_s.host
-                    telnet = index_of_s.telnet
-                    telnet_username = index_of_s.telnet_username
-                    telnet_password = index_of_s.telnet_password
-                    telnet_port = index_of_s.telnet_port
-                    priv_pass = index_of_s.priv_pass
-                    BIGLIST.append({'host': host, 'telnet': telnet, 'telnet_username': telnet_username,
-                                    'telnet_password': telnet_password, 'telnet_port': telnet_port, 'priv_pass':priv_pass})
-        if o != []:
-            o_i = self.getInstance(o, 3)
-            for index_of_o in o_i:
-                if method == "ssh":
-                    host = index_of_o.host
-                    ssh = index_of_o.ssh
-                    ssh_username = index_of_o.ssh_username
-                    ssh_password = index_of_o.ssh_password
-                    ssh_port = index_of_o.ssh_port
-                    ssh_keys = index_of_o.ssh_keys
-                    ssh_use_keys = index_of_o.ssh_use_keys
-                    priv_pass = index_of_o.priv_pass
-                    BIGLIST.append({'host': host, 'ssh': ssh, 'ssh_username': ssh_username, 'ssh_password': ssh_password,
-                                    'ssh_port': ssh_port, 'ssh_use_keys': ssh_use_keys, 'ssh_keys': ssh_keys, 'priv_pass':priv_pass})
-                elif method == "telnet":
-                    host = index_of_o.host
-                    telnet = index_of_o.telnet
-                    telnet_username = index_of_o.telnet_username
-                    telnet_password = index_of_o.telnet_password
-                    telnet_port = index_of_o.telnet_port
-                    priv_pass = index_of_o.priv_pass
-                    BIGLIST.append({'host': host, 'telnet': telnet, 'telnet_username': telnet_username,
-                                    'telnet_password': telnet_password, 'telnet_port': telnet_port, 'priv_pass':priv_pass})
-
+        for row in self.getInstances(args):
+            device = {'id': row['id'], 'hostname': row['hostname'], 'category': row['category'],
+                      'device_type': row['device_type']}
+            if method == "ssh":
+                BIGLIST.append({**device, 'host': row['host'], 'ssh': row['ssh'], 'ssh_username': row['ssh_username'],
+                                'ssh_password': row['ssh_password'], 'ssh_port': row['ssh_port'],
+                                'ssh_use_keys': row['ssh_use_keys'], 'ssh_keys': row['ssh_keys'], 'priv_pass': row['priv_pass']})
+            elif method == "telnet":
+                BIGLIST.append({**device, 'host': row['host'], 'telnet': row['telnet'], 'telnet_username': row['telnet_username'],
+                                'telnet_password': row['telnet_password'], 'telnet_port': row['telnet_port'],
+                                'priv_pass': row['priv_pass']})
         return (BIGLIST)
 
-    def getInstance(self, LIST, ID):
-        ALL_LIST = []
-        if ID == 1:
-            for I in LIST:
-                try:
-                    d = Routers.select().where(Routers.id == int(I)).get()
-                    ALL_LIST.append(d)
-                except:
-                    pass
-        elif ID == 2:
-            for I in LIST:
-                try:
-                    d = Switches.select().where(Switches.id == int(I)).get()
-                    ALL_LIST.append(d)
-                except:
-                    pass
-        elif ID == 3:
-            for I in LIST:
-                try:
-                    d = Others.select().where(Others.id == int(I)).get()
-                    ALL_LIST.append(d)
-                except:
-                    pass
-
-        return ALL_LIST
+    def tagDevices(self, selector: str, name: str, add=True):
+        """ --tag / --untag every device of a selector """
+        try:
+            where = parseSelector(selector)
+        except ValueError as err:
+            return msg.failure(f"bad selector {msg.YELLOW}{selector}{msg.RED} : {err}", very=True)
+        ids = [d.id for d in Device.select(Device.id).where(where)]
+        with db.atomic():
+            for i in range(0, len(ids), 400):
+                if add == True:
+                    Tag.insert_many([{'device': d, 'name': name} for d in ids[i:i + 400]]).on_conflict_ignore().execute()
+                else:
+                    Tag.delete().where((Tag.name == name) & (Tag.device.in_(ids[i:i + 400]))).execute()
+        msg.success(f"{len(ids)} device(s) {'tagged' if add else 'untagged'} {msg.GREEN}{name}{msg.RESET}")
 
-    def _returnedDValue(self, text):
-        routers_devices, switches_devices, others_devices = [], [], []
-        for i in text.split('-'):
-            if i.split('=')[0].lower() == 'r':
-                routers_devices = i.split('=')[1].split(',')
-            if i.split('=')[0].lower() == 's':
-                switches_devices = i.split('=')[1].split(',')
-            if i.split('=')[0].lower() == 'o':
-                others_devices = i.split('=')[1].split(',')
-        return routers_devices, switches_devices, others_devices
+    def getInstances(self, selector: str) -> list:
+        """ resolve a --connect-to selector with a single query for the whole run """
+        try:
+            where = parseSelector(selector)
+        except ValueError as err:
+            msg.failure(f"bad selector {msg.YELLOW}{selector}{msg.RED} : {err}", very=True)
+            return []
+        # plain cursor rows : every column is TEXT / INTEGER, peewee's per-field
+        # conversion of .dicts() would only cost time on large selections
+        cursor = db.execute_sql(*Device.select().where(where).order_by(Device.id).sql())
+        names = [c[0] for c in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
 
-    def readConfigfile(self, file):
+    @staticmethod
+    def readConfigfile(file):
         cmd_list = []
         f = open(file, mode='r').readlines()
         for line in f:
@@ -1211,22 +2657,725 @@ class Devices(object):
         return cmd_list
 
 
-def exe_ssh(i, cmds_l):
+def exe_ssh(i, cmds_l, shell=False, timeout=DEFAULT_TIMEOUT, diff=False, backup=False):
     h, u, pa, po, pr = i[0], i[1], i[2], i[3], i[4]
-    SSHSession(h, u, pa, po, '', pr, cmd=cmds_l).run()
+    return SSHSession(h, u, pa, po, '', pr, cmd=cmds_l, shell=shell, timeout=timeout, diff=diff, backup=backup).run()
 
 
-def exe_ssh_keys(i, cmds_l):
+def exe_ssh_keys(i, cmds_l, shell=False, timeout=DEFAULT_TIMEOUT, diff=False, backup=False):
     h, u, pa, po, k, pr = i[0], i[1], i[2], i[3], i[4], i[5]
-    SSHSession(h, u, pa, po, k, pr, cmds_l).run()
+    return SSHSession(h, u, pa, po, k, pr, cmds_l, shell=shell, timeout=timeout, diff=diff, backup=backup).run()
 
 
-def exe_telnet(i, cmds_l):
+def exe_telnet(i, cmds_l, timeout=DEFAULT_TIMEOUT, window=DEFAULT_WINDOW, diff=False, backup=False):
     try:
         h, u, pa, po, pr = i[0], i[1], i[2], i[3], i[4]
     except:
         h, u, pa, po, pr = i[0], i[1], i[2], i[3], '-' # if you face a probleme in Privilege mode , maybe change '-' to ''
-    TelnetSession(h, u, pa, po, pr, cmds_l).run()
+    return TelnetSession(h, u, pa, po, pr, cmds_l, timeout=timeout, window=window, diff=diff, backup=backup).run()
+
+
+def sessionWorker(method: str, ssh_keys=False, shell=False, timeout=DEFAULT_TIMEOUT, window=DEFAULT_WINDOW, diff=False,
+                  backup=False):
+    """ the exe_* function of a run, its options bound """
+    if method == "ssh":
+        worker = exe_ssh_keys if ssh_keys != False else exe_ssh
+        return functools.partial(worker, shell=shell, timeout=timeout, diff=diff, backup=backup)
+    return functools.partial(exe_telnet, timeout=timeout, window=window, diff=diff, backup=backup)
+
+
+def exe_parse(i, cmds_l, worker=None, parser=None):
+    """ `worker` runs the commands, their outputs are parsed on the same worker thread """
+    result = worker(i, cmds_l)
+    start = time.monotonic()
+    for record in result.commands:
+        try:
+            record['template'], record['parsed'] = parser.parse(record['command'], record['output'])
+        except Exception as err:
+            record['template'], record['parsed'] = None, None
+            msg.failure(f"{i[0]} : can't parse `{record['command']}` : {err}", very=True)
+    result.phase('parse', start)
+    return result
+
+
+def exe_backup(i, cmds_l, worker=None, store=None):
+    """ `worker` collects the running-config, stored (hash + compression) on the same worker thread """
+    result = worker(i, cmds_l)
+    if result.status == True:
+        start = time.monotonic()
+        result.digest, size = store.put(result.output)
+        result.phase('store', start)
+        result.output = ''
+        result.commands = [{'command': 'show running-config', 'output': '', 'exit_status': 0, 'size': size}]
+    return result
+
+
+def preflight(targets: list, timeout=PREFLIGHT_TIMEOUT, batch=PREFLIGHT_BATCH) -> list:
+    """
+    TCP reachability of every (host, port) : one asyncio task per target
+    resolves it (loop.getaddrinfo, PREFLIGHT_RESOLVERS names at a time) then
+    connects within `timeout` seconds, `batch` sockets open at most; returns
+    one bool per target
+    """
+    asyncio = require('asyncio')
+    futures = require('concurrent.futures')
+    probes = {}
+    for n, (host, port) in enumerate(targets):
+        probes.setdefault((host, port), []).append(n)
+
+    async def _probe(loop, gate, host, port) -> bool:
+        try:
+            family, kind, proto, _, address = (await loop.getaddrinfo(host, int(port), type=socket.SOCK_STREAM))[0]
+        except (OSError, ValueError):
+            return False
+        async with gate:
+            try:
+                sock = socket.socket(family, kind, proto)
+            except OSError:
+                return False
+            sock.setblocking(False)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+                return True
+            except (OSError, asyncio.TimeoutError):
+                return False
+            finally:
+                sock.close()
+
+    async def _sweep() -> list:
+        loop = asyncio.get_running_loop()
+        # getaddrinfo blocks, the names resolve on threads of their own
+        loop.set_default_executor(futures.ThreadPoolExecutor(max_workers=min(PREFLIGHT_RESOLVERS, max(1, len(probes)))))
+        gate = asyncio.Semaphore(batch)
+        return await asyncio.gather(*[_probe(loop, gate, host, port) for host, port in probes])
+
+    reachable = dict(zip(probes, asyncio.run(_sweep()) if probes else []))
+    status = [False] * len(targets)
+    for key, indexes in probes.items():
+        for n in indexes:
+            status[n] = reachable[key]
+    return status
+
+
+class AIMDLimit(object):
+    """
+    in-flight limit of the engine under --adaptive : it doubles while sessions
+    come back healthy (slow start), then grows by one per round, and is halved
+    on timeouts & auth failures so TACACS / management planes are not stormed.
+    sessions opened before a cut cannot trigger another one, and a connect
+    slower than LATENCY_FACTOR x the fastest seen only stops the growth
+    """
+
+    LATENCY_FACTOR = 4
+    LATENCY_FLOOR = 0.2
+
+    def __init__(self, ceiling: int, start=8):
+        asyncio = require('asyncio')
+        self.ceiling = max(1, ceiling)
+        self.limit = float(min(start, self.ceiling))
+        self.peak = int(self.limit)
+        self.inflight = 0
+        self._threshold = float(self.ceiling)
+        self._cut_at = 0.0
+        self._fastest = None
+        self._changed = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+        return time.monotonic()
+
+    async def release(self, result: SessionResult, opened: float):
+        async with self._changed:
+            self.inflight -= 1
+            self._update(result, opened)
+            self._changed.notify_all()
+
+    def _update(self, result: SessionResult, opened: float):
+        before = int(self.limit)
+        if result.reason in ('timeout', 'auth'):
+            if opened < self._cut_at:
+                return
+            self._threshold = max(1.0, self.limit / 2)
+            self.limit = self._threshold
+            self._cut_at = time.monotonic()
+            msg.warning(f"concurrency {before} -> {int(self.limit)} ({result.reason} on {result.host})")
+            return
+        connect = result.timings.get('connect')
+        if connect is None:
+            return
+        if self._fastest is None or connect < self._fastest:
+            self._fastest = connect
+        if connect > max(self.LATENCY_FLOOR, self.LATENCY_FACTOR * self._fastest):
+            return
+        step = 1.0 if self.limit < self._threshold else 1.0 / self.limit
+        self.limit = min(float(self.ceiling), self.limit + step)
+        if int(self.limit) > self.peak:
+            self.peak = int(self.limit)
+            if self.peak % 10 == 0 or self.peak == self.ceiling:
+                msg.info(f"concurrency {self.peak}")
+
+
+def runSessions(jobs: list, worker, cmds, method: str, max_inflight=DEFAULT_MAX_INFLIGHT, on_result=None, configs=None,
+                adaptive=False, retries=DEFAULT_RETRIES, on_start=None) -> list:
+    """
+    drive every job through `worker` from one asyncio loop, keeping at most
+    `max_inflight` sessions open at once; returns one SessionResult per job.
+    `on_start(n)` / `on_result(n, result)` are called from the loop when the
+    session of jobs[n] opens / finishes, `configs`
+    (one command list per job) replaces the shared `cmds` when given, and
+    `adaptive` lets an AIMDLimit move the limit between 1 and `max_inflight`.
+    a session that could not connect is tried again up to `retries` times
+    """
+    if jobs == []:
+        return []
+    asyncio = require('asyncio')
+    return asyncio.run(_fanOut(jobs, worker, cmds, method, max(1, int(max_inflight)), on_result, configs, adaptive,
+                               max(0, int(retries)), on_start))
+
+
+def backoff(attempt: int) -> float:
+    """ jittered exponential delay before retry number `attempt` (0 based) """
+    random = require('random')
+    return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+async def _fanOut(jobs: list, worker, cmds, method: str, max_inflight: int, on_result=None, configs=None,
+                  adaptive=False, retries=DEFAULT_RETRIES, on_start=None) -> list:
+    asyncio = require('asyncio')
+    futures = require('concurrent.futures')
+    loop = asyncio.get_running_loop()
+    inflight = asyncio.Semaphore(max_inflight)
+    limiter = AIMDLimit(max_inflight) if adaptive == True else None
+    # paramiko & telnetlib are blocking, each open session parks on its own thread
+    # while the loop only schedules, so the pool is sized to the in-flight limit
+    pool = futures.ThreadPoolExecutor(max_workers=min(max_inflight, len(jobs)))
+
+    async def _session(job, cmds):
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(pool, worker, job, cmds)
+        except Exception as err:
+            msg.failure(f"{job[0]} : {err}", very=True)
+            result = SessionResult(job[0], method, port=job[3])
+            result.fail(err)
+        result.duration = time.perf_counter() - start
+        return result
+
+    async def _attempt(n, job, cmds):
+        if limiter is None:
+            async with inflight:
+                if on_start is not None:
+                    on_start(n)
+                return await _session(job, cmds)
+        opened = await limiter.acquire()
+        if on_start is not None:
+            on_start(n)
+        result = await _session(job, cmds)
+        await limiter.release(result, opened)
+        return result
+
+    async def _one(n, job, cmds):
+        # only connect failures are retried : no command was sent yet, and
+        # repeating a rejected login would just lock the account
+        for attempt in range(retries + 1):
+            result = await _attempt(n, job, cmds)
+            if result.connected() or result.reason == 'auth' or attempt == retries:
+                break
+            delay = backoff(attempt)
+            msg.warning(f"{job[0]} : {result.reason}, retry {attempt + 1}/{retries} in {round(delay, 1)} second(s)")
+            await asyncio.sleep(delay)
+        result.attempts = attempt + 1
+        if on_result is not None:
+            on_result(n, result)
+        return result
+
+    try:
+        if configs is None:
+            return await asyncio.gather(*[_one(n, job, cmds) for n, job in enumerate(jobs)])
+        return await asyncio.gather(*[_one(n, job, configs[n]) for n, job in enumerate(jobs)])
+    finally:
+        pool.shutdown(wait=True)
+        if limiter is not None:
+            msg.flush()
+            print(f'[+] concurrency peak {limiter.peak}, final {int(limiter.limit)} (ceiling {limiter.ceiling})')
+
+
+class SessionPool(object):
+    """
+    authenticated SSH shells kept open by the daemon, one per device login and
+    already on the privileged prompt : a job only streams its commands. a shell
+    runs one job at a time, SSH keepalives hold it open and `evict` closes
+    the ones unused for `idle` seconds
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, idle=DAEMON_IDLE):
+        self._timeout = timeout
+        self._idle = idle
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def run(self, job: list, cmds: list, configure=False) -> SessionResult:
+        keys = job[4] if len(job) == 6 else ''
+        key = (job[0], str(job[3]), job[1], keys)
+        with self._lock:
+            entry = self._entries.setdefault(key, {'lock': threading.Lock(), 'session': None, 'used': 0.0})
+        with entry['lock']:
+            entry['used'] = time.monotonic()
+            started = time.perf_counter()
+            result = SessionResult(job[0], 'ssh', port=job[3])
+            try:
+                result = self._push(entry, job, keys, cmds, configure, result)
+            finally:
+                entry['used'] = time.monotonic()
+                result.duration = time.perf_counter() - started
+            return result
+
+    def _push(self, entry: dict, job: list, keys: str, cmds: list, configure: bool, result: SessionResult) -> SessionResult:
+        for attempt in range(2):
+            start = time.monotonic()
+            fresh = entry['session'] is None
+            if fresh:
+                session = SSHSession(job[0], job[1], job[2], job[3], keys, job[-1], cmds, timeout=self._timeout)
+                if session.et == False:
+                    session.result.timings['connect'] = time.monotonic() - start
+                    return session.result
+                try:
+                    session.openShell()
+                except Exception as err:
+                    session.connection.close()
+                    result.fail(err)
+                    result.timings['connect'] = time.monotonic() - start
+                    return result
+                session.connection.get_transport().set_keepalive(DAEMON_KEEPALIVE)
+                entry['session'] = session
+            elif not self._alive(entry['session']):
+                # closed by the device while idle : reopened before anything is sent
+                self._close(entry)
+                continue
+            result.timings['connect'] = time.monotonic() - start
+            start = time.monotonic()
+            # a warm shell is shared by jobs : only the bytes of this one (& of its login when fresh) are counted
+            counter = entry['session'].socket
+            sent, received = (0, 0) if fresh else (counter.sent, counter.received)
+            try:
+                transcript = entry['session'].push(cmds, configure)
+            except Exception as err:
+                self._close(entry)
+                result.fail(err)
+                # a warm shell that died before taking a single byte of the job is tried once more,
+                # anything else may have applied part of the config and is not pushed again
+                if fresh or counter.sent != sent or attempt == 1:
+                    result.timings['run'] = time.monotonic() - start
+                    return result
+                continue
+            finally:
+                result.sent += counter.sent - sent
+                result.received += counter.received - received
+            result.error = None
+            result.reason = None
+            result.timings['run'] = time.monotonic() - start
+            result.output = transcript
+            result.commands = splitTranscript(transcript, cmds)
+            result.status = CMD_ERRORS.search(transcript) is None
+            if result.status == False:
+                result.error = 'command errors'
+            return result
+        return result
+
+    @staticmethod
+    def _alive(session) -> bool:
+        transport = session.connection.get_transport()
+        return transport is not None and transport.is_active() and not session._chan.closed
+
+    def evict(self) -> int:
+        """ close the shells idle for too long, returns how many are still open """
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, entry in entries:
+            if now - entry['used'] > self._idle and entry['lock'].acquire(blocking=False):
+                try:
+                    self._close(entry)
+                    with self._lock:
+                        del self._entries[key]
+                finally:
+                    entry['lock'].release()
+        return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries = {}
+        for entry in entries:
+            self._close(entry)
+
+    @staticmethod
+    def _close(entry: dict):
+        if entry['session'] is not None:
+            try:
+                entry['session'].connection.close()
+            except Exception:
+                pass
+            entry['session'] = None
+
+
+def serveDaemon(path=DAEMON_SOCKET, max_inflight=DEFAULT_MAX_INFLIGHT, timeout=DEFAULT_TIMEOUT, idle=DAEMON_IDLE,
+                metrics_listen=None):
+    """
+    --daemon : answer jobs sent on the unix socket `path` with the warm sessions
+    of a SessionPool. one JSON request per connection, one JSON line back per
+    device as it finishes, then a summary line. `metrics_listen` serves their
+    Metrics over HTTP
+    """
+    asyncio = require('asyncio')
+    futures = require('concurrent.futures')
+    devices = Devices()
+    pool = SessionPool(timeout, idle)
+    executor = futures.ThreadPoolExecutor(max_workers=max(1, max_inflight))
+    metrics = Metrics()
+    httpd = metrics.serve(metrics_listen) if metrics_listen else None
+
+    def _session(job: list, cmds: list, configure: bool) -> SessionResult:
+        metrics.started('ssh')
+        result = pool.run(job, cmds, configure)
+        metrics.finished(result)
+        return result
+
+    async def _job(reader, writer):
+        try:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise ValueError(f"request larger than {DAEMON_REQUEST_LIMIT} byte(s)")
+            request = json.loads(line)
+            jobs = devices._processData(request['args'], 'ssh', request.get('ssh_keys', False), preflight_timeout=None)
+            loop = asyncio.get_running_loop()
+            log = RunLog()
+            started = time.perf_counter()
+            pending = [loop.run_in_executor(executor, _session, job, request['cmds'], request.get('configure', False))
+                       for job in jobs]
+            done = 0
+            for finished in asyncio.as_completed(pending):
+                result = await finished
+                done += 1 if result.status else 0
+                log.write(result)
+                writer.write((json.dumps(result.record()) + '\n').encode())
+                await writer.drain()
+            log.close()
+            metrics.run(time.perf_counter() - started)
+            writer.write((json.dumps({'total': len(jobs), 'done': done, 'report': log.path,
+                                      'elapsed': round(time.perf_counter() - started, 6)}) + '\n').encode())
+        except Exception as err:
+            writer.write((json.dumps({'error': str(err)}) + '\n').encode())
+        finally:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def _evict():
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(idle, DAEMON_KEEPALIVE))
+            await loop.run_in_executor(executor, pool.evict)
+
+    async def _main():
+        signal = require('signal')
+        if os.path.exists(path):
+            os.remove(path)
+        # one request is one line : the default 64 KiB reader limit would cut big configs
+        # the socket is 0600 from its creation on : no other user can connect before a chmod
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(_job, path=path, limit=DAEMON_REQUEST_LIMIT)
+        finally:
+            os.umask(umask)
+        msg.success(f"daemon listening on {msg.GREEN}{path}{msg.RESET} (idle sessions closed after {idle} second(s))")
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        evict = asyncio.ensure_future(_evict())
+        async with server:
+            await stop.wait()
+        evict.cancel()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+        executor.shutdown(wait=False)
+        if httpd is not None:
+            httpd.shutdown()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def submitJob(args, cmds, ssh_keys=False, configure=False, path=DAEMON_SOCKET) -> dict:
+    """ client side of --via-daemon : send one job, print every device as it comes back """
+    if type(cmds) == str:
+        cmds = [cmds]
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError as err:
+        exit(msg.failure(f"no daemon on {path} ({err}), start one with --daemon"))
+    try:
+        client.sendall((json.dumps({'args': args, 'cmds': cmds, 'ssh_keys': ssh_keys, 'configure': configure}) + '\n').encode())
+    except ConnectionError:
+        # the daemon refused the request before reading all of it, its error line follows
+        pass
+    summary = {'error': 'the daemon closed the connection without answering'}
+    try:
+        for line in client.makefile('r'):
+            record = json.loads(line)
+            if 'host' not in record:
+                summary = record
+                break
+            if record['status'] == True:
+                msg.success(f"{msg.GREEN}{record['host']}{msg.RESET} done in {round(record['duration'] * 1000, 1)} ms")
+            else:
+                msg.failure(f"{msg.YELLOW}{record['host']}{msg.RED} : {record['error']}", very=True)
+            for c in record['commands']:
+                if c['output'].strip() != '':
+                    print(c['output'].rstrip('\n'))
+    except ConnectionError:
+        pass
+    client.close()
+    if 'error' in summary:
+        msg.failure(summary['error'], very=True)
+    elif summary != {}:
+        print(f"[+] {summary['done']}/{summary['total']} device(s) configured successfully")
+        print(f"[+] finished in {round(summary['elapsed'], 3)} second(s)")
+        print(f"[+] report saved in {summary['report']}")
+    return summary
+
+
+class HashRing(object):
+    """
+    consistent hashing of keys over nodes (SHARD_REPLICAS points each) : a
+    node added or lost only moves the keys of its own arcs
+    """
+
+    def __init__(self, nodes: list, replicas=SHARD_REPLICAS):
+        self._points = sorted((self.hash(f'{node}#{i}'), node) for node in nodes for i in range(replicas))
+        self._hashes = [h for h, _ in self._points]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(require('hashlib').md5(key.encode()).digest()[:8], 'big')
+
+    def node(self, key: str) -> str:
+        bisect = require('bisect')
+        return self._points[bisect.bisect(self._hashes, self.hash(key)) % len(self._points)][1]
+
+
+def workerAddress(address: str):
+    """ (host, port) of a TCP --worker address, None for the path of a unix socket """
+    if ':' in address and not address.startswith(('/', '.')):
+        host, port = address.rsplit(':', 1)
+        return host.strip('[]'), int(port)
+    return None
+
+
+def isLoopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return require('ipaddress').ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def workerSocket(address: str, timeout=None, tls=None) -> socket.socket:
+    """ connected socket to a --worker, `host:port` (TCP, in `tls` when given) or the path of a unix socket """
+    tcp = workerAddress(address)
+    if tcp is not None:
+        sock = socket.create_connection(tcp, timeout)
+        return sock if tls is None else tls.wrap_socket(sock, server_hostname=tcp[0])
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+
+def runShards(jobs: list, cmds, method: str, workers: list, options: dict, keys: list, on_result=None, configs=None,
+              on_start=None, token=None, tls_ca=None, insecure=False) -> list:
+    """
+    coordinator of --workers : every job goes to the worker owning its key on
+    a HashRing of the workers that answer, each shard is sent as one request
+    and its devices come back one line each as they finish. `on_start` /
+    `on_result` get the global job index, like with runSessions. devices of a
+    worker lost halfway get no result (their job rows stay open for --resume).
+    TCP workers need `token`, remote ones TLS (`tls_ca`) unless `insecure`
+    """
+    if jobs == []:
+        return []
+    tcp = [workerAddress(address) for address in workers]
+    if not token and any(t is not None for t in tcp):
+        msg.failure('TCP workers need --token (or $' + TOKEN_ENV + '), nothing was sent', very=True)
+        return []
+    tls = None if tls_ca is None else require('ssl').create_default_context(cafile=tls_ca)
+    sockets = {}
+    for address, target in zip(workers, tcp):
+        if target is not None and tls is None and insecure == False and not isLoopback(target[0]):
+            msg.failure(f"worker {msg.YELLOW}{address}{msg.RED} is remote : use --tls-ca (or --insecure-workers for plain TCP), "
+                        "its devices go to the others.", very=True)
+            continue
+        try:
+            sockets[address] = workerSocket(address, timeout=PREFLIGHT_TIMEOUT, tls=tls)
+            sockets[address].settimeout(None)
+        except (OSError, ValueError) as err:
+            msg.failure(f"worker {msg.YELLOW}{address}{msg.RED} is unreachable ({err}), its devices go to the others.", very=True)
+    if sockets == {}:
+        msg.failure('no worker answered, nothing was sent', very=True)
+        return []
+    ring = HashRing(list(sockets))
+    shards = {address: [] for address in sockets}
+    for n, key in enumerate(keys):
+        shards[ring.node(key)].append(n)
+    msg.info('shards : ' + ', '.join(f"{address} {len(indexes)}" for address, indexes in shards.items()))
+    results = [None] * len(jobs)
+    lock = threading.Lock()
+
+    def _shard(address: str, indexes: list):
+        sock = sockets[address]
+        try:
+            if indexes == []:
+                return
+            request = {'token': token, 'method': method, 'cmds': cmds, 'options': options,
+                       'jobs': [jobs[n] for n in indexes],
+                       'configs': None if configs is None else [configs[n] for n in indexes]}
+            sock.sendall((json.dumps(request) + '\n').encode())
+            for line in sock.makefile('r'):
+                event = json.loads(line)
+                if 'error' in event:
+                    raise Exception(event['error'])
+                if 'n' not in event:
+                    break
+                n = indexes[event['n']]
+                with lock:
+                    if 'result' not in event:
+                        if on_start is not None:
+                            on_start(n)
+                        continue
+                    results[n] = SessionResult.fromRecord(event['result'], event['started'])
+                    if on_result is not None:
+                        on_result(n, results[n])
+        except Exception as err:
+            msg.failure(f"worker {msg.YELLOW}{address}{msg.RED} : {err}", very=True)
+        finally:
+            sock.close()
+            lost = len([n for n in indexes if results[n] is None])
+            if lost > 0:
+                msg.warning(f"worker {address} did not report {lost} device(s)")
+
+    threads = [threading.Thread(target=_shard, args=(address, indexes)) for address, indexes in shards.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [r for r in results if r is not None]
+
+
+def serveWorker(address: str, token=None, metrics_listen=None, tls_cert=None, tls_key=None, insecure=False):
+    """
+    --worker : run the shards of a coordinator (--workers) with the local
+    engine. one JSON request per connection, then one line when a device
+    starts, one with its result when it finishes and a summary line.
+    `metrics_listen` serves the Metrics of the shards over HTTP. a TCP worker
+    needs `token`, and TLS (`tls_cert` / `tls_key`) off loopback unless `insecure`
+    """
+    tcp = workerAddress(address)
+    if tcp is not None and not token:
+        msg.failure(f"a TCP worker needs --token (or ${TOKEN_ENV}), or listen on a unix socket path")
+        exit(1)
+    if tcp is not None and tls_cert is None and insecure == False and not isLoopback(tcp[0]):
+        msg.failure(f"{address} is not a loopback address : give --tls-cert / --tls-key, or --insecure-workers for plain TCP")
+        exit(1)
+    socketserver, hmac, signal = require('socketserver'), require('hmac'), require('signal')
+    devices = Devices()
+    parser = []
+    metrics = Metrics()
+    httpd = metrics.serve(metrics_listen) if metrics_listen else None
+
+    class Handler(socketserver.StreamRequestHandler):
+        def send(self, event: dict):
+            self.wfile.write((json.dumps(event) + '\n').encode())
+
+        def handle(self):
+            try:
+                if tls_cert is not None:
+                    self.request.do_handshake()
+                request = json.loads(self.rfile.readline())
+                if token and not hmac.compare_digest(str(request.get('token') or ''), token):
+                    return self.send({'error': 'bad token'})
+                jobs, options = request['jobs'], request['options']
+                for job, password in zip(jobs, devices.decryptMany([job[2] for job in jobs])):
+                    job[2] = password
+                worker = sessionWorker(request['method'], options['ssh_keys'], options['shell'], options['timeout'],
+                                       options['window'], options['diff'])
+                if options.get('parse') == True:
+                    if parser == []:
+                        parser.append(OutputParser())
+                    worker = functools.partial(exe_parse, worker=worker, parser=parser[0])
+                msg.info(f"shard of {len(jobs)} device(s) received")
+                started = time.perf_counter()
+
+                def _start(n):
+                    metrics.started(request['method'])
+                    self.send({'n': n})
+
+                def _result(n, result):
+                    metrics.finished(result)
+                    self.send({'n': n, 'result': result.record(), 'started': result.started})
+
+                results = runSessions(jobs, worker, request['cmds'], request['method'], options['max_inflight'],
+                                      on_result=_result, configs=request['configs'], adaptive=options['adaptive'],
+                                      retries=options['retries'], on_start=_start)
+                metrics.run(time.perf_counter() - started)
+                self.send({'total': len(jobs), 'done': len([r for r in results if r.status])})
+            except Exception as err:
+                msg.failure(f"shard failed : {err}", very=True)
+                try:
+                    self.send({'error': str(err)})
+                except OSError:
+                    pass
+
+    unix = tcp is None
+    if unix:
+        if os.path.exists(address):
+            os.remove(address)
+        umask = os.umask(0o077)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(address, Handler)
+        finally:
+            os.umask(umask)
+    else:
+        server = type('Server', (socketserver.ThreadingTCPServer,), {'allow_reuse_address': True})(tcp, Handler)
+        if tls_cert is not None:
+            ssl = require('ssl')
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(tls_cert, tls_key)
+            # handshakes run on the handler threads, a slow peer never holds accept()
+            server.socket = context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+    # SIGTERM stops taking shards, server_close() then waits for the running ones
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    msg.success(f"worker listening on {msg.GREEN}{address}{msg.RESET}" + (' (TLS)' if tls_cert is not None else '')
+                + ('' if token else ' (no --token set)'))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if httpd is not None:
+            httpd.shutdown()
+        if unix and os.path.exists(address):
+            os.remove(address)
 
 
 class ArgsParser(object):
@@ -1244,17 +3393,80 @@ class ArgsParser(object):
         self._devices.add_argument('--add', action='store_true')
         self._devices.add_argument('--delete', action='store_true')
         self._devices.add_argument('--edit', action='store_true')
+        self._devices.add_argument('--where', metavar='SELECTOR', help="--list only the devices of a selector (e.g 'name=core-*')")
+        self._devices.add_argument('--plain', action='store_true', help="--list as tab separated lines, without banner")
+        self._devices.add_argument('--page-size', type=int, default=LIST_PAGE, help="rows read per query by --list")
+        self._devices.add_argument('--tag', help="add a tag to the --connect-to devices")
+        self._devices.add_argument('--untag', help="remove a tag from the --connect-to devices")
+        self._devices.add_argument('--import', dest='import_file', metavar='FILE', help="add the devices of a CSV / JSON file")
+        self._devices.add_argument('--export', dest='export_file', metavar='FILE', help="write the devices to a CSV / JSON file")
         self._config = self._parser.add_argument_group('Configuration Options')
         self._config.add_argument(
-            '--connect-to', help="IDs of device you want to connect (e.g --connect-to='R=1,2,3-S=2,3,10-O=2,8,9')")
+            '--connect-to', help="devices to connect (e.g 'R=1,2,10-20-S=*', 'all', 'name=core-*', 'host=10.1.0.0/16', 'tag=paris&!tag=lab')")
         self._config.add_argument('--config-file', help="configuration file")
         self._config.add_argument(
             '--config-cmd', help="one line of configuration")
+        self._config.add_argument(
+            '--template', action='store_true', help="render --config-file per device ($hostname, $host, vars file ..)")
+        self._config.add_argument('--vars-file', help="JSON variables of --template, by device ID / host / hostname")
+        self._config.add_argument(
+            '--max-inflight', type=int, default=DEFAULT_MAX_INFLIGHT, help="maximum of sessions open at the same time")
+        self._config.add_argument(
+            '--adaptive', action='store_true', help="grow / shrink the in-flight sessions up to --max-inflight (AIMD)")
+        self._config.add_argument(
+            '--diff', action='store_true', help="push only the lines missing from show running-config")
+        self._config.add_argument(
+            '--parse', nargs='?', const='json', choices=['json', 'csv'], help="parse show commands with the TextFSM templates")
+        self._config.add_argument(
+            '--backup', action='store_true', help="store the running-config of the devices (compressed, deduplicated)")
+        self._config.add_argument('--history', action='store_true', help="backups taken from the --connect-to devices")
+        self._config.add_argument('--show-backup', metavar='DIGEST', help="print a stored running-config")
+        self._config.add_argument('--backup-dir', default=BACKUP_STORE, help="directory of the backup store")
+        self._config.add_argument(
+            '--resume', type=int, metavar='JOB_ID', help="dispatch again the unfinished devices of a job")
+        self._config.add_argument(
+            '--retries', type=int, default=DEFAULT_RETRIES, help="new tries of a device that could not be reached")
+        self._config.add_argument(
+            '--ignore-breaker', action='store_true', help="also connect to hosts with an open circuit breaker")
+        self._config.add_argument(
+            '--breaker-runs', type=int, default=BREAKER_RUNS, help="failed runs in a row that open the breaker of a host")
+        self._config.add_argument(
+            '--breaker-cooldown', type=float, default=BREAKER_COOLDOWN, help="seconds an open breaker skips its host")
+        self._config.add_argument(
+            '--no-preflight', action='store_true', help="do not check the ports of the devices before connecting")
+        self._config.add_argument(
+            '--preflight-timeout', type=float, default=PREFLIGHT_TIMEOUT, help="seconds to wait for the pre-flight port check")
+        self._config.add_argument(
+            '--timeout', type=float, default=DEFAULT_TIMEOUT, help="seconds to wait for each answer of the device")
+        self._config.add_argument(
+            '--profile', nargs='?', const=PROFILE_SLOWEST, type=int, metavar='N', help="latency of every session phase & the N slowest devices")
+        self._config.add_argument('--profile-dump', metavar='FILE', help="also write a cProfile of the run to FILE (implies --profile)")
+        self._config.add_argument('--metrics-file', metavar='FILE', help="write the OpenMetrics of the run to FILE (textfile collector)")
+        self._config.add_argument(
+            '--metrics-listen', metavar='[HOST:]PORT', help="serve OpenMetrics on /metrics from --daemon / --worker")
+        self._config.add_argument('--log-level', choices=list(LOG_LEVELS), default='info', help="hide the messages below this level")
+        self._config.add_argument('--log-json', action='store_true', help="messages as JSON lines on stderr")
         self._ssh = self._parser.add_argument_group('SSH Options')
         self._ssh.add_argument('--ssh', action='store_true')
         self._ssh.add_argument('--use-keys', action="store_true")
+        self._ssh.add_argument('--shell', action="store_true", help="push every command through one interactive shell channel")
+        self._ssh.add_argument('--daemon', action="store_true", help="keep warm SSH sessions and serve jobs on a unix socket")
+        self._ssh.add_argument('--via-daemon', action="store_true", help="send the job to the running --daemon")
+        self._ssh.add_argument('--socket', default=DAEMON_SOCKET, help="unix socket of the daemon")
+        self._ssh.add_argument('--idle', type=float, default=DAEMON_IDLE, help="seconds before the daemon closes an unused session")
+        self._workers = self._parser.add_argument_group('Workers Options')
+        self._workers.add_argument('--worker', metavar='ADDRESS', help="run the shards of a coordinator, on host:port or a unix socket")
+        self._workers.add_argument('--workers', help="spread --connect-to over these workers (comma separated addresses)")
+        self._workers.add_argument('--shard-by', choices=['hash', 'site'], default='hash', help="consistent hashing of device IDs or of site tags")
+        self._workers.add_argument('--token', default=os.environ.get(TOKEN_ENV), help=f"secret shared by coordinator & workers (default: ${TOKEN_ENV})")
+        self._workers.add_argument('--tls-cert', metavar='FILE', help="certificate of a TCP --worker (PEM)")
+        self._workers.add_argument('--tls-key', metavar='FILE', help="private key of --tls-cert (PEM)")
+        self._workers.add_argument('--tls-ca', metavar='FILE', help="CA that signed the --workers certificates, turns TLS on")
+        self._workers.add_argument('--insecure-workers', action='store_true', help="allow plain TCP workers off loopback")
         self._telnet = self._parser.add_argument_group('Telnet Options')
         self._telnet.add_argument('--telnet', action='store_true')
+        self._telnet.add_argument(
+            '--window', type=int, default=DEFAULT_WINDOW, help="config lines sent ahead of the device echo")
         self._args = self._parser.parse_args()
 
     def parser_error(self, errmsg):
@@ -1282,24 +3494,68 @@ class ArgsParser(object):
 
         print(msg.WHITE+'\033[1m\033[4mrequired options\033[0m:')
         print(msg.WHITE+'\t--devices\t\trequired argument ')
-        print(msg.WHITE+'\t--connect-to\t\tID of devices to start config syntax : (e.g --connect-to=' +
+        print(msg.WHITE+'\t--connect-to\t\tdevices to start config syntax : (e.g --connect-to=' +
               repr('R=1,2-S=1,2,3-O=1,2')+')')
+        print(msg.WHITE+'\t\t\t\tIDs & ranges (R=1-500, S=*), all, name=GLOB, host=IP/CIDR/GLOB, tag=GLOB')
+        print(msg.WHITE+'\t\t\t\tjoined with & (and), ; (or), ! (not) : ' + repr('tag=paris&name=core-*;host=10.9.0.0/16'))
         print(msg.WHITE+'\033[1m\033[4mDevices options\033[0m:')
         print(msg.WHITE+'\t--routers\t\trun operations on routers')
         print(msg.WHITE+'\t--switches\t\trun operations on switches')
         print(msg.WHITE+'\t--others\t\trun operations on others')
         print(msg.WHITE+'\033[1m\033[4moperations options\033[0m:')
         print(msg.WHITE+'\t--list\t\t\tlist of devices')
+        print(msg.WHITE+'\t\t--where\t\tonly the devices of a selector (same syntax as --connect-to)')
+        print(msg.WHITE+'\t\t--plain\t\ttab separated lines (id, category, hostname ..) for scripts')
+        print(msg.WHITE+'\t\t--page-size\trows read per query, printed before the next one (default: {0})'.format(LIST_PAGE))
         print(msg.WHITE+'\t--add\t\t\tadd new devices')
         print(msg.WHITE+'\t--edit\t\t\tedit devices')
         print(msg.WHITE+'\t--delete\t\tdelete devices')
+        print(msg.WHITE+'\t--tag / --untag TAG\tlabel the --connect-to devices (selected later with tag=TAG)')
+        print(msg.WHITE+'\t--import FILE\t\tadd the devices of a CSV / JSON file (columns of --export, passwords in clear, tags)')
+        print(msg.WHITE+'\t--export FILE\t\twrite the devices (of --routers/--switches/--others) to a CSV / JSON file')
         print(msg.WHITE+'\033[1m\033[4mconfiguration options\033[0m:')
         print(msg.WHITE+'\t--config-file\t\tfile contains configuration')
         print(msg.WHITE+'\t--config-cmd\t\tsingle configuration command')
+        print(msg.WHITE+'\t\t--template\trender --config-file for each device ($hostname, $host, $id, vars file)')
+        print(msg.WHITE+'\t\t--vars-file\tJSON variables : {"*": {..}, "<ID/host/hostname>": {..}}')
+        print(msg.WHITE+'\t--max-inflight\t\tmaximum of sessions open at the same time (default: {0})'.format(DEFAULT_MAX_INFLIGHT))
+        print(msg.WHITE+'\t\t--adaptive\tstart low, grow while sessions are healthy, halve on timeouts & auth failures')
+        print(msg.WHITE+'\t--diff\t\t\tcompare with show running-config (section aware) and push only what is missing')
+        print(msg.WHITE+'\t--parse [json/csv]\tparse the outputs with the TextFSM templates of {0} (default: json)'.format(TEMPLATES_DIR))
+        print(msg.WHITE+'\t--backup\t\tstore the running-config of the --connect-to devices (one object per distinct config)')
+        print(msg.WHITE+'\t\t--history\tbackups taken from the --connect-to devices')
+        print(msg.WHITE+'\t\t--show-backup\tprint the stored config of a digest (or unique prefix)')
+        print(msg.WHITE+'\t\t--backup-dir\tdirectory of the backup store (default: {0})'.format(BACKUP_STORE))
+        print(msg.WHITE+'\t--resume JOB_ID\t\tconfigure the devices a job left pending (its commands & method are reused)')
+        print(msg.WHITE+'\t--retries\t\tnew tries (jittered exponential backoff) of a device that could not be reached (default: {0})'.format(DEFAULT_RETRIES))
+        print(msg.WHITE+'\t--ignore-breaker\tconnect even to hosts unreachable on the last --breaker-runs runs')
+        print(msg.WHITE+'\t\t--breaker-runs\tfailed runs in a row that open the breaker of a host:port (default: {0})'.format(BREAKER_RUNS))
+        print(msg.WHITE+'\t\t--breaker-cooldown\tseconds an open breaker skips its host:port (default: {0})'.format(BREAKER_COOLDOWN))
+        print(msg.WHITE+'\t--no-preflight\t\tskip the TCP port sweep run before connecting')
+        print(msg.WHITE+'\t--preflight-timeout\tseconds to wait for the port sweep (default: {0})'.format(PREFLIGHT_TIMEOUT))
+        print(msg.WHITE+'\t--timeout\t\tseconds to wait for each answer of the device (default: {0})'.format(DEFAULT_TIMEOUT))
+        print(msg.WHITE+'\t--profile [N]\t\tp50 / p95 / max of every session phase (dns, tcp, kex, auth, enable, exec ..) & the N slowest devices (default: {0})'.format(PROFILE_SLOWEST))
+        print(msg.WHITE+'\t\t--profile-dump\talso write a cProfile of the run to a file (read it with python3 -m pstats)')
+        print(msg.WHITE+'\t--metrics-file FILE\tOpenMetrics of the run (sessions by result, phase latencies, bytes, in-flight) for a textfile collector')
+        print(msg.WHITE+'\t--metrics-listen PORT\tserve the same metrics on http://{0}:PORT/metrics from --daemon / --worker ([HOST:]PORT)'.format(METRICS_HOST))
+        print(msg.WHITE+'\t--log-level LEVEL\thide the messages below {0} (default: info, warning keeps only the problems)'.format('/'.join(LOG_LEVELS)))
+        print(msg.WHITE+'\t--log-json\t\tmessages as JSON lines (time, level, message, thread, pid) on stderr, reports stay on stdout')
         print(msg.WHITE+'\033[1m\033[4mconnection options\033[0m:')
         print(msg.WHITE+'\t--ssh\t\t\tconnect using ssh methods')
         print(msg.WHITE+'\t\t--use-keys\tuse ssh keys')
-        print(msg.WHITE+'\t--telnet\t\tconnect using telnet methods\n')
+        print(msg.WHITE+'\t\t--shell\t\tuse one interactive shell (enable & conf t once) instead of one channel per command')
+        print(msg.WHITE+'\t--daemon\t\tkeep authenticated SSH sessions open and serve jobs on --socket (default: {0})'.format(DAEMON_SOCKET))
+        print(msg.WHITE+'\t\t--idle\t\tseconds before an unused session is closed (default: {0})'.format(DAEMON_IDLE))
+        print(msg.WHITE+'\t\t--via-daemon\tsend --connect-to --ssh jobs to the daemon (--shell runs them in conf t)')
+        print(msg.WHITE+'\t--worker ADDRESS\trun the shards sent by a coordinator, on host:port or a unix socket path')
+        print(msg.WHITE+'\t--workers ADDRESSES\tspread the --connect-to devices over running workers (comma separated)')
+        print(msg.WHITE+'\t\t--shard-by\thash (device IDs) or site (first `{0}*` tag), consistent hashing either way'.format(SITE_TAG))
+        print(msg.WHITE+'\t\t--token\t\tsecret shared by the coordinator & the workers, required over TCP (default: ${0})'.format(TOKEN_ENV))
+        print(msg.WHITE+'\t\t--tls-cert/key\tTLS certificate & key of a --worker, required off loopback')
+        print(msg.WHITE+'\t\t--tls-ca\tCA of the --workers certificates, the coordinator then speaks TLS')
+        print(msg.WHITE+'\t\t--insecure-workers\taccept plain TCP to / from workers off loopback (credentials are barely obfuscated)')
+        print(msg.WHITE+'\t--telnet\t\tconnect using telnet methods')
+        print(msg.WHITE+'\t\t--window\tconfig lines sent ahead of the device echo (default: {0})\n'.format(DEFAULT_WINDOW))
 
     def _GetAll(self):
         return self._args
@@ -1307,10 +3563,62 @@ class ArgsParser(object):
 
 def main():
     args = ArgsParser()._GetAll()
-    if args.devices:
+    setupLogging(args.log_level, args.log_json)
+    # engine options shared by every connection method
+    run = dict(max_inflight=args.max_inflight, adaptive=args.adaptive, retries=args.retries, timeout=args.timeout,
+               ignore_breaker=args.ignore_breaker, breaker_runs=max(1, args.breaker_runs),
+               breaker_cooldown=args.breaker_cooldown, diff=args.diff, parse=args.parse, shard_by=args.shard_by, token=args.token,
+               profile=args.profile, profile_dump=args.profile_dump, metrics_file=args.metrics_file,
+               workers=[w.strip() for w in args.workers.split(',') if w.strip() != ''] if args.workers else None,
+               tls_ca=args.tls_ca, insecure_workers=args.insecure_workers,
+               preflight_timeout=None if args.no_preflight else args.preflight_timeout)
+    listing = dict(selector=args.where, plain=args.plain, page=max(1, args.page_size))
+    if args.worker:
+        serveWorker(args.worker, args.token, args.metrics_listen, args.tls_cert, args.tls_key, args.insecure_workers)
+    elif args.daemon:
+        serveDaemon(args.socket, args.max_inflight, args.timeout, args.idle, args.metrics_listen)
+    elif args.via_daemon and args.connect_to:
+        if args.ssh == False or args.telnet == True:
+            msg.failure('the daemon only keeps SSH sessions, use --ssh')
+        elif args.template:
+            msg.failure('--template renders a config per device, it can not run through the daemon')
+        elif args.config_file or args.config_cmd:
+            # a config file goes inside conf t like on a local run, --config-cmd stays at the exec prompt
+            cmds = Devices.readConfigfile(args.config_file) if args.config_file else args.config_cmd
+            submitJob(args.connect_to, cmds, ssh_keys=args.use_keys, configure=bool(args.config_file), path=args.socket)
+        else:
+            msg.failure('please speciefy --config-file or --config-cmd')
+    elif (args.tag or args.untag) and args.connect_to:
+        print(' ')
+        Devices().tagDevices(args.connect_to, args.tag or args.untag, add=args.tag is not None)
+    elif args.show_backup:
+        Devices().showBackup(args.show_backup, args.backup_dir)
+    elif args.history and args.connect_to:
+        print(' ')
+        Devices().history(args.connect_to, args.backup_dir)
+    elif args.backup and args.connect_to:
+        print(' ')
+        if args.ssh and args.telnet == False:
+            Devices().backup(args.connect_to, "ssh", ssh_keys=args.use_keys, store=args.backup_dir, **run)
+        elif args.telnet and any([args.ssh, args.use_keys]) is False:
+            Devices().backup(args.connect_to, "telnet", store=args.backup_dir, window=args.window, **run)
+        else:
+            msg.failure('please speciefy the connection method: (example : --ssh or --telnet or --ssh --ssh-keys) !! see the help')
+    elif args.resume is not None:
+        print(' ')
+        Devices().resume(args.resume, **run)
+    elif args.devices and (args.import_file or args.export_file):
+        print(' ')
+        dtype = 1 if args.routers else 2 if args.switches else 3 if args.others else None
+        if args.import_file:
+            Devices()._importDevices(args.import_file, dtype)
+        else:
+            Devices()._exportDevices(args.export_file, dtype)
+    elif args.devices:
         if args.list and any([args.routers, args.switches, args.others, args.add, args.delete, args.edit, args.ssh, args.use_keys, args.telnet, args.connect_to]) is False:
-            print(' ')
-            Devices()._listDevices(dtype=None)
+            if args.plain == False:
+                print(' ')
+            Devices()._listDevices(dtype=None, **listing)
         elif args.add and any([args.routers, args.switches, args.others, args.list, args.delete, args.edit, args.ssh, args.use_keys, args.telnet, args.connect_to]) is False:
             print(' ')
             Devices()._addDevices(dtype=None)
@@ -1322,8 +3630,9 @@ def main():
                 '--edit works only when you speciefy device category (example : --devices [--routers/--switches/--others] --edit) ')
         elif args.routers and any([args.switches, args.others, args.ssh, args.use_keys, args.telnet, args.connect_to]) is False:
             if args.list and all([args.add, args.delete, args.edit]) is False:
-                print(' ')
-                Devices()._listDevices(dtype=1)
+                if args.plain == False:
+                    print(' ')
+                Devices()._listDevices(dtype=1, **listing)
             elif args.add and all([args.list, args.delete, args.edit]) is False:
                 print(' ')
                 Devices()._addDevices(dtype=1)
@@ -1338,8 +3647,9 @@ def main():
                     'please speciefy the operation --routers [OPTIONS] : (example : --list or --add or --edit or --delete)')
         elif args.switches and any([args.routers, args.others, args.ssh, args.use_keys, args.telnet, args.connect_to]) is False:
             if args.list and any([args.add, args.delete, args.edit]) is False:
-                print(' ')
-                Devices()._listDevices(dtype=2)
+                if args.plain == False:
+                    print(' ')
+                Devices()._listDevices(dtype=2, **listing)
             elif args.add and any([args.list, args.delete, args.edit]) is False:
                 print(' ')
                 Devices()._addDevices(dtype=2)
@@ -1354,8 +3664,9 @@ def main():
                     'please speciefy the operation --switches [OPTIONS] : (example : --list or --add or --edit or --delete)')
         elif args.others and any([args.routers, args.switches, args.ssh, args.use_keys, args.telnet, args.connect_to]) is False:
             if args.list and any([args.add, args.delete, args.edit]) is False:
-                print(' ')
-                Devices()._listDevices(dtype=3)
+                if args.plain == False:
+                    print(' ')
+                Devices()._listDevices(dtype=3, **listing)
             elif args.add and any([args.list, args.delete, args.edit]) is False:
                 print(' ')
                 Devices()._addDevices(dtype=3)
@@ -1372,15 +3683,16 @@ def main():
         if args.config_file and any([args.routers, args.switches, args.list, args.add, args.delete, args.edit]) is False:
             if args.ssh and any([args.telnet, args.use_keys]) is False:
                 print(' ')
-                Devices().connect(args=args.connect_to, method="ssh",
-                                  ssh_keys=False, file=args.config_file)
+                Devices().connect(args=args.connect_to, method="ssh", ssh_keys=False, file=args.config_file,
+                                  template=args.template, vars_file=args.vars_file, shell=args.shell, **run)
             elif args.ssh and args.use_keys and any([args.telnet]) is False:
                 print(' ')
-                Devices().connect(args=args.connect_to, method="ssh",
-                                  ssh_keys=args.use_keys, file=args.config_file)
+                Devices().connect(args=args.connect_to, method="ssh", ssh_keys=args.use_keys, file=args.config_file,
+                                  template=args.template, vars_file=args.vars_file, shell=args.shell, **run)
             elif args.telnet and any([args.ssh, args.use_keys]) is False:
                 print(' ')
-                Devices().connect(args=args.connect_to, method="telnet", file=args.config_file)
+                Devices().connect(args=args.connect_to, method="telnet", file=args.config_file,
+                                  template=args.template, vars_file=args.vars_file, window=args.window, **run)
             else:
                 msg.failure(
                     'please speciefy the connection method: (example : --ssh or --telnet or --ssh --ssh-keys) !! see the help')
@@ -1388,15 +3700,15 @@ def main():
             if args.ssh and any([args.telnet, args.use_keys]) is False:
                 print(' ')
                 Devices().single_connect(args=args.connect_to,
-                                         method="ssh", ssh_keys=False, cmd=args.config_cmd)
+                                         method="ssh", ssh_keys=False, cmd=args.config_cmd, shell=args.shell, **run)
             elif args.ssh and args.use_keys and any([args.telnet]) is False:
                 print(' ')
                 Devices().single_connect(args=args.connect_to,
-                                         method="ssh", ssh_keys=args.use_keys, cmd=args.config_cmd)
+                                         method="ssh", ssh_keys=args.use_keys, cmd=args.config_cmd, shell=args.shell, **run)
             elif args.telnet and any([args.ssh, args.use_keys]) is False:
                 print(' ')
                 Devices().single_connect(args=args.connect_to,
-                                         method="telnet", ssh_keys=False, cmd=args.config_cmd)
+                                         method="telnet", ssh_keys=False, cmd=args.config_cmd, window=args.window, **run)
             else:
                 msg.failure(
                     'please speciefy the connection method: (example : --ssh or --telnet or --ssh --ssh-keys) !! see the help')
@@ -1413,11 +3725,16 @@ BANNER = f"""
         {msg.RED}{msg.BLINK}01110100{msg.RESET}{msg.RED} 01101001 01101111 01101110{msg.RESET}            {msg.UNDERLINE}Created{msg.RESET} {msg.UNDERLINE}by{msg.RESET} : {msg.BOLD}{msg.RED}Yasser Janah.{msg.RESET}
         """
 if __name__ == '__main__':
+    sys.stdout = WatchedStdout(sys.stdout)
     try:
-        print(BANNER)
+        if '--plain' not in sys.argv:
+            print(BANNER)
         main()
     except KeyboardInterrupt:
         exit(msg.failure("CTRL+C detected"))
+    except StdoutClosed:
+        # output piped to `head` & co : stop quietly (a broken socket is still an error)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
     except Exception as err:
         raise (err)
         exit(msg.failure(str(err)))
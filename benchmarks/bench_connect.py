@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+end-to-end throughput benchmark of --connect-to against fake IOS devices.
+
+benchmarks/fake_ios.py is started in its own process, a throw-away
+devices.db is filled with N routers pointing at it, then the real CLI
+pushes the same config to all of them. per-device latency comes from the
+JSONL run log, peak RSS from the rusage of the CLI process.
+
+    python3 benchmarks/bench_connect.py --sizes 10 100 1000 --method ssh --shell --latency 0.005
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'CiscoNetworkAutomation.py')
+SIMULATOR = os.path.join(ROOT, 'benchmarks', 'fake_ios.py')
+
+CONFIG = [
+    'interface Loopback100',
+    ' description bench',
+    ' ip address 10.100.0.1 255.255.255.255',
+    'ip domain-name bench.local',
+]
+
+
+def simulator(args) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, SIMULATOR, '--ssh-port', str(args.ssh_port),
+                             '--telnet-port', str(args.telnet_port), '--latency', str(args.latency),
+                             '--output-size', str(args.output_size), '--fail-rate', str(args.fail_rate),
+                             '--auth-fail-rate', str(args.auth_fail_rate)],
+                            stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()
+    return proc
+
+
+def seed(workdir: str, size: int, args):
+    """ `size` routers, all on the simulator ports """
+    code = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "import CiscoNetworkAutomation as cna\n"
+        "d = cna.Devices()\n"
+        "row = dict(category='routers', device_type='cisco_ios', host='127.0.0.1', priv_pass='class',\n"
+        "           telnet='True', telnet_username='cisco', telnet_password=d.encrypt('cisco'), telnet_port=%r,\n"
+        "           ssh='True', ssh_use_keys='False', ssh_keys='-', ssh_username='cisco',\n"
+        "           ssh_password=d.encrypt('cisco'), ssh_port=%r)\n"
+        "with cna.db.atomic():\n"
+        "    for i in range(0, %d, 500):\n"
+        "        cna.Device.insert_many([dict(row, hostname='R%%d' %% n) for n in range(i, min(i + 500, %d))]).execute()\n"
+        % (ROOT, str(args.telnet_port), str(args.ssh_port), size, size)
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+
+
+def run(workdir: str, size: int, args) -> dict:
+    with open(os.path.join(workdir, 'bench.txt'), 'w') as f:
+        f.write('\n'.join(CONFIG) + '\n')
+    cmd = [sys.executable, SCRIPT, '--connect-to', 'R=' + ','.join(str(i) for i in range(1, size + 1)),
+           '--config-file', 'bench.txt', '--' + args.method, '--max-inflight', str(args.max_inflight),
+           '--timeout', str(args.timeout)]
+    if args.shell:
+        cmd.append('--shell')
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=workdir, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    _, _, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+
+    records = []
+    for path in glob.glob(os.path.join(workdir, 'reports', 'run_*.jsonl')):
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f)
+        os.remove(path)
+    latencies = sorted(r['duration'] for r in records)
+    return {'devices': size, 'ok': len([r for r in records if r['status']]), 'wall': wall,
+            'hosts_per_sec': size / wall, 'p50': percentile(latencies, 50), 'p99': percentile(latencies, 99),
+            'peak_rss_mb': usage.ru_maxrss / 1024}
+
+
+def percentile(values: list, pct: int) -> float:
+    if values == []:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="connect throughput benchmark of CiscoNetworkAutomation.py")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--method', choices=['ssh', 'telnet'], default='ssh')
+    parser.add_argument('--shell', action='store_true', help="push through an interactive SSH shell")
+    parser.add_argument('--max-inflight', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--ssh-port', type=int, default=2222)
+    parser.add_argument('--telnet-port', type=int, default=2323)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--output-size', type=int, default=1024)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--auth-fail-rate', type=float, default=0.0)
+    parser.add_argument('--json', action='store_true', help="one JSON object per size instead of a table")
+    args = parser.parse_args()
+
+    sim = simulator(args)
+    try:
+        if not args.json:
+            print(f"{'devices':>8} {'ok':>6} {'wall s':>8} {'hosts/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8}")
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory() as workdir:
+                seed(workdir, size, args)
+                row = run(workdir, size, args)
+            if args.json:
+                print(json.dumps(row), flush=True)
+            else:
+                print(f"{row['devices']:>8} {row['ok']:>6} {row['wall']:>8.2f} {row['hosts_per_sec']:>9.1f} "
+                      f"{row['p50'] * 1000:>8.1f} {row['p99'] * 1000:>8.1f} {row['peak_rss_mb']:>8.1f}", flush=True)
+    finally:
+        sim.terminate()
+        sim.wait()
+
+
+if __name__ == '__main__':
+    main()
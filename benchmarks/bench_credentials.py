@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+micro-benchmark of credential encrypt/decrypt : the historical per-char
+loop against the bulk column API, on the same random passwords.
+
+    python3 benchmarks/bench_credentials.py --count 100000
+"""
+
+import argparse
+import base64
+import os
+import random
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CiscoNetworkAutomation as cna  # noqa: E402
+
+
+def perCharEncrypt(key: str, clear: str) -> str:
+    enc = []
+    for i in range(len(clear)):
+        enc.append(chr((ord(clear[i]) + ord(key[i % len(key)])) % 256))
+    return base64.urlsafe_b64encode("".join(enc).encode()).decode()
+
+
+def perCharDecrypt(key: str, enc: str) -> str:
+    dec = []
+    enc = base64.urlsafe_b64decode(enc).decode()
+    for i in range(len(enc)):
+        dec.append(chr((256 + ord(enc[i]) - ord(key[i % len(key)])) % 256))
+    return "".join(dec)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    out = func(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="credential encrypt/decrypt micro-benchmark")
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--min-length', type=int, default=8)
+    parser.add_argument('--max-length', type=int, default=24)
+    args = parser.parse_args()
+
+    random.seed(0)
+    alphabet = string.ascii_letters + string.digits + string.punctuation
+    clear = [''.join(random.choice(alphabet) for _ in range(random.randint(args.min_length, args.max_length)))
+             for _ in range(args.count)]
+    devices = cna.Devices.__new__(cna.Devices)
+    devices._key = '$KEY$CNAG00DKeyForEncryption&Decryption'
+    key = devices._key
+
+    old_enc, t1 = timed(lambda: [perCharEncrypt(key, c) for c in clear])
+    new_enc, t2 = timed(devices.encryptMany, clear)
+    old_dec, t3 = timed(lambda: [perCharDecrypt(key, e) for e in old_enc])
+    new_dec, t4 = timed(devices.decryptMany, old_enc)
+    assert new_enc == old_enc and new_dec == old_dec == clear, "bulk API is not byte compatible"
+
+    print(f"{args.count} credentials")
+    print(f"{'':<10} {'per-char s':>11} {'bulk s':>8} {'speedup':>8}")
+    print(f"{'encrypt':<10} {t1:>11.3f} {t2:>8.3f} {t1 / t2:>7.1f}x")
+    print(f"{'decrypt':<10} {t3:>11.3f} {t4:>8.3f} {t3 / t4:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+micro-benchmark of --parse : a TextFSM template compiled for every output
+against the OutputParser cache, on the same `show ip interface brief`
+outputs (one per device, `--interfaces` lines each).
+
+    python3 benchmarks/bench_parse.py --devices 5000 --interfaces 48
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CiscoNetworkAutomation as cna  # noqa: E402
+import textfsm  # noqa: E402
+
+TEMPLATE = os.path.join(cna.TEMPLATES_DIR, 'cisco_ios_show_ip_interface_brief.textfsm')
+
+
+def output(interfaces: int) -> str:
+    lines = ['Interface              IP-Address      OK? Method Status                Protocol']
+    for n in range(interfaces):
+        lines.append(f'GigabitEthernet0/{n:<10} 10.0.{n % 256}.1       YES NVRAM  up                    up      ')
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def perOutput(outputs: list) -> list:
+    parsed = []
+    for text in outputs:
+        with open(TEMPLATE, mode='r') as fd:
+            fsm = textfsm.TextFSM(fd)
+        parsed.append([dict(zip([f.lower() for f in fsm.header], row)) for row in fsm.ParseText(text)])
+    return parsed
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    out = func(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TextFSM parsing micro-benchmark")
+    parser.add_argument('--devices', type=int, default=5000)
+    parser.add_argument('--interfaces', type=int, default=48)
+    args = parser.parse_args()
+
+    outputs = [output(args.interfaces) for _ in range(args.devices)]
+    old, t1 = timed(perOutput, outputs)
+    cached = cna.OutputParser()
+    new, t2 = timed(lambda: [cached.parse('sh ip int br', text)[1] for text in outputs])
+    assert old == new, "cached parser does not return the same records"
+
+    print(f"{args.devices} outputs of {args.interfaces} interface(s)")
+    print(f"{'compile each':<14} {t1:>8.3f} s")
+    print(f"{'cached':<14} {t2:>8.3f} s  {t1 / t2:>5.1f}x  ({t2 / args.devices * 1e6:.0f} us per device)")
+
+
+if __name__ == '__main__':
+    main()
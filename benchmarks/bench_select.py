@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+--connect-to selector resolution over a synthetic inventory : every
+selector is compiled to its single query, timed (best of --repeat) and
+shown with its SQLite query plan.
+
+    python3 benchmarks/bench_select.py --devices 50000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CiscoNetworkAutomation as cna  # noqa: E402
+
+SELECTORS = [
+    'R=1-500',
+    'R=1,5,9-S=100-120',
+    'name=core-1*',
+    'host=10.7.0.0/16',
+    'tag=site-7',
+    'tag=site-7&name=edge-*',
+    'tag=site-1*;host=10.3.2.0/24',
+    'all&!tag=lab',
+]
+
+
+def seed(count: int):
+    rows, tags = [], []
+    for n in range(1, count + 1):
+        host = f'10.{n % 64}.{(n // 64) % 256}.{n % 250 + 1}'
+        rows.append({'id': n, 'category': cna.CATEGORIES[n % 3 + 1], 'hostname': f"{'core' if n % 10 == 0 else 'edge'}-{n}",
+                     'device_type': 'cisco_ios', 'host': host, 'ipv4': cna.ipv4Int(host), 'priv_pass': '-',
+                     'telnet': 'False', 'telnet_username': '-', 'telnet_password': '-', 'telnet_port': '23',
+                     'ssh': 'True', 'ssh_use_keys': 'False', 'ssh_keys': '-', 'ssh_username': 'cisco',
+                     'ssh_password': 'Y2lzY28=', 'ssh_port': '22'})
+        tags.append({'device': n, 'name': f'site-{n % 100}'})
+        if n % 7 == 0:
+            tags.append({'device': n, 'name': 'lab'})
+    with cna.db.atomic():
+        for i in range(0, len(rows), cna.INSERT_ROWS):
+            cna.Device.insert_many(rows[i:i + cna.INSERT_ROWS]).execute()
+        for i in range(0, len(tags), 400):
+            cna.Tag.insert_many(tags[i:i + 400]).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="selector resolution benchmark")
+    parser.add_argument('--devices', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--plan', action='store_true', help="print the query plan of every selector")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        cna.initDB()
+        seed(args.devices)
+        print(f"{'selector':<32} {'devices':>8} {'ids ms':>8} {'rows ms':>8}")
+        for selector in SELECTORS:
+            ids_ms, rows_ms = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                ids = cna.db.execute_sql(*cna.Device.select(cna.Device.id).where(cna.parseSelector(selector)).sql()).fetchall()
+                ids_ms.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                rows = cna.Devices.getInstances(None, selector)
+                rows_ms.append((time.perf_counter() - start) * 1000)
+            assert len(ids) == len(rows)
+            print(f"{selector:<32} {len(rows):>8} {min(ids_ms):>8.1f} {min(rows_ms):>8.1f}")
+            if args.plan:
+                sql, params = cna.Device.select().where(cna.parseSelector(selector)).sql()
+                for row in cna.db.execute_sql('EXPLAIN QUERY PLAN ' + sql, params):
+                    print(f"{'':<4}{row[-1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+cold-start benchmark of the CLI entry points (--list, --add, --connect-to).
+
+every command runs in a fresh interpreter inside a throw-away working
+directory, so the numbers include interpreter start, imports and the
+devices.db bootstrap, exactly what cron jobs & wrappers pay per call.
+
+    python3 benchmarks/bench_startup.py --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'CiscoNetworkAutomation.py')
+
+SCENARIOS = {
+    'list': ['--devices', '--list'],
+    # stdin is closed, the first prompt fails right away : measures everything up to the prompt
+    'add': ['--devices', '--add'],
+    # one device on a closed local port : resolution + SSH stack import + refused connect
+    'connect-to': ['--connect-to', 'R=1', '--config-cmd', 'sh ver', '--ssh', '--timeout', '1'],
+}
+
+
+def seed(workdir: str):
+    """ one router on 127.0.0.1:1 so --connect-to has something to resolve """
+    code = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "import CiscoNetworkAutomation as cna\n"
+        "d = cna.Devices()\n"
+        "cna.Device.create(category='routers', hostname='bench', device_type='cisco_ios', host='127.0.0.1',\n"
+        "                  priv_pass='-', telnet='False', telnet_username='-', telnet_password='-', telnet_port='23',\n"
+        "                  ssh='True', ssh_use_keys='False', ssh_keys='-', ssh_username='cisco',\n"
+        "                  ssh_password=d.encrypt('cisco'), ssh_port='1')\n" % ROOT
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+
+
+def measure(args: list, workdir: str, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT] + args, cwd=workdir, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def importtime(args: list, workdir: str, top: int) -> list:
+    """ heaviest cumulative imports of one run (python -X importtime) """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', SCRIPT] + args, cwd=workdir,
+                          stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          text=True, timeout=60)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cold-start benchmark of CiscoNetworkAutomation.py")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--only', choices=sorted(SCENARIOS), action='append')
+    parser.add_argument('--imports', type=int, default=0, metavar='N', help="also show the N heaviest imports")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed(workdir)
+        print(f"{'command':<12} {'min ms':>8} {'median ms':>10} {'max ms':>8}")
+        for name in args.only or SCENARIOS:
+            samples = measure(SCENARIOS[name], workdir, args.repeat)
+            print(f"{name:<12} {min(samples):>8.1f} {statistics.median(samples):>10.1f} {max(samples):>8.1f}")
+            for cumulative, module in importtime(SCENARIOS[name], workdir, args.imports):
+                print(f"{'':<12} {cumulative / 1000:>8.1f} ms  {module}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Fake Cisco IOS devices for local benchmarks.
+
+One SSH listener (paramiko server) and one Telnet listener emulate the
+login / enable / conf t prompts driven by TelnetSession and SSHSession,
+every accepted connection being a new device (R1, R2, ...) with its own
+running-config.
+
+    python3 benchmarks/fake_ios.py --ssh-port 2222 --telnet-port 2323 --latency 0.005
+
+credentials : cisco / cisco , enable password : class
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import socket
+import threading
+import time
+
+import paramiko
+
+USERNAME = 'cisco'
+PASSWORD = 'cisco'
+ENABLE = 'class'
+
+BASE_CONFIG = [
+    ['version 15.2', []],
+    ['service timestamps debug datetime msec', []],
+    ['hostname {hostname}', []],
+    ['interface GigabitEthernet0/0', [' ip address 10.0.0.1 255.255.255.0', ' duplex auto']],
+    ['interface GigabitEthernet0/1', [' no ip address', ' shutdown']],
+    ['line vty 0 4', [' login local', ' transport input ssh telnet']],
+]
+
+SECTIONS = ('interface', 'router', 'line', 'ip access-list', 'class-map', 'policy-map', 'vlan', 'crypto')
+SUBMODES = {'interface': 'if', 'router': 'router', 'line': 'line', 'ip': 'ext-nacl', 'class-map': 'cmap',
+            'policy-map': 'pmap', 'vlan': 'vlan', 'crypto': 'crypto'}
+INVALID = "% Invalid input detected at '^' marker.\r\n\r\n"
+
+
+class Options(object):
+    def __init__(self, latency=0.0, output_size=1024, fail_rate=0.0, auth_fail_rate=0.0, hang_rate=0.0,
+                 login_level='>'):
+        self.latency = latency
+        self.output_size = output_size
+        self.fail_rate = fail_rate
+        self.auth_fail_rate = auth_fail_rate
+        self.hang_rate = hang_rate
+        self.login_level = login_level
+
+    def delay(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+
+class FakeIOS(object):
+    """ line discipline of one emulated device, independent of the transport """
+
+    def __init__(self, hostname: str, opts: Options):
+        self.hostname = hostname
+        self.opts = opts
+        self.mode = 'exec' if opts.login_level == '#' else 'user'
+        self.section = None
+        self.awaiting_enable = False
+        self.running = [[line.format(hostname=hostname), list(children)] for line, children in BASE_CONFIG]
+
+    def prompt(self) -> str:
+        if self.awaiting_enable:
+            return 'Password: '
+        if self.mode == 'user':
+            return self.hostname + '>'
+        if self.mode == 'exec':
+            return self.hostname + '#'
+        if self.section is not None:
+            return self.hostname + '(config-' + SUBMODES.get(self.section[0].split()[0], 'sub') + ')#'
+        return self.hostname + '(config)#'
+
+    def feed(self, line: str) -> str:
+        """ process one input line, returns everything the device prints after the echo """
+        word = line.strip()
+        if self.awaiting_enable:
+            self.awaiting_enable = False
+            if word == ENABLE:
+                self.mode = 'exec'
+                return '\r\n' + self.prompt()
+            return '\r\n% Access denied\r\n\r\n' + self.prompt()
+        if word == '':
+            return '\r\n' + self.prompt()
+        if self.mode == 'user':
+            if word in ('en', 'enable'):
+                self.awaiting_enable = True
+                return '\r\n' + self.prompt()
+            return '\r\n' + self.execute(word) + self.prompt()
+        if self.mode == 'exec':
+            if word in ('conf t', 'config t', 'configure terminal'):
+                self.mode = 'config'
+                return '\r\nEnter configuration commands, one per line.  End with CNTL/Z.\r\n' + self.prompt()
+            return '\r\n' + self.execute(word) + self.prompt()
+        return '\r\n' + self.configure(word) + self.prompt()
+
+    def execute(self, word: str) -> str:
+        if word.startswith('term'):
+            return ''
+        if word.split()[0] in ('sh', 'sho', 'show'):
+            if 'run' in word:
+                return self.showRun()
+            if 'int' in word and 'br' in word:
+                return ('Interface              IP-Address      OK? Method Status                Protocol\r\n'
+                        'GigabitEthernet0/0     10.0.0.1        YES NVRAM  up                    up      \r\n'
+                        'GigabitEthernet0/1     unassigned      YES NVRAM  administratively down down    \r\n')
+            return ('x' * 78 + '\r\n') * max(1, self.opts.output_size // 80)
+        return INVALID
+
+    def showRun(self) -> str:
+        lines = ['Building configuration...', '', 'Current configuration : 1024 bytes', '!',
+                 time.strftime('! Last configuration change at %H:%M:%S UTC %a %b %d %Y'), '!']
+        for line, children in self.running:
+            lines.append(line)
+            lines.extend(children)
+            lines.append('!')
+        lines.append('end')
+        return '\r\n'.join(lines) + '\r\n'
+
+    def configure(self, word: str) -> str:
+        if word == 'end':
+            self.mode, self.section = 'exec', None
+            return ''
+        if word == 'exit':
+            if self.section is not None:
+                self.section = None
+            else:
+                self.mode = 'exec'
+            return ''
+        if word.startswith('do '):
+            return self.execute(word[3:])
+        if word.startswith('bad'):
+            return INVALID
+        if word.startswith('!'):
+            return ''
+        if word.startswith(SECTIONS):
+            for entry in self.running:
+                if entry[0] == word:
+                    break
+            else:
+                entry = [word, []]
+                self.running.append(entry)
+            self.section = entry
+            return ''
+        target = self.section[1] if self.section is not None else None
+        if target is None:
+            self._apply([e[0] for e in self.running], word,
+                        lambda: self.running.append([word, []]),
+                        lambda i: self.running.pop(i))
+        else:
+            self._apply([c.strip() for c in target], word,
+                        lambda: target.append(' ' + word),
+                        lambda i: target.pop(i))
+        return ''
+
+    @staticmethod
+    def _apply(existing: list, word: str, add, remove):
+        # `no X` removes a configured X, or else turns a default off and is shown as is ;
+        # X back on over a `no X` is the default again, shown as nothing
+        if word.startswith('no ') and word[3:] in existing:
+            remove(existing.index(word[3:]))
+        elif 'no ' + word in existing:
+            remove(existing.index('no ' + word))
+        elif word not in existing:
+            add()
+
+
+def _lines(pending: bytes):
+    """ split complete input lines, \r and NUL padding from telnet clients are dropped """
+    *lines, rest = pending.split(b'\n')
+    return [l.replace(b'\r', b'').replace(b'\0', b'').decode('utf-8', 'replace') for l in lines], rest
+
+
+_counter = itertools.count(1)
+
+
+class _SSHServer(paramiko.ServerInterface):
+    def __init__(self, opts: Options):
+        self.opts = opts
+        self.exec_cmd = None
+        self.ready = threading.Event()
+
+    def check_auth_password(self, username, password):
+        if random.random() < self.opts.auth_fail_rate:
+            return paramiko.AUTH_FAILED
+        if username == USERNAME and password == PASSWORD:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL if username == USERNAME else paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password,publickey'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.ready.set()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.exec_cmd = command.decode('utf-8', 'replace')
+        self.ready.set()
+        return True
+
+
+def _serveSSH(client: socket.socket, host_key, opts: Options):
+    transport = paramiko.Transport(client)
+    transport.add_server_key(host_key)
+    server = _SSHServer(opts)
+    device = FakeIOS('R%d' % next(_counter), opts)
+    try:
+        transport.start_server(server=server)
+        while transport.is_active():
+            chan = transport.accept(60)
+            if chan is None:
+                return
+            server.ready.wait(10)
+            server.ready.clear()
+            opts.delay()
+            if server.exec_cmd is not None:
+                chan.sendall(device.execute(server.exec_cmd.strip()).replace('\r\n', '\n'))
+                chan.send_exit_status(0)
+                chan.close()
+                server.exec_cmd = None
+                continue
+            chan.sendall('\r\n' + device.prompt())
+            pending = b''
+            while True:
+                data = chan.recv(65535)
+                if not data:
+                    return
+                lines, pending = _lines(pending + data)
+                for line in lines:
+                    opts.delay()
+                    echo = '' if device.awaiting_enable else line
+                    chan.sendall(echo + device.feed(line))
+    except Exception:
+        pass
+    finally:
+        transport.close()
+
+
+def _accepted(opts: Options) -> str:
+    roll = random.random()
+    if roll < opts.fail_rate:
+        return 'fail'
+    if roll < opts.fail_rate + opts.hang_rate:
+        return 'hang'
+    return 'ok'
+
+
+def serveSSH(bind: str, port: int, opts: Options, ready=None):
+    host_key = paramiko.RSAKey.generate(2048)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((bind, port))
+    listener.listen(4096)
+    hanging = []
+    if ready is not None:
+        ready.set()
+    while True:
+        client, _ = listener.accept()
+        fate = _accepted(opts)
+        if fate == 'fail':
+            client.close()
+        elif fate == 'hang':
+            hanging.append(client)
+        else:
+            threading.Thread(target=_serveSSH, args=(client, host_key, opts), daemon=True).start()
+
+
+async def _serveTelnet(reader, writer, opts: Options):
+    fate = _accepted(opts)
+    if fate == 'fail':
+        writer.close()
+        return
+    if fate == 'hang':
+        await asyncio.sleep(3600)
+        return
+    device = FakeIOS('R%d' % next(_counter), opts)
+    pending, queue = b'', []
+
+    async def readline():
+        nonlocal pending
+        while queue == []:
+            data = await reader.read(65535)
+            if not data:
+                raise EOFError
+            lines, pending = _lines(pending + data)
+            queue.extend(lines)
+        return queue.pop(0)
+
+    async def send(text: str):
+        if opts.latency > 0:
+            await asyncio.sleep(opts.latency)
+        writer.write(text.encode())
+        await writer.drain()
+
+    try:
+        await send('\r\n\r\nUser Access Verification\r\n\r\nUsername: ')
+        while True:
+            user = await readline()
+            await send(user + '\r\nPassword: ')
+            password = await readline()
+            if user.strip() == USERNAME and password.strip() == PASSWORD and random.random() >= opts.auth_fail_rate:
+                break
+            await send('\r\n% Login invalid\r\n\r\nUsername: ')
+        await send('\r\n' + device.prompt())
+        while True:
+            line = await readline()
+            echo = '' if device.awaiting_enable else line
+            await send(echo + device.feed(line))
+    except (EOFError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def serveTelnet(bind: str, port: int, opts: Options, ready=None):
+    async def _main():
+        server = await asyncio.start_server(lambda r, w: _serveTelnet(r, w, opts), bind, port,
+                                            backlog=4096, reuse_address=True)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+    asyncio.run(_main())
+
+
+def start(bind='127.0.0.1', ssh_port=2222, telnet_port=2323, opts=None):
+    """ start both listeners on daemon threads, returns once they accept connections """
+    opts = opts if opts is not None else Options()
+    for target, port in ((serveSSH, ssh_port), (serveTelnet, telnet_port)):
+        if port:
+            ready = threading.Event()
+            threading.Thread(target=target, args=(bind, port, opts, ready), daemon=True).start()
+            ready.wait(30)
+    return opts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fake Cisco IOS devices (SSH & Telnet) for benchmarks")
+    parser.add_argument('--bind', default='127.0.0.1')
+    parser.add_argument('--ssh-port', type=int, default=2222)
+    parser.add_argument('--telnet-port', type=int, default=2323)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added before every response")
+    parser.add_argument('--output-size', type=int, default=1024, help="bytes returned by show commands")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="ratio of connections closed at accept")
+    parser.add_argument('--auth-fail-rate', type=float, default=0.0, help="ratio of logins rejected")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="ratio of connections never answered")
+    parser.add_argument('--login-level', choices=['>', '#'], default='>', help="prompt right after login")
+    args = parser.parse_args()
+    opts = Options(args.latency, args.output_size, args.fail_rate, args.auth_fail_rate, args.hang_rate,
+                   args.login_level)
+    start(args.bind, args.ssh_port, args.telnet_port, opts)
+    print(f"[+] fake IOS listening on {args.bind} ssh:{args.ssh_port} telnet:{args.telnet_port}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# CiscoNetworkAutomation.py is a script at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CiscoNetworkAutomation as cna  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """ an empty current directory, devices/devices.db is created there on first use """
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    if cna.db.database is not None:
+        cna.db.close()
+        cna.db.init(None)
+
+
+@pytest.fixture
+def devices(workdir):
+    return cna.Devices()
+
+
+@pytest.fixture
+def add(devices):
+    """ add(raw, ..) : devices imported the way --import does, SSH cisco / cisco unless given """
+    def _add(*raws, category='routers'):
+        defaults = {'ssh_username': 'cisco', 'ssh_password': 'cisco', 'priv_pass': 'class'}
+        return devices._insertDevices([cna.deviceRow({**defaults, **raw}, category) for raw in raws])
+    return _add
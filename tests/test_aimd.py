@@ -0,0 +1,95 @@
+import time
+
+import CiscoNetworkAutomation as cna
+
+
+def result(reason=None, connect=0.01):
+    r = cna.SessionResult('10.0.0.1', 'ssh', status=reason is None, error=reason and f'{reason} error')
+    r.reason = reason
+    if reason is None:
+        r.timings['connect'] = connect
+    return r
+
+
+def rounds(limit: cna.AIMDLimit, n: int, **kwargs):
+    """ n rounds of `limit` healthy sessions """
+    for _ in range(n):
+        for _ in range(int(limit.limit)):
+            limit._update(result(**kwargs), time.monotonic())
+
+
+def test_slow_start_doubles_per_round():
+    limit = cna.AIMDLimit(1000, start=2)
+    seen = [int(limit.limit)]
+    for _ in range(4):
+        rounds(limit, 1)
+        seen.append(int(limit.limit))
+    assert seen == [2, 4, 8, 16, 32]
+
+
+def test_capped_by_the_ceiling():
+    limit = cna.AIMDLimit(20, start=8)
+    rounds(limit, 10)
+    assert limit.limit == 20 and limit.peak == 20
+
+
+def test_halved_on_timeout_and_auth():
+    limit = cna.AIMDLimit(1000, start=32)
+    limit._update(result('timeout'), time.monotonic())
+    assert int(limit.limit) == 16
+    limit._update(result('auth'), time.monotonic())
+    assert int(limit.limit) == 8
+    # a plain connect error says nothing about the load
+    limit._update(result('error'), time.monotonic())
+    assert int(limit.limit) == 8
+
+
+def test_additive_increase_after_a_cut():
+    limit = cna.AIMDLimit(1000, start=32)
+    limit._update(result('timeout'), time.monotonic())
+    rounds(limit, 3)
+    # about one more per round, no longer doubling
+    assert 18 <= limit.limit <= 16 + 3
+
+
+def test_sessions_opened_before_a_cut_do_not_cut_again():
+    limit = cna.AIMDLimit(1000, start=32)
+    opened = [time.monotonic() for _ in range(5)]
+    time.sleep(0.001)
+    limit._update(result('timeout'), time.monotonic())
+    for at in opened:
+        limit._update(result('timeout'), at)
+    assert int(limit.limit) == 16
+    limit._update(result('timeout'), time.monotonic())
+    assert int(limit.limit) == 8
+
+
+def test_slow_connects_stop_the_growth():
+    limit = cna.AIMDLimit(1000, start=8)
+    rounds(limit, 1, connect=0.1)
+    assert int(limit.limit) == 16
+    rounds(limit, 3, connect=0.1 * cna.AIMDLimit.LATENCY_FACTOR * 2)
+    assert int(limit.limit) == 16
+    # below the floor every connect is fast enough
+    rounds(limit, 1, connect=cna.AIMDLimit.LATENCY_FLOOR / 2)
+    assert int(limit.limit) == 32
+
+
+def test_fan_out_never_exceeds_the_limit(monkeypatch):
+    inflight = {'now': 0, 'max': 0}
+    lock = cna.require('threading').Lock()
+
+    def worker(job, cmds):
+        with lock:
+            inflight['now'] += 1
+            inflight['max'] = max(inflight['max'], inflight['now'])
+        time.sleep(0.005)
+        with lock:
+            inflight['now'] -= 1
+        return result('timeout')
+
+    jobs = [[f'10.0.0.{i}', 'u', 'p', '22', '-'] for i in range(40)]
+    results = cna.runSessions(jobs, worker, 'show clock', 'ssh', max_inflight=32, adaptive=True)
+    assert len(results) == 40
+    # every round times out : the limit falls from its start of 8 to 1
+    assert inflight['max'] <= 8
@@ -0,0 +1,89 @@
+import pathlib
+
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+CONFIG = """Building configuration...
+
+Current configuration : 1200 bytes
+!
+! Last configuration change at 10:01:02 UTC Mon Oct 12 2026 by admin
+! NVRAM config last updated at 10:01:05 UTC Mon Oct 12 2026 by admin
+!
+version 15.2
+hostname {hostname}
+ntp clock-period 17179{n}
+!
+interface GigabitEthernet0/0
+ ip address 10.0.0.1 255.255.255.0\r
+!
+end
+"""
+
+
+@pytest.fixture
+def store(workdir):
+    return cna.BackupStore(str(workdir / 'backups'))
+
+
+def objects(store) -> list:
+    return sorted(p for p in pathlib.Path(store.directory).rglob('*') if p.is_file())
+
+
+def test_normalize_drops_volatile_lines():
+    text = cna.BackupStore.normalize(CONFIG.format(hostname='R1', n=1))
+    assert text.startswith('version 15.2\n') and text.endswith('end\n')
+    assert 'Last configuration change' not in text and 'ntp clock-period' not in text and '\r' not in text
+    assert text == cna.BackupStore.normalize(CONFIG.format(hostname='R1', n=2))
+
+
+def test_put_deduplicates(store):
+    first, size = store.put(CONFIG.format(hostname='R1', n=1))
+    again, _ = store.put(CONFIG.format(hostname='R1', n=9))
+    other, _ = store.put(CONFIG.format(hostname='R2', n=1))
+    assert first == again != other
+    assert store.written == 2 and len(objects(store)) == 2
+    assert store.path(first).endswith(f'{first[:2]}/{first}')
+    assert size == len(store.get(first).encode())
+    assert store.get(first) == cna.BackupStore.normalize(CONFIG.format(hostname='R1', n=1))
+
+
+def test_put_leaves_no_temporary_file(store):
+    store.put('hostname R1\n')
+    assert [p.name for p in objects(store) if p.name.endswith('.tmp')] == []
+
+
+def test_latest(devices, store):
+    rows = [{'id': 1, 'category': 'routers'}, {'id': 2, 'category': 'routers'}, {'id': 1, 'category': 'switches'}]
+    entry = {'host': '10.0.0.1', 'hostname': 'R', 'size': 1}
+    store.index([{**entry, 'device': 1, 'category': 'routers', 'digest': 'a'},
+                 {**entry, 'device': 1, 'category': 'switches', 'digest': 'b'},
+                 {**entry, 'device': 1, 'category': 'routers', 'digest': 'c'}])
+    assert store.latest(rows) == {('routers', 1): 'c', ('switches', 1): 'b'}
+    assert store.latest([]) == {}
+
+
+def test_backup_run(devices, add, workdir, monkeypatch):
+    add(*[{'hostname': f'R{n}', 'host': f'10.0.0.{n}'} for n in range(1, 4)])
+    night = {'n': 1, 'R3': 'R3'}
+
+    def worker(job, cmds):
+        hostname = 'R' + job[0].rsplit('.', 1)[1]
+        result = cna.SessionResult(job[0], 'ssh', status=True, output=CONFIG.format(hostname=night.get(hostname, 'R'), n=night['n']))
+        result.timings['run'] = 0.0
+        return result
+
+    monkeypatch.setattr(cna, 'sessionWorker', lambda *args, **kwargs: worker)
+    location = str(workdir / 'backups')
+    devices.backup('R=1-3', 'ssh', store=location, preflight_timeout=None)
+    store = cna.BackupStore(location)
+    # R1 & R2 have the same config : two objects for three devices
+    assert len(objects(store)) == 2 and cna.Backup.select().count() == 3
+    first = store.latest(devices.getCredsConf('R=1-3', 'ssh'))
+    night.update(n=2, R3='R3-new')
+    devices.backup('R=1-3', 'ssh', store=location, preflight_timeout=None)
+    last = store.latest(devices.getCredsConf('R=1-3', 'ssh'))
+    assert len(objects(store)) == 3 and cna.Backup.select().count() == 6
+    assert [k for k in last if last[k] != first[k]] == [('routers', 3)]
+    assert 'hostname R3-new' in store.get(last[('routers', 3)])
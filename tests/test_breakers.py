@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+
+def result(host='10.0.0.1', port='22', connected=False, reason='error', status=False):
+    r = cna.SessionResult(host, 'ssh', status=status, error=None if connected else f'{reason} error', port=port)
+    r.reason = None if connected else reason
+    if connected:
+        r.timings['run'] = 0.0
+    return r
+
+
+def breakers() -> dict:
+    return {b.host: (b.failures, b.opened_until > time.time()) for b in cna.Breaker.select()}
+
+
+# recordBreakers / openBreakers
+
+def test_opens_after_runs_in_a_row(devices):
+    for n in range(1, 4):
+        cna.recordBreakers([result(reason='timeout')], runs=3, cooldown=60)
+        assert breakers() == {'10.0.0.1:22': (n, n == 3)}
+    assert list(cna.openBreakers(['10.0.0.1:22', '10.0.0.2:22'])) == ['10.0.0.1:22']
+
+
+def test_connected_session_resets(devices):
+    cna.recordBreakers([result(), result()], runs=3)
+    cna.recordBreakers([result(connected=True, reason=None)], runs=3)
+    assert breakers() == {}
+
+
+def test_failed_commands_reset(devices):
+    cna.recordBreakers([result()], runs=3)
+    cna.recordBreakers([result(connected=True, status=False)], runs=3)
+    assert breakers() == {}
+
+
+def test_rejected_login_resets(devices):
+    # the host answered : a bad password is not a reason to stop reaching it
+    cna.recordBreakers([result(), result()], runs=3)
+    for _ in range(3):
+        cna.recordBreakers([result(reason='auth')], runs=3)
+    assert breakers() == {}
+
+
+def test_one_breaker_per_port(devices):
+    # a terminal server : every device is one port of the same IP
+    for _ in range(3):
+        cna.recordBreakers([result(port='2001'), result(port='2002', connected=True)], runs=3, cooldown=60)
+    assert breakers() == {'10.0.0.1:2001': (3, True)}
+    assert list(cna.openBreakers([cna.breakerKey('10.0.0.1', 2001), cna.breakerKey('10.0.0.1', 2002)])) == ['10.0.0.1:2001']
+
+
+def test_cool_down_ends(devices):
+    cna.recordBreakers([result()], runs=1, cooldown=0.05)
+    assert list(cna.openBreakers(['10.0.0.1:22'])) == ['10.0.0.1:22']
+    time.sleep(0.1)
+    assert cna.openBreakers(['10.0.0.1:22']) == {}
+
+
+# runs
+
+@pytest.fixture
+def network(monkeypatch):
+    """ pre-flight probes & sessions of every run, port 1 never answers """
+    seen = {'probed': [], 'sessions': []}
+
+    def preflight(targets, timeout=None, batch=None):
+        seen['probed'] += [f'{host}:{port}' for host, port in targets]
+        return [str(port) != '1' for _, port in targets]
+
+    def worker(job, cmds):
+        seen['sessions'].append(f'{job[0]}:{job[3]}')
+        r = cna.SessionResult(job[0], 'ssh', status=True, port=job[3])
+        r.timings['run'] = 0.0
+        return r
+
+    monkeypatch.setattr(cna, 'preflight', preflight)
+    monkeypatch.setattr(cna, 'sessionWorker', lambda *args, **kwargs: worker)
+    return seen
+
+
+def test_open_breaker_skipped_before_the_preflight(devices, add, network):
+    add({'hostname': 'R1', 'host': '10.0.0.1', 'ssh_port': '1'}, {'hostname': 'R2', 'host': '10.0.0.1', 'ssh_port': '22'})
+    for _ in range(2):
+        devices.single_connect('R=1-2', 'ssh', 'show clock', breaker_runs=2, breaker_cooldown=60)
+    assert breakers() == {'10.0.0.1:1': (2, True)}
+    network['probed'].clear()
+    devices.single_connect('R=1-2', 'ssh', 'show clock', breaker_runs=2, breaker_cooldown=60)
+    assert network['probed'] == ['10.0.0.1:22']
+    # the skip itself does not count as one more failed run
+    assert breakers() == {'10.0.0.1:1': (2, True)}
+    network['probed'].clear()
+    devices.single_connect('R=1-2', 'ssh', 'show clock', ignore_breaker=True, breaker_runs=2, breaker_cooldown=60)
+    assert network['probed'] == ['10.0.0.1:1', '10.0.0.1:22']
+    assert breakers() == {'10.0.0.1:1': (3, True)}
+
+
+# retries
+
+def fanOut(outcomes: list, retries: int) -> tuple:
+    calls = []
+
+    def worker(job, cmds):
+        calls.append(job[0])
+        reason = outcomes.pop(0)
+        r = result(host=job[0], connected=reason is None, reason=reason, status=reason is None)
+        return r
+
+    return cna.runSessions([['10.0.0.1', 'u', 'p', '22', '-']], worker, 'show clock', 'ssh', retries=retries), calls
+
+
+def test_connect_failures_are_retried(monkeypatch):
+    monkeypatch.setattr(cna, 'RETRY_BACKOFF', 0.001)
+    [r], calls = fanOut(['timeout', 'error', None], retries=3)
+    assert r.status == True and r.attempts == 3 and len(calls) == 3
+
+
+def test_retries_are_bounded(monkeypatch):
+    monkeypatch.setattr(cna, 'RETRY_BACKOFF', 0.001)
+    [r], calls = fanOut(['timeout'] * 5, retries=2)
+    assert r.status == False and r.attempts == 3 and len(calls) == 3
+
+
+@pytest.mark.parametrize('reason', ['auth', 'connected'])
+def test_no_retry_once_the_host_answered(monkeypatch, reason):
+    monkeypatch.setattr(cna, 'RETRY_BACKOFF', 0.001)
+    outcomes = ['auth'] if reason == 'auth' else [None]
+    [r], calls = fanOut(outcomes, retries=3)
+    assert r.attempts == 1 and len(calls) == 1
+
+
+def test_backoff_grows_and_is_capped():
+    assert 0.5 <= cna.backoff(0) <= 1.5 and 4 <= cna.backoff(3) <= 12
+    assert cna.backoff(30) <= cna.RETRY_BACKOFF_MAX * 1.5
@@ -0,0 +1,247 @@
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+
+def delta(running: str, desired: str) -> list:
+    return cna.configDelta(cna.parseConfig(running.split('\n')), cna.parseConfig(desired.split('\n')))
+
+
+RUNNING = """Building configuration...
+Current configuration : 1024 bytes
+!
+hostname R1
+no ip http server
+!
+interface GigabitEthernet1
+ description uplink
+ ip address 10.0.0.1 255.255.255.0
+!
+router bgp 65000
+ bgp log-neighbor-changes
+ address-family ipv4 vrf A
+  network 10.1.0.0
+ exit-address-family
+!
+end"""
+
+
+# configDelta
+
+def test_delta_nothing_missing():
+    assert delta(RUNNING, "hostname R1\ninterface GigabitEthernet1\n description uplink") == []
+
+
+def test_delta_whitespace_is_not_a_difference():
+    assert delta(RUNNING, "interface  GigabitEthernet1\n  description   uplink") == []
+
+
+def test_delta_section_sent_with_its_header():
+    assert delta(RUNNING, "interface GigabitEthernet1\n description core\n ip address 10.0.0.1 255.255.255.0") == \
+        ['interface GigabitEthernet1', ' description core']
+
+
+def test_delta_new_section_sent_whole():
+    assert delta(RUNNING, "interface Loopback0\n ip address 1.1.1.1 255.255.255.255") == \
+        ['interface Loopback0', ' ip address 1.1.1.1 255.255.255.255']
+
+
+def test_delta_no_unless_shown_in_running():
+    # defaults are not printed : `no ip domain-lookup` is missing though the lookup is not mentioned
+    assert delta(RUNNING, "no hostname R1\nno ip domain-lookup\nno ip http server") == \
+        ['no hostname R1', 'no ip domain-lookup']
+
+
+def test_delta_no_inside_a_section():
+    assert delta(RUNNING, "interface GigabitEthernet1\n no shutdown\n description uplink") == \
+        ['interface GigabitEthernet1', ' no shutdown']
+
+
+def test_delta_noise_ignored():
+    assert delta(RUNNING, "!\nhostname R1\n!\nend") == []
+
+
+def test_delta_exit_lines_never_missing_by_themselves():
+    desired = """interface GigabitEthernet1
+ description uplink
+ exit
+router bgp 65000
+ address-family ipv4 vrf A
+  network 10.1.0.0
+ exit-address-family"""
+    assert delta(RUNNING, desired) == []
+
+
+def test_delta_exit_sent_behind_the_section_it_closes():
+    desired = """router bgp 65000
+ address-family ipv4 vrf A
+  network 10.1.0.0
+ exit-address-family
+ address-family ipv4 vrf B
+  network 10.2.0.0
+ exit-address-family"""
+    assert delta(RUNNING, desired) == \
+        ['router bgp 65000', ' address-family ipv4 vrf B', '  network 10.2.0.0', ' exit-address-family']
+
+
+def test_delta_exit_closing_its_parent():
+    desired = "interface GigabitEthernet1\n description core\n exit"
+    assert delta(RUNNING, desired) == ['interface GigabitEthernet1', ' description core', ' exit']
+
+
+def test_delta_exit_not_sent_behind_a_leaf_of_the_parent():
+    desired = """router bgp 65000
+ bgp router-id 1.1.1.1
+ address-family ipv4 vrf A
+  network 10.1.0.0
+ exit-address-family"""
+    assert delta(RUNNING, desired) == ['router bgp 65000', ' bgp router-id 1.1.1.1']
+
+
+# parseSelector
+
+@pytest.fixture(scope='module')
+def inventory(tmp_path_factory):
+    path = tmp_path_factory.mktemp('db')
+    cna.db.init(str(path / 'devices.db'))
+    cna.db.create_tables([cna.Device, cna.Tag])
+    blank = {field: '' for field in cna.FIELDS}
+    rows = [('routers', 'R1', '10.0.0.1', ['site-paris']), ('routers', 'R2', '10.0.1.1', ['site-lyon']),
+            ('routers', 'R3', 'r3.example.net', []), ('switches', 'SW1', '10.0.0.20', ['site-paris', 'core']),
+            ('others', 'FW1', '192.168.1.1', [])]
+    for category, hostname, host, tags in rows:
+        device = cna.Device.create(**dict(blank, category=category, hostname=hostname, host=host, ipv4=cna.ipv4Int(host)))
+        for name in tags:
+            cna.Tag.create(device=device, name=name)
+    yield
+    cna.db.close()
+    cna.db.init(None)
+
+
+def select(text: str) -> list:
+    return sorted(d.hostname for d in cna.Device.select().where(cna.parseSelector(text)))
+
+
+@pytest.mark.parametrize('text, hostnames', [
+    ('all', ['FW1', 'R1', 'R2', 'R3', 'SW1']),
+    ('R=1,3', ['R1', 'R3']),
+    ('R=1-2', ['R1', 'R2']),
+    ('R=*', ['R1', 'R2', 'R3']),
+    ('R=1-S=4', ['R1', 'SW1']),
+    ('S=1', []),
+    ('name=R*', ['R1', 'R2', 'R3']),
+    ('host=10.0.0.0/24', ['R1', 'SW1']),
+    ('host=*.example.net', ['R3']),
+    ('tag=site-*', ['R1', 'R2', 'SW1']),
+    ('tag=site-paris & !tag=core', ['R1']),
+    ('tag=core ; name=FW1', ['FW1', 'SW1']),
+    ('all & !host=10.0.0.0/16', ['FW1', 'R3']),
+])
+def test_selector(inventory, text, hostnames):
+    assert select(text) == hostnames
+
+
+@pytest.mark.parametrize('text', ['R=', 'R=a-b', 'colour=red', 'name=', 'host=fe80::/64', 'R1'])
+def test_selector_errors(text):
+    with pytest.raises(ValueError):
+        cna.parseSelector(text)
+
+
+# HashRing
+
+KEYS = [str(n) for n in range(2000)]
+
+
+def test_ring_placement_is_pinned():
+    # md5 and not hash() : coordinator & workers of any version must agree on every placement
+    assert cna.HashRing.hash('R1') == 0xcda522d4353b166c
+    ring = cna.HashRing(['w1', 'w2', 'w3'])
+    assert [ring.node(k) for k in ['1', '2', '3', 'R1', 'R2', '10.0.0.1']] == ['w2', 'w1', 'w2', 'w3', 'w3', 'w3']
+
+
+def test_ring_ignores_node_order():
+    a, b = cna.HashRing(['w1', 'w2', 'w3']), cna.HashRing(['w3', 'w1', 'w2'])
+    assert [a.node(k) for k in KEYS] == [b.node(k) for k in KEYS]
+
+
+def test_ring_spreads_keys():
+    ring = cna.HashRing(['w1', 'w2', 'w3'])
+    counts = {node: 0 for node in ('w1', 'w2', 'w3')}
+    for key in KEYS:
+        counts[ring.node(key)] += 1
+    assert min(counts.values()) > len(KEYS) / 3 * 0.6
+
+
+def test_ring_lost_node_only_moves_its_keys():
+    before, after = cna.HashRing(['w1', 'w2', 'w3']), cna.HashRing(['w1', 'w3'])
+    for key in KEYS:
+        if before.node(key) != 'w2':
+            assert after.node(key) == before.node(key)
+
+
+def test_ring_added_node_only_takes_keys():
+    before, after = cna.HashRing(['w1', 'w2']), cna.HashRing(['w1', 'w2', 'w3'])
+    moved = [key for key in KEYS if after.node(key) != before.node(key)]
+    assert moved != [] and all(after.node(key) == 'w3' for key in moved)
+
+
+# Metrics.render
+
+def result(status=True, reason=None, timings=None, duration=0.2, method='ssh'):
+    res = cna.SessionResult('10.0.0.1', method, status=status)
+    res.reason, res.timings, res.duration = reason, timings or {}, duration
+    res.sent, res.received = 100, 2000
+    return res
+
+
+def test_metrics_empty():
+    text = cna.Metrics().render()
+    assert text.endswith('\n# EOF\n')
+    for name, kind, unit, _ in cna.Metrics.FAMILIES:
+        assert f'# TYPE {name} {kind}\n' in text
+        assert (f'# UNIT {name} {unit}\n' in text) == (unit is not None)
+    assert 'cna_sessions_inflight 0\n' in text
+    assert '_bucket' not in text
+
+
+def test_metrics_counters_and_gauges():
+    metrics = cna.Metrics()
+    for _ in range(3):
+        metrics.started('ssh')
+    metrics.finished(result())
+    metrics.finished(result(status=False, reason='timeout'))
+    metrics.skipped('ssh', 4)
+    metrics.run(1.5)
+    lines = metrics.render().split('\n')
+    assert 'cna_sessions_started_total{method="ssh"} 3' in lines
+    assert 'cna_sessions_succeeded_total{method="ssh"} 1' in lines
+    assert 'cna_sessions_failed_total{method="ssh",reason="timeout"} 1' in lines
+    assert 'cna_devices_skipped_total{method="ssh"} 4' in lines
+    assert 'cna_session_sent_bytes_total{method="ssh"} 200' in lines
+    assert 'cna_sessions_inflight 1' in lines
+    assert 'cna_sessions_inflight_max 3' in lines
+    assert 'cna_runs_total 1' in lines
+    assert 'cna_run_duration_seconds 1.5' in lines
+
+
+def test_metrics_histogram_is_cumulative():
+    metrics = cna.Metrics(buckets=(1.0, 0.1))
+    metrics.finished(result(timings={'connect': 0.05}, duration=0.5))
+    metrics.finished(result(timings={'connect': 2.0}, duration=0.1))
+    lines = metrics.render().split('\n')
+    name = 'cna_session_phase_seconds'
+    assert [line for line in lines if line.startswith(name + '_bucket{phase="connect"')] == [
+        name + '_bucket{phase="connect",le="0.1"} 1',
+        name + '_bucket{phase="connect",le="1.0"} 1',
+        name + '_bucket{phase="connect",le="+Inf"} 2',
+    ]
+    assert name + '_count{phase="connect"} 2' in lines
+    assert name + '_sum{phase="connect"} 2.05' in lines
+    # le is inclusive : 0.1 falls in the 0.1 bucket
+    assert name + '_bucket{phase="session",le="0.1"} 1' in lines
+
+
+def test_metrics_label_values_escaped():
+    metrics = cna.Metrics()
+    metrics.started('ssh "x"\\\n')
+    assert 'cna_sessions_started_total{method="ssh \\"x\\"\\\\\\n"} 1' in metrics.render()
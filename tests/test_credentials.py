@@ -0,0 +1,51 @@
+import base64
+
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+KEY = '$KEY$CNAG00DKeyForEncryption&Decryption'
+
+
+# the per-char cipher of the first version : every password stored since must still decrypt
+
+def baselineEncrypt(clear: str, key=KEY) -> str:
+    enc = []
+    for i in range(len(clear)):
+        enc.append(chr((ord(clear[i]) + ord(key[i % len(key)])) % 256))
+    return base64.urlsafe_b64encode(''.join(enc).encode()).decode()
+
+
+def baselineDecrypt(enc: str, key=KEY) -> str:
+    dec = []
+    enc = base64.urlsafe_b64decode(enc).decode()
+    for i in range(len(enc)):
+        dec.append(chr((256 + ord(enc[i]) - ord(key[i % len(key)])) % 256))
+    return ''.join(dec)
+
+
+VALUES = ['', 'c', 'cisco', 'x' * (len(KEY) - 1), 'y' * len(KEY), 'z' * (len(KEY) + 1), 'P@ss w0rd!' * 9,
+          'mot de passe é ü ÿ', '\x00\x01\xff', 'パスワード', '€uro']
+
+
+def test_encrypt_matches_baseline(devices):
+    assert devices.encryptMany(VALUES) == [baselineEncrypt(v) for v in VALUES]
+
+
+def test_decrypt_matches_baseline(devices):
+    stored = [baselineEncrypt(v) for v in VALUES]
+    assert devices.decryptMany(stored) == [baselineDecrypt(v) for v in stored]
+
+
+def test_round_trip(devices):
+    latin = [v for v in VALUES if all(ord(c) < 256 for c in v)]
+    assert devices.decryptMany(devices.encryptMany(latin)) == latin
+    assert devices.decrypt(devices.encrypt('cisco')) == 'cisco'
+
+
+@pytest.mark.parametrize('key', ['k', 'ab', KEY])
+def test_shift_many_any_key(key):
+    values = ['', 'a', 'abc', 'abcdefgh' * 5]
+    shifted = cna.shiftMany(values, key, 1)
+    assert shifted == [''.join(chr((ord(c) + ord(key[i % len(key)])) % 256) for i, c in enumerate(v)) for v in values]
+    assert cna.shiftMany(shifted, key, -1) == values
@@ -0,0 +1,101 @@
+import csv
+import json
+
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+DEVICES = [
+    {'category': 'routers', 'hostname': 'R1', 'host': '10.0.0.1', 'priv_pass': 'class', 'ssh_username': 'admin',
+     'ssh_password': 'p@ss,"quoted"', 'tags': 'site-paris core'},
+    {'category': 'routers', 'hostname': 'R2', 'host': '10.0.0.2', 'telnet_username': 'cisco', 'telnet_password': 'cisco',
+     'telnet_port': '2323', 'tags': 'site-lyon'},
+    {'category': 'switches', 'hostname': 'SW1', 'host': 'sw1.example.net', 'ssh_username': 'cisco', 'ssh_password': 'é-ü',
+     'ssh_keys': '/home/cna/.ssh/id_rsa', 'ssh_port': '2222'},
+    # same host as R1 behind another port : its tags must not land on R1
+    {'category': 'others', 'hostname': 'FW1', 'host': '10.0.0.1', 'ssh_username': 'cisco', 'ssh_password': 'cisco',
+     'ssh_port': '8022', 'tags': 'firewall'},
+]
+
+
+def exported(devices, path: str) -> list:
+    devices._exportDevices(str(path))
+    if str(path).endswith('.json'):
+        with open(path) as fd:
+            rows = json.load(fd)
+    else:
+        with open(path, newline='') as fd:
+            rows = list(csv.DictReader(fd))
+    for row in rows:
+        row['id'] = str(row['id'])
+        row['tags'] = sorted(row['tags'].split())
+    return rows
+
+
+@pytest.mark.parametrize('extension', ['csv', 'json'])
+def test_round_trip(devices, workdir, extension):
+    source = workdir / f'in.{extension}'
+    if extension == 'json':
+        source.write_text(json.dumps(DEVICES))
+    else:
+        with open(source, 'w', newline='') as fd:
+            writer = csv.DictWriter(fd, sorted({k for d in DEVICES for k in d}))
+            writer.writeheader()
+            writer.writerows(DEVICES)
+    devices._importDevices(str(source))
+    first = exported(devices, workdir / f'out.{extension}')
+    assert [(r['hostname'], r['category'], r['tags']) for r in first] == [
+        ('R1', 'routers', ['core', 'site-paris']), ('R2', 'routers', ['site-lyon']), ('SW1', 'switches', []),
+        ('FW1', 'others', ['firewall'])]
+    r1, r2, sw1, _ = first
+    assert (r1['ssh'], r1['ssh_password'], r1['ssh_port'], r1['telnet']) == ('True', 'p@ss,"quoted"', '22', 'False')
+    assert (r2['telnet'], r2['telnet_port'], r2['ssh'], r2['priv_pass']) == ('True', '2323', 'False', '-')
+    assert (sw1['ssh_password'], sw1['ssh_use_keys'], sw1['ssh_keys']) == ('é-ü', 'True', '/home/cna/.ssh/id_rsa')
+    # the stored passwords are encrypted, the export gives them back in clear
+    assert cna.Device.get(cna.Device.hostname == 'R1').ssh_password == devices.encrypt('p@ss,"quoted"')
+    # an export imports again as is
+    cna.Tag.delete().execute()
+    cna.Device.delete().execute()
+    devices._importDevices(str(workdir / f'out.{extension}'))
+    second = exported(devices, workdir / f'again.{extension}')
+    assert [{k: v for k, v in r.items() if k != 'id'} for r in second] == [{k: v for k, v in r.items() if k != 'id'} for r in first]
+
+
+def test_import_keeps_the_valid_rows(devices, workdir):
+    source = workdir / 'in.json'
+    source.write_text(json.dumps([DEVICES[0], {'hostname': 'X', 'category': 'routers'}, DEVICES[1], 'not a row']))
+    devices._importDevices(str(source))
+    assert [d.hostname for d in cna.Device.select().order_by(cna.Device.id)] == ['R1', 'R2']
+
+
+def test_import_category_of_the_command_line(devices, workdir):
+    source = workdir / 'in.json'
+    source.write_text(json.dumps([{k: v for k, v in DEVICES[0].items() if k != 'category'}]))
+    devices._importDevices(str(source), dtype=2)
+    assert cna.Device.get().category == 'switches'
+
+
+BASE = {'category': 'routers', 'hostname': 'R1', 'host': '10.0.0.1', 'ssh_username': 'cisco', 'ssh_password': 'cisco'}
+
+
+@pytest.mark.parametrize('change, reason', [
+    ({'category': 'firewalls'}, 'unknown category'),
+    ({'hostname': ''}, 'no hostname'),
+    ({'host': ' '}, 'no host'),
+    ({'ssh_port': 'twenty-two'}, 'ssh_port `twenty-two` is not a number'),
+    ({'ssh': 'yes', 'ssh_password': ''}, 'ssh is enabled without ssh_username & ssh_password'),
+    ({'telnet': 'yes'}, 'telnet is enabled without telnet_username & telnet_password'),
+    ({'ssh_use_keys': 'yes'}, 'ssh_use_keys is enabled without ssh_keys'),
+    ({'ssh_username': '', 'ssh_password': ''}, 'neither telnet nor ssh credentials'),
+])
+def test_row_validation(change, reason):
+    with pytest.raises(ValueError, match=reason):
+        cna.deviceRow({**BASE, **change})
+
+
+def test_row_defaults():
+    row = cna.deviceRow({'category': 'S', 'hostname': ' SW1 ', 'host': '10.0.0.9', 'telnet_username': 'u',
+                         'telnet_password': 'p', 'tags': ['b', 'a', 'b']})
+    assert (row['category'], row['hostname'], row['ipv4'], row['tags']) == ('switches', 'SW1', 167772169, ['a', 'b'])
+    assert (row['telnet'], row['telnet_port'], row['ssh'], row['ssh_port'], row['ssh_password']) == ('True', '23', 'False', '22', '-')
+    assert (row['device_type'], row['priv_pass'], row['ssh_use_keys'], row['ssh_keys']) == ('cisco_ios', '-', 'False', '-')
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """ the hosts every run connected to, sessions succeed without any network """
+    hosts = []
+
+    def worker(job, cmds):
+        hosts.append(job[0])
+        result = cna.SessionResult(job[0], 'ssh', status=True, port=job[3])
+        result.timings['run'] = 0.0
+        return result
+
+    monkeypatch.setattr(cna, 'sessionWorker', lambda *args, **kwargs: worker)
+    return hosts
+
+
+def rows(count: int) -> list:
+    return [{'id': n, 'category': 'routers', 'host': f'10.0.0.{n}'} for n in range(1, count + 1)]
+
+
+def states(job) -> dict:
+    return {jd.device: jd.state for jd in cna.JobDevice.select().where(cna.JobDevice.job == job)}
+
+
+# JobTracker
+
+def test_tracker_states(devices):
+    job = cna.Job.create(selection='R=1-4', method='ssh')
+    skipped = [({'id': 9, 'category': 'routers', 'host': '10.0.0.9'}, 'unreachable (pre-flight)')]
+    tracker = cna.JobTracker(job, rows(3), skipped)
+    assert states(job) == {1: 'pending', 2: 'pending', 3: 'pending', 9: 'failed'}
+    tracker.start(0)
+    tracker.finish(0, cna.SessionResult('10.0.0.1', 'ssh', status=True))
+    tracker.start(1)
+    tracker.finish(1, cna.SessionResult('10.0.0.2', 'ssh', error='timed out'))
+    tracker.start(2)
+    assert tracker.close() == 1
+    assert states(job) == {1: 'done', 2: 'failed', 3: 'running', 9: 'failed'}
+    assert cna.JobDevice.get((cna.JobDevice.job == job) & (cna.JobDevice.device == 2)).error == 'timed out'
+    assert cna.Job.get_by_id(job.id).finished is None
+
+
+def test_tracker_closes_a_finished_job(devices):
+    job = cna.Job.create(selection='R=1-2', method='ssh')
+    tracker = cna.JobTracker(job, rows(2))
+    for n in range(2):
+        tracker.finish(n, cna.SessionResult('', 'ssh', status=True))
+    assert tracker.close() == 0
+    assert cna.Job.get_by_id(job.id).finished is not None
+
+
+def test_tracker_buffers_state_changes(devices, monkeypatch):
+    monkeypatch.setattr(cna, 'JOB_BATCH', 3)
+    monkeypatch.setattr(cna, 'JOB_FLUSH', 3600)
+    job = cna.Job.create(selection='R=1-4', method='ssh')
+    tracker = cna.JobTracker(job, rows(4))
+    tracker.start(0)
+    tracker.start(1)
+    assert set(states(job).values()) == {'pending'}
+    tracker.start(2)
+    assert states(job) == {1: 'running', 2: 'running', 3: 'running', 4: 'pending'}
+
+
+def test_tracker_reuses_the_rows_of_a_resumed_job(devices):
+    job = cna.Job.create(selection='R=1-3', method='ssh')
+    cna.JobTracker(job, rows(3)).close()
+    cna.JobTracker(job, rows(3)[1:]).close()
+    assert cna.JobDevice.select().where(cna.JobDevice.job == job).count() == 3
+
+
+# --resume
+
+def test_resume_runs_only_unfinished_devices(devices, add, sessions):
+    add(*[{'hostname': f'R{n}', 'host': f'10.0.0.{n}'} for n in range(1, 6)])
+    add({'hostname': 'SW1', 'host': '10.0.1.1'}, category='switches')
+    devices.single_connect('R=1-5-S=6', 'ssh', 'show clock', preflight_timeout=None)
+    assert sorted(sessions) == ['10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.4', '10.0.0.5', '10.0.1.1']
+    job = cna.Job.select().order_by(cna.Job.id.desc()).get()
+    assert job.finished is not None and set(states(job).values()) == {'done'}
+    # a run killed halfway : devices left running / pending, one failed for good
+    cna.JobDevice.update(state='running').where(cna.JobDevice.device == 2).execute()
+    cna.JobDevice.update(state='pending').where(cna.JobDevice.device.in_([4, 6])).execute()
+    cna.JobDevice.update(state='failed').where(cna.JobDevice.device == 5).execute()
+    cna.Job.update(finished=None).execute()
+    sessions.clear()
+    devices.resume(job.id, preflight_timeout=None)
+    assert sorted(sessions) == ['10.0.0.2', '10.0.0.4', '10.0.1.1']
+    assert states(job) == {1: 'done', 2: 'done', 3: 'done', 4: 'done', 5: 'failed', 6: 'done'}
+    assert cna.Job.get_by_id(job.id).finished is not None
+    assert json.loads(job.cmds) == ['show clock']
+
+
+def test_resume_of_a_finished_job_runs_nothing(devices, add, sessions):
+    add({'hostname': 'R1', 'host': '10.0.0.1'})
+    devices.single_connect('R=1', 'ssh', 'show clock', preflight_timeout=None)
+    sessions.clear()
+    assert devices.resume(cna.Job.select().get().id, preflight_timeout=None) == []
+    assert sessions == []
@@ -0,0 +1,156 @@
+import socket
+
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+
+class FakeTelnet(object):
+    """
+    telnetlib.Telnet of an IOS device : the lines written wait in `pending`
+    and are answered one at a time while expect() finds nothing to match, so
+    `ahead` is the most lines the session ever had in flight
+    """
+
+    def __init__(self, ask_username=True, enable_secret='class', login_level='>', mute=False):
+        self.mode = 'username' if ask_username else 'password'
+        self.enable_secret = enable_secret
+        self.login_level = login_level
+        self.mute = mute
+        self.buffer = b'\r\nUser Access Verification\r\n\r\n' + (b'Username: ' if ask_username else b'Password: ')
+        self.pending, self.received, self.writes, self.ahead = [], [], [], 0
+
+    def prompt(self) -> bytes:
+        return {'user': b'R1>', 'priv': b'R1#', 'config': b'R1(config)#', 'enable': b'Password: '}[self.mode]
+
+    def answer(self, line: str) -> bytes:
+        if self.mode == 'username':
+            self.mode = 'password'
+            return line.encode() + b'\r\nPassword: '
+        if self.mode == 'password':
+            if line != 'cisco':
+                self.mode = 'username'
+                return b'\r\n% Login invalid\r\n\r\nUsername: '
+            self.mode = 'user' if self.login_level == '>' else 'priv'
+            return b'\r\n' + self.prompt()
+        if self.mode == 'enable':
+            self.mode = 'priv' if line == self.enable_secret else 'user'
+            return (b'\r\n' if self.mode == 'priv' else b'\r\n% Access denied\r\n\r\n') + self.prompt()
+        if self.mode == 'user' and line == 'enable':
+            self.mode = 'enable' if self.enable_secret is not None else 'priv'
+            return b'enable\r\n' + self.prompt()
+        if self.mode == 'priv' and line == 'conf t':
+            self.mode = 'config'
+        elif self.mode == 'config' and line == 'end':
+            self.mode = 'priv'
+        elif self.mode == 'config' and line.startswith('bad'):
+            return line.encode() + b"\r\n% Invalid input detected at '^' marker.\r\n\r\n" + self.prompt()
+        return line.encode() + b'\r\n' + self.prompt()
+
+    def write(self, data: bytes):
+        self.writes.append(data)
+        self.pending += data.decode().split('\n')[:-1]
+        self.ahead = max(self.ahead, len(self.pending))
+
+    def expect(self, patterns: list, timeout=None) -> tuple:
+        while True:
+            for index, pattern in enumerate(patterns):
+                match = pattern.search(self.buffer)
+                if match is not None:
+                    data, self.buffer = self.buffer[:match.end()], self.buffer[match.end():]
+                    return index, match, data
+            if self.pending == [] or self.mute:
+                return -1, None, self.buffer
+            line = self.pending.pop(0)
+            self.received.append(line)
+            self.buffer += self.answer(line)
+
+
+def session(tn: FakeTelnet, password='cisco', priv='class', window=cna.DEFAULT_WINDOW) -> cna.TelnetSession:
+    s = cna.TelnetSession.__new__(cna.TelnetSession)
+    s._host, s._user, s._pass, s._priv, s._timeout, s._window = '10.0.0.1', 'cisco', password, priv, 1, window
+    s._tn = tn
+    return s
+
+
+# expect engine (login / enable)
+
+def test_login_then_enable():
+    tn = FakeTelnet()
+    s = session(tn)
+    assert s._login() == b'>'
+    s._enable()
+    assert tn.received == ['cisco', 'cisco', 'enable', 'class'] and tn.mode == 'priv'
+
+
+def test_login_without_username_prompt():
+    tn = FakeTelnet(ask_username=False)
+    assert session(tn)._login() == b'>'
+    assert tn.received == ['cisco']
+
+
+def test_login_straight_to_privileged():
+    assert session(FakeTelnet(login_level='#'))._login() == b'#'
+
+
+def test_login_invalid():
+    with pytest.raises(Exception, match='Login Invalid') as err:
+        session(FakeTelnet(), password='wrong')._login()
+    assert cna.failureReason(err.value) == 'auth'
+
+
+def test_enable_password_invalid():
+    s = session(FakeTelnet(), priv='wrong')
+    s._login()
+    with pytest.raises(Exception, match='password is not valid'):
+        s._enable()
+
+
+def test_enable_without_password():
+    tn = FakeTelnet(enable_secret=None)
+    s = session(tn)
+    s._login()
+    s._enable()
+    assert tn.received == ['cisco', 'cisco', 'enable'] and tn.mode == 'priv'
+
+
+def test_expect_timeout_names_the_step():
+    tn = FakeTelnet(mute=True)
+    tn.buffer = b''
+    with pytest.raises(socket.timeout, match='login : no answer from 10.0.0.1') as err:
+        session(tn)._login()
+    assert cna.failureReason(err.value) == 'timeout'
+
+
+# config window
+
+def configure(window: int, cmds: list) -> tuple:
+    tn = FakeTelnet(login_level='#')
+    s = session(tn, window=window)
+    s._login()
+    tn.writes, tn.ahead = [], 0
+    return tn, s._configure(cmds)
+
+
+@pytest.mark.parametrize('window', [1, 2, 5, 8, 64])
+def test_window_bounds_the_lines_in_flight(window):
+    cmds = [f'interface Loopback{n}' for n in range(30)]
+    tn, transcript = configure(window, cmds)
+    assert tn.ahead <= max(1, window)
+    assert tn.received[-len(cmds) - 2:] == ['conf t'] + cmds + ['end']
+    assert [r['command'] for r in cna.splitTranscript(transcript, cmds)] == cmds
+
+
+def test_window_tops_up_in_batches():
+    cmds = [f'vlan {n}' for n in range(40)]
+    tn, _ = configure(8, cmds)
+    # `conf t` alone, then batches of at least half a window instead of one write per line
+    assert len(tn.writes) - 1 <= (len(cmds) + 1) // 4 + 1
+    one, _ = configure(1, cmds)
+    assert len(one.writes) == len(cmds) + 2
+
+
+def test_window_transcript_keeps_errors_per_command():
+    cmds = ['hostname R1', 'bad command', 'ip domain-name lab']
+    _, transcript = configure(2, cmds)
+    assert [r['exit_status'] for r in cna.splitTranscript(transcript, cmds)] == [0, 1, 0]
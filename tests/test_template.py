@@ -0,0 +1,76 @@
+import pytest
+
+import CiscoNetworkAutomation as cna
+
+SOURCE = """hostname $hostname
+interface Loopback0
+ description ${site} $host
+enable secret 5 $$1$$salt$$hash"""
+
+VARIABLES = {'*': {'site': 'paris'}, '2': {'site': 'lyon'}, 'R3': {'site': 'nice'}, '10.0.0.4': {'site': 'lille'}}
+
+
+def row(n: int) -> dict:
+    return {'id': n, 'hostname': f'R{n}', 'host': f'10.0.0.{n}', 'category': 'routers', 'device_type': 'cisco_ios'}
+
+
+@pytest.fixture
+def template(workdir):
+    (workdir / 'base.cfg').write_text(SOURCE)
+    return lambda variables=VARIABLES: cna.ConfigTemplate(str(workdir / 'base.cfg'), variables)
+
+
+def test_render(template):
+    assert template().render(row(1)) == [
+        'hostname R1', 'interface Loopback0', ' description paris 10.0.0.1', 'enable secret 5 $1$salt$hash']
+
+
+def test_vars_by_id_hostname_and_host(template):
+    t = template()
+    assert [t.render(row(n))[2] for n in (1, 2, 3, 4)] == [
+        ' description paris 10.0.0.1', ' description lyon 10.0.0.2', ' description nice 10.0.0.3',
+        ' description lille 10.0.0.4']
+
+
+def test_missing_variable(template):
+    with pytest.raises(KeyError) as err:
+        template({}).render(row(1))
+    assert err.value.args[0] == 'site'
+
+
+def test_missing_variables_listed(workdir):
+    (workdir / 'two.cfg').write_text('ntp server $ntp\nlogging host ${syslog}\nhostname $hostname')
+    with pytest.raises(KeyError) as err:
+        cna.ConfigTemplate(str(workdir / 'two.cfg')).render(row(1))
+    assert err.value.args[0] == 'ntp, syslog'
+
+
+def test_cache_hits(template):
+    t = template({'*': {'site': 'paris'}})
+    first = t.render(row(1))
+    assert t.hits == 0
+    assert t.render(row(1)) == first and t.hits == 1
+    t.render(row(2))
+    assert t.hits == 1
+    # callers get their own list, editing it does not touch the cached one
+    t.render(row(1)).append('end')
+    assert t.render(row(1)) == first and t.hits == 3
+
+
+def test_nothing_rendered_on_disk(template, workdir):
+    (workdir / 'devices' / 'render_cache').mkdir(parents=True)
+    (workdir / 'devices' / 'render_cache' / 'old.cfg').write_text('enable secret clear')
+    t = template()
+    t.render(row(1))
+    assert not (workdir / 'devices' / 'render_cache').exists()
+    assert sorted(p.name for p in workdir.rglob('*') if p.is_file()) == ['base.cfg']
+
+
+def test_render_through_a_run(devices, add, template):
+    add(*[{'hostname': f'R{n}', 'host': f'10.0.0.{n}'} for n in range(1, 4)])
+    rows, skipped = [], []
+    jobs = devices._processData('R=1-3', 'ssh', False, rows, preflight_timeout=None)
+    _, configs, kept = devices._render(template({'R2': {'site': 'lyon'}}), jobs, rows, skipped)
+    assert [c[2] for c in configs] == [' description lyon 10.0.0.2']
+    assert [r['hostname'] for r in kept] == ['R2']
+    assert [(r['hostname'], error) for r, error in skipped] == [('R1', 'no value for site'), ('R3', 'no value for site')]